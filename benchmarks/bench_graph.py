@@ -0,0 +1,48 @@
+"""
+Benchmark building, verifying and iterating migrations graph.
+
+Synthetic graphs are either linear or consist of many parallel branches
+merged by the last migration.
+
+usage:
+
+    python benchmarks/bench_graph.py --count 10000 --count 100000
+"""
+
+import time
+from typing import Iterator, Tuple
+
+import click
+from synthetic import SHAPES
+
+from pymongo_migrate.migrations import Migration, MigrationsGraph
+
+
+def measure(migrations: Iterator[Migration]) -> Tuple[float, float, float]:
+    start = time.perf_counter()
+    graph = MigrationsGraph()
+    for migration in migrations:
+        graph.add_migration(migration)
+    built = time.perf_counter()
+    graph.verify()
+    verified = time.perf_counter()
+    for _ in graph:
+        pass
+    iterated = time.perf_counter()
+    return built - start, verified - built, iterated - verified
+
+
+@click.command()
+@click.option("--count", multiple=True, type=int, default=[10_000, 100_000])
+def main(count):
+    for shape, factory in SHAPES.items():
+        for n in count:
+            build, verify, iterate = measure(factory(n))
+            click.echo(
+                f"{shape:>6} {n:>7}: build {build:.3f}s,"
+                f" verify {verify:.3f}s, iterate {iterate:.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark loading a directory with thousands of migrations.
+
+Compares eager loading (executing every module) with lazy loading
+(reading metadata statically).
+
+usage:
+
+    python benchmarks/bench_startup.py --count 5000
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from synthetic import HEAVY_IMPORTS, linear_graph, write_migrations
+
+from pymongo_migrate.loader import load_lazy_module_migrations, load_module_migrations
+
+
+def measure(loader, path: Path, namespace: str) -> float:
+    start = time.perf_counter()
+    migrations = list(loader(path, namespace=namespace))
+    elapsed = time.perf_counter() - start
+    assert migrations
+    return elapsed
+
+
+@click.command()
+@click.option("--count", default=2000, show_default=True)
+def main(count: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        write_migrations(path, linear_graph(count), imports=HEAVY_IMPORTS)
+        for label, loader in [
+            ("eager", load_module_migrations),
+            ("lazy", load_lazy_module_migrations),
+        ]:
+            elapsed = measure(loader, path, namespace=f"bench_{label}")
+            click.echo(f"{label:>5}: {count} migrations loaded in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmark suite covering loading, graph operations and migration states.
+
+For every shape and count of synthetic migrations measures:
+ - loading migration modules eagerly and lazily,
+ - building, verifying and iterating migrations graph,
+ - drawing the graph with `graph_draw.dump`,
+ - `upgrade --fake` and `show` (reading states of all migrations),
+   against mongod at `--uri`, if given.
+
+Throwaway mongod for state benchmarks can be started with:
+
+    mongod --dbpath "$(mktemp -d)" --port 27018
+
+Best time out of `--repeat` runs of each benchmark is written as JSON,
+so results of different versions can be compared.
+
+usage:
+
+    python benchmarks/bench_suite.py --count 100 --count 10000 -o before.json
+    python benchmarks/bench_suite.py --uri mongodb://localhost:27018/ -o after.json
+"""
+
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import click
+import pymongo
+from synthetic import SHAPES, write_migrations
+
+from pymongo_migrate.graph_draw import dump
+from pymongo_migrate.loader import load_lazy_module_migrations, load_module_migrations
+from pymongo_migrate.migrations import MigrationsGraph
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+DATABASE = "pymongo_migrate_bench"
+
+
+def best_of(repeat: int, func: Callable[[], None], setup=lambda: None) -> float:
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@contextmanager
+def mongo_client(uri: Optional[str]) -> Iterator[Optional[pymongo.MongoClient]]:
+    if uri is None:
+        yield None
+        return
+    client: pymongo.MongoClient = pymongo.MongoClient(uri)
+    try:
+        yield client
+    finally:
+        client.close()
+
+
+def graph_benchmarks(path: Path, repeat: int, namespace: str) -> Dict[str, float]:
+    migrations = list(load_module_migrations(path, namespace=f"{namespace}_eager"))
+    graph = MigrationsGraph()
+
+    def build():
+        nonlocal graph
+        graph = MigrationsGraph()
+        for migration in migrations:
+            graph.add_migration(migration)
+
+    return {
+        "load_eager": best_of(
+            repeat,
+            lambda: list(load_module_migrations(path, namespace=f"{namespace}_eager")),
+        ),
+        "load_lazy": best_of(
+            repeat,
+            lambda: list(
+                load_lazy_module_migrations(path, namespace=f"{namespace}_lazy")
+            ),
+        ),
+        "graph_build": best_of(repeat, build),
+        "graph_verify": best_of(repeat, lambda: graph.verify(), setup=build),
+        "graph_iterate": best_of(repeat, lambda: list(graph), setup=build),
+        "graph_dump": best_of(repeat, lambda: dump(graph, io.StringIO())),
+    }
+
+
+def state_benchmarks(client, path: Path, repeat: int) -> Dict[str, float]:
+    mongo_migrate = MongoMigrate(client, DATABASE, migrations_dir=str(path))
+
+    def reset():
+        client.drop_database(DATABASE)
+        mongo_migrate.load_states()
+
+    def show():
+        mongo_migrate.load_states()
+        for migration in mongo_migrate.get_migrations():
+            mongo_migrate.get_state(migration)
+
+    try:
+        return {
+            "upgrade_fake": best_of(
+                repeat, lambda: mongo_migrate.upgrade(fake=True), setup=reset
+            ),
+            "show": best_of(repeat, show),
+        }
+    finally:
+        client.drop_database(DATABASE)
+
+
+@click.command()
+@click.option(
+    "--count",
+    multiple=True,
+    type=click.IntRange(min=2),
+    default=[100, 1000, 10_000],
+    show_default=True,
+)
+@click.option(
+    "--shape", multiple=True, type=click.Choice(sorted(SHAPES)), default=sorted(SHAPES)
+)
+@click.option("--repeat", default=3, type=click.IntRange(min=1), show_default=True)
+@click.option("-u", "--uri", default=None, help="mongodb URI for state benchmarks")
+@click.option("-o", "--output", type=click.File("w"), default="-")
+def main(count, shape, repeat, uri, output):
+    results: List[Dict] = []
+    with mongo_client(uri) as client:
+        if client is None:
+            click.echo("No --uri given, skipping state benchmarks", err=True)
+            mongo_version = None
+        else:
+            mongo_version = client.server_info()["version"]
+        for shape_name in shape:
+            for n in count:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = Path(tmp_dir)
+                    write_migrations(path, SHAPES[shape_name](n))
+                    timings = graph_benchmarks(
+                        path, repeat, namespace=f"bench_{shape_name}_{n}"
+                    )
+                    if client is not None:
+                        timings.update(state_benchmarks(client, path, repeat))
+                for benchmark, seconds in timings.items():
+                    results.append(
+                        {
+                            "benchmark": benchmark,
+                            "shape": shape_name,
+                            "count": n,
+                            "seconds": seconds,
+                        }
+                    )
+                    click.echo(
+                        f"{shape_name:>6} {n:>6} {benchmark:<14} {seconds:.4f}s",
+                        err=True,
+                    )
+    json.dump(
+        {
+            "python": platform.python_version(),
+            "pymongo": pymongo.version,
+            "mongo": mongo_version,
+            "argv": sys.argv[1:],
+            "results": results,
+        },
+        output,
+        indent=2,
+    )
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Synthetic migration histories shared by benchmarks.
+
+Graphs are either linear or consist of many parallel branches merged
+by the last migration. Names are zero padded numbers, so they sort like
+timestamps generated by `pymongo-migrate generate`.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator
+
+from pymongo_migrate.generate import generate_migration_module
+from pymongo_migrate.migrations import Migration
+
+HEAVY_IMPORTS = "import decimal\nimport email.mime.multipart\nimport xml.dom.minidom\n"
+
+
+def migration_name(i: int) -> str:
+    return f"{i:014d}"
+
+
+def linear_graph(count: int) -> Iterator[Migration]:
+    for i in range(count):
+        yield Migration(
+            name=migration_name(i),
+            dependencies=[migration_name(i - 1)] if i else [],
+        )
+
+
+def wide_graph(count: int, branches: int = 100) -> Iterator[Migration]:
+    yield Migration(name=migration_name(0))
+    heads = [migration_name(0)] * branches
+    for i in range(1, count - 1):
+        branch = i % branches
+        name = migration_name(i)
+        yield Migration(name=name, dependencies=[heads[branch]])
+        heads[branch] = name
+    yield Migration(name=migration_name(count - 1), dependencies=sorted(set(heads)))
+
+
+SHAPES: Dict[str, Callable[[int], Iterator[Migration]]] = {
+    "linear": linear_graph,
+    "wide": wide_graph,
+}
+
+
+def write_migrations(path: Path, migrations: Iterable[Migration], imports: str = ""):
+    """Write migration module for each migration to `path` directory"""
+    path.mkdir(parents=True, exist_ok=True)
+    for migration in migrations:
+        with (path / f"{migration.name}.py").open("w") as f:
+            f.write(imports)
+            generate_migration_module(
+                f, name=migration.name, dependencies=migration.dependencies
+            )
@@ -0,0 +1,441 @@
+"""
+Asyncio counterpart of `MongoMigrate`, using PyMongo's `AsyncMongoClient`.
+
+Requires pymongo with asyncio support (4.10+).
+"""
+
+import asyncio
+import contextvars
+import datetime
+import logging
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import pymongo
+from bson import CodecOptions
+from pymongo.errors import OperationFailure
+
+from pymongo_migrate.loader import load_lazy_module_migrations
+from pymongo_migrate.migrations import (
+    Checkpoint,
+    Migration,
+    MigrationsGraph,
+    MigrationState,
+    call_with_accepted,
+)
+from pymongo_migrate.mongo_migrate import (
+    _cache_checkpoint,
+    _cache_states,
+    _DependencyScheduler,
+    _deserialize,
+    _load_states,
+    _loaded_state,
+    _marked_states,
+    _MeasureTime,
+    _pending_downgrades,
+    _pending_upgrades,
+    _replaced_states,
+    _resolve_target,
+    _serialize,
+    _state_write_batches,
+    dt,
+)
+from pymongo_migrate.stats import CommandStatsListener, MigrationStats
+
+if TYPE_CHECKING:
+    from pymongo import AsyncMongoClient
+
+LOGGER = logging.getLogger(__name__)
+
+
+async def _run_in_thread(func, *args, **kwargs):
+    """Run blocking function in default executor, in copy of current context"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, partial(context.run, func, *args, **kwargs))
+
+
+class AsyncCheckpoint:
+    """
+    Progress of a running async migration, persisted in its state.
+
+     async def upgrade(db, checkpoint):
+         last_id = (checkpoint.data or {}).get("last_id")
+         ...
+         await checkpoint.save({"last_id": last_id})
+    """
+
+    def __init__(
+        self,
+        data: Optional[Dict[str, Any]],
+        save: Callable[[Dict[str, Any]], Awaitable[None]],
+    ):
+        self.data = data
+        self._save = save
+
+    async def save(self, data: Dict[str, Any]):
+        await self._save(data)
+        self.data = data
+
+
+@dataclass
+class AsyncMongoMigrate:
+    """
+    Apply migrations from asyncio code.
+
+    Migration modules may define `upgrade`/`downgrade` as coroutine functions,
+    which are awaited with `AsyncDatabase`. Regular functions are run
+    in a thread with `Database` of `sync_client`, so migrations written for
+    `MongoMigrate` can be applied too.
+
+    usage:
+
+     mongo_migrate = AsyncMongoMigrate(AsyncMongoClient(uri), "db_name")
+     await mongo_migrate.migrate()
+    """
+
+    client: "AsyncMongoClient"
+    database: str
+    migrations_dir: str = "./pymongo_migrations"
+    migrations_collection: str = "pymongo_migrate"
+    logger: logging.Logger = LOGGER
+    state_index: bool = True
+    state_batch_size: int = 1000
+    sync_client: Optional[pymongo.MongoClient] = None
+    command_stats: Optional[CommandStatsListener] = None
+
+    def __post_init__(self):
+        self.graph = MigrationsGraph()
+        for migration in load_lazy_module_migrations(self.migrations_path):
+            self.graph.add_migration(migration)
+        self.graph.get_order()
+        self._full_graph = self.graph
+        self._states: Optional[Dict[str, MigrationState]] = None
+        self._state_index_ensured = False
+
+    @property
+    def migrations_path(self):
+        return Path(self.migrations_dir)
+
+    @property
+    def db(self):
+        return self.client.get_database(self.database)
+
+    @property
+    def sync_db(self):
+        if self.sync_client is None:
+            raise ValueError(
+                "sync_client is required to run migrations which are not coroutines"
+            )
+        return self.sync_client.get_database(self.database)
+
+    @property
+    def db_collection(self):
+        return self.db[self.migrations_collection].with_options(
+            codec_options=CodecOptions(tz_aware=True, tzinfo=datetime.timezone.utc)
+        )
+
+    def get_migrations(self) -> Iterator[Migration]:
+        yield from self.graph
+
+    async def has_state_index(self) -> bool:
+        """Check if migration states collection has unique index on name"""
+        async for index in await self.db_collection.list_indexes():
+            if dict(index["key"]) == {"name": 1} and index.get("unique"):
+                return True
+        return False
+
+    async def ensure_state_index(self):
+        """Create unique index on migration name, if it does not exist yet"""
+        if not self.state_index or self._state_index_ensured:
+            return
+        try:
+            await self.db_collection.create_index("name", unique=True)
+        except OperationFailure as e:
+            self.logger.warning(
+                "Could not create unique index on %r: %s",
+                self.migrations_collection,
+                e,
+            )
+        self._state_index_ensured = True
+
+    async def load_states(self, verify: bool = True) -> Dict[str, MigrationState]:
+        """Fetch states of all migrations with a single query"""
+        documents = [data async for data in self.db_collection.find()]
+        self.graph, states = _load_states(self._full_graph, documents, verify)
+        self._states = states
+        return states
+
+    async def get_state(self, migration: Migration) -> MigrationState:
+        if self._states is not None:
+            return _loaded_state(self._states, migration)
+        data = await self.db_collection.find_one({"name": migration.name})
+        if data:
+            return _deserialize(data, MigrationState)
+        return MigrationState(name=migration.name)
+
+    async def set_state(self, status: MigrationState):
+        await self.ensure_state_index()
+        await self.db_collection.replace_one(
+            {"name": status.name}, _serialize(status), upsert=True
+        )
+        _cache_states(self._states, [status])
+
+    async def set_states(self, states: List[MigrationState]):
+        """Write migration states with ordered bulk writes of `state_batch_size`"""
+        await self.ensure_state_index()
+        for requests in _state_write_batches(states, self.state_batch_size):
+            await self.db_collection.bulk_write(requests, ordered=True)
+        _cache_states(self._states, states)
+
+    async def save_checkpoint(self, migration_name: str, data: Dict[str, Any]):
+        """Persist progress of a running migration"""
+        await self.ensure_state_index()
+        await self.db_collection.update_one(
+            {"name": migration_name}, {"$set": {"checkpoint": data}}, upsert=True
+        )
+        _cache_checkpoint(self._states, migration_name, data)
+
+    def _check_for_migration(
+        self, migration_name: Optional[str]
+    ) -> Optional[Migration]:
+        if migration_name is None:
+            return None
+        migration = self._full_graph.migrations.get(migration_name)
+        if migration is None:
+            raise ValueError(f"No such migration: {migration_name}")
+        return migration
+
+    async def migrate(
+        self,
+        migration_name: Optional[str] = None,
+        fake: bool = False,
+        workers: int = 1,
+    ):
+        """
+        Automatically detects if upgrades or downgrades should be applied to
+        reach target migration state.
+
+        See `MongoMigrate.migrate`.
+        """
+        if migration_name is None:
+            self.logger.debug("Migration target not specified, assuming upgrade")
+            await self.upgrade(fake=fake, workers=workers)
+            return
+        migration = self._check_for_migration(migration_name)
+        assert migration, "No matching migration, something went wrong"
+        states = await self.load_states()
+        if _loaded_state(states, migration).applied:
+            self.logger.debug("Migration target already applied, assuming downgrade")
+            await self.downgrade(migration_name, fake)
+        else:
+            self.logger.debug("Migration target not applied, assuming upgrade")
+            await self.upgrade(migration_name, fake, workers=workers)
+
+    def _pending_upgrades(
+        self, migration_name: Optional[str]
+    ) -> Iterator[Tuple[Migration, MigrationState]]:
+        assert self._states is not None, "States must be loaded first"
+        return _pending_upgrades(self.graph, self._states, migration_name, self.logger)
+
+    def _pending_downgrades(
+        self, migration_name: Optional[str]
+    ) -> Iterator[Tuple[Migration, MigrationState]]:
+        assert self._states is not None, "States must be loaded first"
+        return _pending_downgrades(
+            self.graph, self._states, migration_name, self.logger
+        )
+
+    async def upgrade(
+        self,
+        migration_name: Optional[str] = None,
+        fake: bool = False,
+        workers: int = 1,
+    ):
+        """
+        Apply upgrade migrations.
+
+        :param migration_name:
+            name of migration up to which (including) upgrades should be executed
+            None if all migrations should be run
+        :param fake:
+            If True, only migration state in database will be modified and
+            no actual migration will be run.
+        :param workers:
+            number of migrations which can be run concurrently,
+            if their dependencies are applied
+        """
+        if fake:
+            await self.mark_applied(migration_name)
+            return
+        self._check_for_migration(migration_name)
+        states = await self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=True
+        )
+        pending = list(self._pending_upgrades(migration_name))
+        if workers > 1:
+            await self._upgrade_concurrently(pending, workers)
+            return
+        for migration, migration_state in pending:
+            await self._upgrade_migration(migration, migration_state)
+
+    async def _upgrade_migration(
+        self, migration: Migration, migration_state: MigrationState
+    ):
+        self.logger.info("Running upgrade migration %r", migration.name)
+        save = partial(self.save_checkpoint, migration.name)
+        with self._collect_stats(migration) as stats:
+            if migration.is_coroutine("upgrade"):
+                await call_with_accepted(
+                    migration.upgrade,
+                    self.db,
+                    checkpoint=AsyncCheckpoint(migration_state.checkpoint, save),
+                )
+            else:
+                loop = asyncio.get_running_loop()
+                checkpoint = Checkpoint(
+                    migration_state.checkpoint,
+                    lambda data: asyncio.run_coroutine_threadsafe(
+                        save(data), loop
+                    ).result(),
+                )
+                await _run_in_thread(
+                    call_with_accepted,
+                    migration.upgrade,
+                    self.sync_db,
+                    checkpoint=checkpoint,
+                )
+        migration_state.applied = dt()
+        migration_state.checkpoint = None
+        migration_state.stats = stats.to_dict()
+        await self.set_state(migration_state)
+        if migration.replaces:
+            await self.set_states(_replaced_states(migration, migration_state))
+
+    @contextmanager
+    def _collect_stats(self, migration: Migration) -> Iterator[MigrationStats]:
+        with ExitStack() as stack:
+            if self.command_stats is not None:
+                stats = stack.enter_context(self.command_stats.collect())
+            else:
+                stats = MigrationStats()
+            with _MeasureTime() as mt:
+                yield stats
+            stats.duration = mt.elapsed or 0.0
+            self.logger.info(
+                "Execution time of %r: %s seconds", migration.name, stats.duration
+            )
+
+    async def _upgrade_concurrently(
+        self, pending: List[Tuple[Migration, MigrationState]], workers: int
+    ):
+        """
+        Run pending migrations as tasks as soon as their dependencies are applied.
+
+        No new migrations are started after the first failure, which is raised
+        once already running migrations finish.
+        """
+        states = {migration.name: state for migration, state in pending}
+        scheduler = _DependencyScheduler(self.graph, states)
+        running: Dict[asyncio.Task, str] = {}
+        error: Optional[BaseException] = None
+        while running or (scheduler.ready and error is None):
+            while scheduler.ready and error is None and len(running) < workers:
+                name = scheduler.pop()
+                task = asyncio.ensure_future(
+                    self._upgrade_migration(self.graph.migrations[name], states[name])
+                )
+                running[task] = name
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                scheduler.done(name)
+        if error is not None:
+            raise error
+
+    async def downgrade(self, migration_name: Optional[str] = None, fake: bool = False):
+        """
+        Reverse migrations.
+
+        :param migration_name:
+            name of migration down to which (excluding) downgrades should be executed
+            None if all migrations should be run
+        :param fake:
+            If True, only migration state in database will be modified and
+            no actual migration will be run.
+        """
+        if fake:
+            await self.mark_unapplied(migration_name)
+            return
+        self._check_for_migration(migration_name)
+        states = await self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=False
+        )
+        for migration, migration_state in self._pending_downgrades(migration_name):
+            self.logger.info("Running downgrade migration %r", migration.name)
+            with self._collect_stats(migration):
+                if migration.is_coroutine("downgrade"):
+                    await migration.downgrade(self.db)
+                else:
+                    await _run_in_thread(migration.downgrade, self.sync_db)
+            migration_state.applied = None
+            migration_state.checkpoint = None
+            migration_state.stats = None
+            await self.set_state(migration_state)
+            if migration.replaces:
+                await self.set_states(_replaced_states(migration, migration_state))
+
+    async def mark_applied(self, migration_name: Optional[str] = None) -> int:
+        """
+        Mark migrations as applied without running them, see `MongoMigrate`.
+
+        :return: number of migrations marked as applied
+        """
+        self._check_for_migration(migration_name)
+        states = await self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=True
+        )
+        pending = list(self._pending_upgrades(migration_name))
+        for migration, _ in pending:
+            self.logger.info("Fake running upgrade migration %r", migration.name)
+        await self.set_states(_marked_states(pending, applied=dt()))
+        self.logger.info("Marked %d migrations as applied", len(pending))
+        return len(pending)
+
+    async def mark_unapplied(self, migration_name: Optional[str] = None) -> int:
+        """
+        Mark migrations as not applied without running their downgrades,
+        see `MongoMigrate`.
+
+        :return: number of migrations marked as not applied
+        """
+        self._check_for_migration(migration_name)
+        states = await self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=False
+        )
+        pending = list(self._pending_downgrades(migration_name))
+        for migration, _ in pending:
+            self.logger.info("Fake running downgrade migration %r", migration.name)
+        await self.set_states(_marked_states(pending, applied=None))
+        self.logger.info("Marked %d migrations as not applied", len(pending))
+        return len(pending)
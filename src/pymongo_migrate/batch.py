@@ -0,0 +1,195 @@
+"""Helpers for migrating documents of large collections in batches"""
+
+from dataclasses import dataclass
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.collection import Collection
+from pymongo.results import BulkWriteResult
+
+from pymongo_migrate.throttle import Throttle
+
+WriteOperation = Union[
+    InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+]
+Transform = Callable[
+    [Dict[str, Any]], Union[None, WriteOperation, Sequence[WriteOperation]]
+]
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class BatchResult:
+    """Counts of documents read and written by batch helpers"""
+
+    read: int = 0
+    inserted: int = 0
+    matched: int = 0
+    modified: int = 0
+    deleted: int = 0
+    upserted: int = 0
+    batches: int = 0
+    last_id: Any = None
+
+    COUNTS = (
+        "read",
+        "inserted",
+        "matched",
+        "modified",
+        "deleted",
+        "upserted",
+        "batches",
+    )
+
+    def add(self, other: "BatchResult"):
+        """Add counts of other result"""
+        for name in self.COUNTS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def add_write_result(self, result: BulkWriteResult):
+        self.inserted += result.inserted_count
+        self.matched += result.matched_count
+        self.modified += result.modified_count
+        self.deleted += result.deleted_count
+        self.upserted += result.upserted_count
+
+
+def _range_filter(
+    filter: Optional[Mapping[str, Any]], start_after: Any
+) -> Dict[str, Any]:
+    if start_after is None:
+        return dict(filter or {})
+    id_filter = {"_id": {"$gt": start_after}}
+    if not filter:
+        return id_filter
+    return {"$and": [dict(filter), id_filter]}
+
+
+def iter_batches(
+    collection: Collection,
+    filter: Optional[Mapping[str, Any]] = None,
+    projection: Optional[Union[Mapping[str, Any], List[str]]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    start_after: Any = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate over documents in batches ordered by _id.
+
+    Every batch is fetched by a separate query for documents with _id greater
+    than the last one of the previous batch, so no cursor is kept open
+    while the batch is processed.
+
+    :param start_after: _id after which iteration starts, e.g. saved checkpoint
+    """
+    last_id = start_after
+    while True:
+        batch = list(
+            collection.find(
+                _range_filter(filter, last_id),
+                projection,
+                sort=[("_id", 1)],
+                limit=batch_size,
+            )
+        )
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]["_id"]
+
+
+def update_in_batches(
+    collection: Collection,
+    transform: Transform,
+    filter: Optional[Mapping[str, Any]] = None,
+    projection: Optional[Union[Mapping[str, Any], List[str]]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    start_after: Any = None,
+    on_batch: Optional[Callable[[BatchResult], None]] = None,
+    throttle: Optional[Throttle] = None,
+) -> BatchResult:
+    """
+    Apply `transform` to documents and write operations it returns.
+
+    Operations returned for a batch of documents are written with a single
+    unordered bulk write, so memory use is bounded by `batch_size`.
+
+    usage:
+
+     def upgrade(db, checkpoint):
+         update_in_batches(
+             db.users,
+             lambda user: UpdateOne(
+                 {"_id": user["_id"]}, {"$set": {"email": user["email"].lower()}}
+             ),
+             projection=["email"],
+             start_after=(checkpoint.data or {}).get("last_id"),
+             on_batch=lambda result: checkpoint.save({"last_id": result.last_id}),
+         )
+
+    :param transform:
+        function returning write operation, list of them or None for a document
+    :param start_after: _id after which processing starts, e.g. saved checkpoint
+    :param on_batch: called with totals after each batch is written
+    :param throttle: waited on after each batch is written
+    """
+    result = BatchResult()
+    for batch in iter_batches(collection, filter, projection, batch_size, start_after):
+        operations: List[WriteOperation] = []
+        for document in batch:
+            operation = transform(document)
+            if operation is None:
+                continue
+            if isinstance(operation, (list, tuple)):
+                operations.extend(operation)
+            else:
+                operations.append(operation)  # type: ignore
+        if operations:
+            result.add_write_result(collection.bulk_write(operations, ordered=False))
+        result.read += len(batch)
+        result.batches += 1
+        result.last_id = batch[-1]["_id"]
+        if on_batch is not None:
+            on_batch(result)
+        if throttle is not None:
+            throttle.wait()
+    return result
+
+
+def insert_in_batches(
+    collection: Collection,
+    documents: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    throttle: Optional[Throttle] = None,
+) -> BatchResult:
+    """
+    Insert documents, e.g. from a generator, with unordered bulk inserts
+    of at most `batch_size` documents.
+
+    :param throttle: waited on after each batch is written
+    """
+    result = BatchResult()
+    documents_iterator = iter(documents)
+    while True:
+        batch = list(islice(documents_iterator, batch_size))
+        if not batch:
+            return result
+        inserted = collection.insert_many(batch, ordered=False).inserted_ids
+        result.inserted += len(inserted)
+        result.batches += 1
+        if throttle is not None:
+            throttle.wait()
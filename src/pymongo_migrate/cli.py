@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from functools import wraps
 from pprint import pformat
 from typing import Optional
@@ -7,8 +8,10 @@ from typing import Optional
 import click
 import pymongo.monitoring
 
+from pymongo_migrate.fan_out import FanOutMigrate
 from pymongo_migrate.graph_draw import dump
 from pymongo_migrate.mongo_migrate import MongoMigrate
+from pymongo_migrate.stats import CommandStatsListener, CommandSummary
 
 
 @click.group()
@@ -17,28 +20,64 @@ def cli():
 
 
 class CommandLogger(pymongo.monitoring.CommandListener):
-    def __init__(self, verbose: int = 0):
+    """
+    Reports commands depending on verbosity:
+     -v summary of command counts, failures and latencies of the whole run
+     -vv every command start and its outcome
+     -vvv command documents, truncated to `dump_size` characters
+    """
+
+    def __init__(self, verbose: int = 0, dump_size: int = 1000):
         self.verbose = verbose
+        self.dump_size = dump_size
+        self.summary = CommandSummary()
+        self._lock = threading.Lock()
 
     def echo(self, *args, min_verbosity=1):
         if self.verbose >= min_verbosity:
             click.echo(*args)
 
+    def dump(self, document):
+        text = pformat(document)
+        if len(text) > self.dump_size:
+            text = (
+                f"{text[:self.dump_size]}..."
+                f" ({len(text) - self.dump_size} more characters)"
+            )
+        self.echo(text, min_verbosity=3)
+
     def started(self, event):
-        self.echo(f"Command {event.command_name}#{event.request_id} STARTED")
-        if self.verbose >= 1:
-            self.echo(pformat(event.command), min_verbosity=1)
+        self.echo(
+            f"Command {event.command_name}#{event.request_id} STARTED", min_verbosity=2
+        )
+        if self.verbose >= 3:
+            self.dump(event.command)
 
     def succeeded(self, event):
+        self._add(event)
         self.echo(
-            f"Command {event.command_name}#{event.request_id} SUCCEEDED in {event.duration_micros}us"
+            f"Command {event.command_name}#{event.request_id} SUCCEEDED in {event.duration_micros}us",
+            min_verbosity=2,
         )
 
     def failed(self, event):
+        self._add(event, failed=True)
         self.echo(
-            f"Command {event.command_name}#{event.request_id} FAILED in {event.duration_micros}us"
+            f"Command {event.command_name}#{event.request_id} FAILED in {event.duration_micros}us",
+            min_verbosity=2,
         )
 
+    def _add(self, event, failed=False):
+        if self.verbose >= 1:
+            with self._lock:
+                self.summary.add(event.command_name, event.duration_micros, failed)
+
+    def echo_summary(self):
+        if self.summary.latency:
+            self.echo("Commands summary:")
+            for line in self.summary.format():
+                self.echo(f"  {line}")
+
 
 def get_logger(verbose: int):
     logger = logging.getLogger(__name__)
@@ -59,18 +98,45 @@ def get_logger(verbose: int):
 def mongo_migrate_decor(f):
     @wraps(f)
     def wrap_with_client(
-        uri, database, migrations, collection, verbose, *args, **kwargs
+        uri,
+        database,
+        migrations,
+        collection,
+        manifest_cache,
+        state_index,
+        state_batch_size,
+        lock,
+        lock_ttl,
+        lock_timeout,
+        transaction_batch_size,
+        verbose,
+        dump_size,
+        *args,
+        **kwargs,
     ):
+        command_logger = CommandLogger(verbose=verbose, dump_size=dump_size)
+        command_stats = CommandStatsListener()
         mongo_migrate = MongoMigrate(
             client=pymongo.MongoClient(
-                uri, event_listeners=[CommandLogger(verbose=verbose)]
+                uri, event_listeners=[command_logger, command_stats]
             ),
             database=database,
             migrations_dir=migrations,
             migrations_collection=collection,
             logger=get_logger(verbose),
+            manifest_cache=manifest_cache,
+            state_index=state_index,
+            state_batch_size=state_batch_size,
+            lock=lock,
+            lock_ttl=lock_ttl,
+            lock_timeout=lock_timeout,
+            transaction_batch_size=transaction_batch_size,
+            command_stats=command_stats,
         )
-        return f(mongo_migrate, *args, **kwargs)
+        try:
+            return f(mongo_migrate, *args, **kwargs)
+        finally:
+            command_logger.echo_summary()
 
     return wrap_with_client
 
@@ -114,26 +180,122 @@ def mongo_migration_options(f):
             help="mongodb collection used for storing migration states",
             show_default=True,
         ),
-        click.option("-v", "--verbose", count=True),
+        click.option(
+            "--manifest-cache/--no-manifest-cache",
+            default=MongoMigrate.manifest_cache,
+            envvar="PYMONGO_MIGRATE_MANIFEST_CACHE",
+            help="cache migrations metadata in the migration script directory",
+            show_default=True,
+        ),
+        click.option(
+            "--state-index/--no-state-index",
+            default=MongoMigrate.state_index,
+            envvar="PYMONGO_MIGRATE_STATE_INDEX",
+            help="ensure unique index on migration name in migration states collection",
+            show_default=True,
+        ),
+        click.option(
+            "--state-batch-size",
+            default=MongoMigrate.state_batch_size,
+            type=click.IntRange(min=1),
+            envvar="PYMONGO_MIGRATE_STATE_BATCH_SIZE",
+            help="number of migration states written in single bulk write",
+            show_default=True,
+        ),
+        click.option(
+            "--lock/--no-lock",
+            default=MongoMigrate.lock,
+            envvar="PYMONGO_MIGRATE_LOCK",
+            help="hold lock in mongodb, so only one process runs migrations at once",
+            show_default=True,
+        ),
+        click.option(
+            "--lock-ttl",
+            default=MongoMigrate.lock_ttl,
+            type=float,
+            envvar="PYMONGO_MIGRATE_LOCK_TTL",
+            help="seconds after which lock of unresponsive process expires",
+            show_default=True,
+        ),
+        click.option(
+            "--lock-timeout",
+            default=MongoMigrate.lock_timeout,
+            type=float,
+            envvar="PYMONGO_MIGRATE_LOCK_TIMEOUT",
+            help="seconds to wait for lock, waits indefinitely by default",
+        ),
+        click.option(
+            "--transaction-batch-size",
+            default=MongoMigrate.transaction_batch_size,
+            type=click.IntRange(min=0),
+            envvar="PYMONGO_MIGRATE_TRANSACTION_BATCH_SIZE",
+            help="number of consecutive transactional migrations run in single transaction, 0 disables transactions",
+            show_default=True,
+        ),
+        click.option(
+            "-v",
+            "--verbose",
+            count=True,
+            help="-v: debug logs and commands summary, -vv: every command, -vvv: command documents",
+        ),
+        click.option(
+            "--dump-size",
+            default=1000,
+            type=click.IntRange(min=0),
+            envvar="PYMONGO_MIGRATE_DUMP_SIZE",
+            help="maximum number of characters of command documents printed with -vvv",
+            show_default=True,
+        ),
         mongo_migrate_decor,
     )
 
 
+def _format_stats(stats: Optional[dict]) -> str:
+    if not stats:
+        return ""
+    commands = sum(stats["commands"].values())
+    return (
+        f"\t{stats['duration']:.3f}s\t{commands}"
+        f"\t{stats['documents_read']}\t{stats['documents_written']}"
+        f"\t{stats['bytes_sent'] + stats['bytes_received']}"
+    )
+
+
 @cli.command(short_help="show migrations and their status")
 @mongo_migration_options
-def show(mongo_migrate):
+@click.option(
+    "--stats", is_flag=True, help="show execution statistics of applied migrations"
+)
+def show(mongo_migrate, stats=False):
     name_len_max = max(
         (len(migration.name) for migration in mongo_migrate.get_migrations()), default=0
     )
 
     migration_column_name = "Migration name".ljust(name_len_max)
-    click.secho(f"{migration_column_name}\tApplied timestamp", fg="yellow")
+    header = f"{migration_column_name}\tApplied timestamp"
+    if stats:
+        header += "\t\tDuration\tCommands\tRead\tWritten\tBytes"
+    click.secho(header, fg="yellow")
+    if mongo_migrate.load_states(verify=False) and not mongo_migrate.has_state_index():
+        warning = (
+            f"Warning: unique index on {mongo_migrate.migrations_collection}.name"
+            " is missing"
+        )
+        if mongo_migrate.state_index:
+            warning += ", it will be created by next migration run"
+        click.secho(warning, fg="yellow", err=True)
     for migration in mongo_migrate.get_migrations():
         migration_state = mongo_migrate.get_state(migration)
         if migration_state.applied:
             applied_text = click.style(migration_state.applied.isoformat(), fg="green")
+        elif migration_state.checkpoint is not None:
+            applied_text = click.style(
+                f"In progress: {migration_state.checkpoint}", fg="yellow"
+            )
         else:
             applied_text = click.style("Not applied", fg="red")
+        if stats:
+            applied_text += _format_stats(migration_state.stats)
         click.echo(f"{migration.name.ljust(name_len_max)}\t" + applied_text)
 
 
@@ -143,29 +305,149 @@ def migrate_cmd_options(f):
         mongo_migration_options,
         click.argument("migration", required=False),
         click.option("--fake", is_flag=True),
+        click.option(
+            "--profile",
+            default=None,
+            type=click.Path(file_okay=False),
+            help="profile migrations, saving .pstats file of each one to given directory",
+        ),
+        click.option(
+            "--profile-top",
+            default=MongoMigrate.profile_top,
+            type=click.IntRange(min=0),
+            help="number of top functions of each profile to print",
+            show_default=True,
+        ),
     )
 
 
+def _set_profile(mongo_migrate, profile, profile_top):
+    mongo_migrate.profile_dir = profile
+    mongo_migrate.profile_top = profile_top
+
+
+workers_option = click.option(
+    "-j",
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    envvar="PYMONGO_MIGRATE_WORKERS",
+    help="number of independent upgrade migrations run concurrently",
+    show_default=True,
+)
+
+
 @cli.command(
     short_help="automagically apply necessary upgrades or downgrades to reach target migration"
 )
 @migrate_cmd_options
-def migrate(mongo_migrate, migration=None, fake=False):
-    mongo_migrate.migrate(migration, fake=fake)
+@workers_option
+def migrate(
+    mongo_migrate,
+    migration=None,
+    fake=False,
+    profile=None,
+    profile_top=MongoMigrate.profile_top,
+    workers=1,
+):
+    _set_profile(mongo_migrate, profile, profile_top)
+    mongo_migrate.migrate(migration, fake=fake, workers=workers)
 
 
 @cli.command(short_help="apply necessary upgrades to reach target migration")
 @migrate_cmd_options
-def upgrade(mongo_migrate, migration=None, fake=False):
-    mongo_migrate.upgrade(migration, fake=fake)
+@workers_option
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="only record writes of migrations and explain their filters",
+)
+@click.option(
+    "--explain-execution",
+    is_flag=True,
+    help="execute explained filters of dry run to count examined documents",
+)
+def upgrade(
+    mongo_migrate,
+    migration=None,
+    fake=False,
+    profile=None,
+    profile_top=MongoMigrate.profile_top,
+    workers=1,
+    dry_run=False,
+    explain_execution=False,
+):
+    _set_profile(mongo_migrate, profile, profile_top)
+    mongo_migrate.upgrade(
+        migration,
+        fake=fake,
+        workers=workers,
+        dry_run=dry_run,
+        explain_execution=explain_execution,
+    )
 
 
 @cli.command(short_help="apply necessary downgrades to reach target migration")
 @migrate_cmd_options
-def downgrade(mongo_migrate, migration, fake=False):
+def downgrade(
+    mongo_migrate,
+    migration,
+    fake=False,
+    profile=None,
+    profile_top=MongoMigrate.profile_top,
+):
+    _set_profile(mongo_migrate, profile, profile_top)
     mongo_migrate.downgrade(migration, fake=fake)
 
 
+@cli.command(short_help="migrate many databases, e.g. one per tenant, concurrently")
+@mongo_migration_options
+@click.argument("databases", nargs=-1)
+@click.option(
+    "--pattern", default=None, help="regular expression matching databases to migrate"
+)
+@click.option("--migration", default=None, help="target migration")
+@click.option("--fake", is_flag=True)
+@click.option(
+    "--concurrency",
+    default=FanOutMigrate.concurrency,
+    type=click.IntRange(min=1),
+    envvar="PYMONGO_MIGRATE_CONCURRENCY",
+    help="number of databases migrated at once",
+    show_default=True,
+)
+def migrate_databases(
+    mongo_migrate,
+    databases=(),
+    pattern=None,
+    migration=None,
+    fake=False,
+    concurrency=FanOutMigrate.concurrency,
+):
+    fan_out = FanOutMigrate(
+        mongo_migrate,
+        databases=list(databases),
+        database_pattern=pattern,
+        concurrency=concurrency,
+    )
+    if not fan_out.list_databases():
+        raise click.UsageError("No databases given or matching pattern")
+    results = fan_out.migrate(migration, fake=fake)
+    for result in results:
+        click.secho(result.format(), fg="green" if result.ok else "red")
+    failed = sum(not result.ok for result in results)
+    click.echo(f"Migrated {len(results) - failed} databases, {failed} failed")
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command(short_help="mark migrations as applied without running them")
+@mongo_migration_options
+@click.argument("migration", required=False)
+def mark_applied(mongo_migrate, migration=None):
+    mongo_migrate.mark_applied(migration)
+
+
 @cli.command()
 @mongo_migration_options
 @click.argument("name", required=False)
@@ -180,6 +462,38 @@ def generate(mongo_migrate, name: Optional[str] = None):
     )
 
 
+@cli.command(short_help="generate migration replacing range of migrations")
+@mongo_migration_options
+@click.argument("start", required=False)
+@click.argument("end", required=False)
+@click.option("--name", default="", help="name of squashed migration")
+def squash(mongo_migrate, start=None, end=None, name=""):
+    file_path = mongo_migrate.squash(start, end, name=name)
+    click.echo(
+        "Generated: "
+        + click.style(f"{file_path.parent}{os.sep}", fg="bright_black")
+        + click.style(file_path.stem, fg="green")
+        + click.style(file_path.suffix, fg="bright_black")
+    )
+
+
+@cli.command(short_help="dump database into snapshot archive")
+@mongo_migration_options
+@click.argument("file", type=click.Path(dir_okay=False, writable=True))
+@click.argument("migration", required=False)
+def snapshot(mongo_migrate, file, migration=None):
+    counts = mongo_migrate.snapshot(file, migration)
+    click.echo(f"Dumped {sum(counts.values())} documents of {len(counts)} collections")
+
+
+@cli.command(short_help="load snapshot archive and apply migrations following it")
+@mongo_migration_options
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("migration", required=False)
+def restore_snapshot(mongo_migrate, file, migration=None):
+    mongo_migrate.restore_snapshot(file, migration)
+
+
 @cli.command()
 @mongo_migration_options
 def graph(mongo_migrate):
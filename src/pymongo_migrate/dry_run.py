@@ -0,0 +1,469 @@
+"""Run migrations without modifying the database, explaining their writes"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+COLLECTION_READ_ATTRIBUTES = {
+    "codec_options",
+    "count_documents",
+    "distinct",
+    "estimated_document_count",
+    "find",
+    "find_one",
+    "find_raw_batches",
+    "full_name",
+    "index_information",
+    "list_indexes",
+    "list_search_indexes",
+    "name",
+    "options",
+    "read_concern",
+    "read_preference",
+    "watch",
+    "write_concern",
+}
+
+DATABASE_READ_ATTRIBUTES = {
+    "codec_options",
+    "dereference",
+    "list_collection_names",
+    "list_collections",
+    "name",
+    "read_concern",
+    "read_preference",
+    "validate_collection",
+    "watch",
+    "write_concern",
+}
+
+CLIENT_READ_ATTRIBUTES = {
+    "address",
+    "codec_options",
+    "list_database_names",
+    "list_databases",
+    "nodes",
+    "primary",
+    "read_concern",
+    "read_preference",
+    "secondaries",
+    "server_info",
+    "topology_description",
+    "write_concern",
+}
+
+READ_COMMANDS = {
+    "aggregate",
+    "buildInfo",
+    "collStats",
+    "count",
+    "dbStats",
+    "distinct",
+    "explain",
+    "find",
+    "listCollections",
+    "listIndexes",
+    "ping",
+    "serverStatus",
+}
+
+
+@dataclass
+class QueryPlan:
+    """Winning plan of write's filter as reported by `explain`"""
+
+    stages: List[str] = field(default_factory=list)
+    index_names: List[str] = field(default_factory=list)
+    docs_examined: Optional[int] = None
+    keys_examined: Optional[int] = None
+
+    @property
+    def collection_scan(self) -> bool:
+        return "COLLSCAN" in self.stages
+
+    def format(self) -> str:
+        scan = "COLLSCAN" if self.collection_scan else "/".join(self.stages)
+        indexes = f" using {', '.join(self.index_names)}" if self.index_names else ""
+        if self.docs_examined is None:
+            return f"{scan}{indexes}"
+        return (
+            f"{scan}{indexes}, {self.docs_examined} documents"
+            f" and {self.keys_examined} keys examined"
+        )
+
+
+@dataclass
+class RecordedWrite:
+    """Write captured instead of being executed"""
+
+    collection: str
+    operation: str
+    filter: Optional[Mapping[str, Any]] = None
+    update: Any = None
+    documents: int = 0
+    multi: bool = False
+    plan: Optional[QueryPlan] = None
+
+    def format(self) -> str:
+        text = f"{self.collection}.{self.operation}"
+        if self.documents:
+            text += f" {self.documents} documents"
+        if self.filter is not None:
+            text += f" {dict(self.filter)!r}"
+        if self.plan is not None:
+            text += f": {self.plan.format()}"
+        return text
+
+
+def _walk_plan(plan: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for value in plan.values():
+            yield from _walk_plan(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _walk_plan(value)
+
+
+def explain_filter(
+    collection: Collection,
+    filter: Optional[Mapping[str, Any]],
+    multi: bool = True,
+    execute: bool = False,
+) -> QueryPlan:
+    """
+    Explain how documents matching filter are found.
+
+    Only the query planner is consulted, unless `execute` is set - then
+    the query is run on server to report numbers of examined documents and keys.
+    """
+    find: Dict[str, Any] = {"find": collection.name, "filter": filter or {}}
+    if not multi:
+        find["limit"] = 1
+    explain = collection.database.command(
+        "explain", find, verbosity="executionStats" if execute else "queryPlanner"
+    )
+    plan = QueryPlan()
+    for stage in _walk_plan(explain.get("queryPlanner", {}).get("winningPlan")):
+        plan.stages.append(stage["stage"])
+        if "indexName" in stage:
+            plan.index_names.append(stage["indexName"])
+    if execute:
+        execution_stats = explain.get("executionStats", {})
+        plan.docs_examined = execution_stats.get("totalDocsExamined", 0)
+        plan.keys_examined = execution_stats.get("totalKeysExamined", 0)
+    return plan
+
+
+def _filter_shape(value: Any) -> Any:
+    """
+    Hashable shape of filter - its fields and operators, with values
+    replaced by their type names, so filters differing only in values
+    share a query plan.
+    """
+    if isinstance(value, Mapping):
+        return tuple((key, _filter_shape(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return frozenset(_filter_shape(item) for item in value)
+    return type(value).__name__
+
+
+def _dunder(name: str) -> bool:
+    return name.startswith("__") and name.endswith("__")
+
+
+def _unsupported(owner: str, name: str) -> NotImplementedError:
+    return NotImplementedError(
+        f"{owner}.{name} is not supported in dry run mode,"
+        " as it is not known to be read-only"
+    )
+
+
+class RecordingCollection:
+    """
+    Collection proxy which runs reads, but only records writes.
+
+    Results of recorded writes are unacknowledged, so their counts
+    can not be accessed.
+    """
+
+    def __init__(self, collection: Collection, writes: List[RecordedWrite]):
+        self._collection = collection
+        self._writes = writes
+
+    def __getattr__(self, name: str):
+        if _dunder(name):
+            raise AttributeError(name)
+        if name in COLLECTION_READ_ATTRIBUTES:
+            return getattr(self._collection, name)
+        attr = getattr(self._collection, name)
+        if isinstance(attr, Collection):
+            return RecordingCollection(attr, self._writes)
+        raise _unsupported("Collection", name)
+
+    def __getitem__(self, name: str) -> "RecordingCollection":
+        return RecordingCollection(self._collection[name], self._writes)
+
+    @property
+    def database(self) -> "RecordingDatabase":
+        return RecordingDatabase(self._collection.database, self._writes)
+
+    def with_options(self, *args, **kwargs) -> "RecordingCollection":
+        return RecordingCollection(
+            self._collection.with_options(*args, **kwargs), self._writes
+        )
+
+    def _record(self, operation: str, **kwargs):
+        self._writes.append(
+            RecordedWrite(
+                collection=self._collection.name, operation=operation, **kwargs
+            )
+        )
+
+    def insert_one(self, document, *args, **kwargs) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self._record("insert_one", documents=1)
+        return InsertOneResult(document["_id"], acknowledged=False)
+
+    def insert_many(self, documents, *args, **kwargs) -> InsertManyResult:
+        inserted_ids = []
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            inserted_ids.append(document["_id"])
+        self._record("insert_many", documents=len(inserted_ids))
+        return InsertManyResult(inserted_ids, acknowledged=False)
+
+    def update_one(self, filter, update, *args, **kwargs) -> UpdateResult:
+        self._record("update_one", filter=filter, update=update)
+        return UpdateResult({}, acknowledged=False)
+
+    def update_many(self, filter, update, *args, **kwargs) -> UpdateResult:
+        self._record("update_many", filter=filter, update=update, multi=True)
+        return UpdateResult({}, acknowledged=False)
+
+    def replace_one(self, filter, replacement, *args, **kwargs) -> UpdateResult:
+        self._record("replace_one", filter=filter, update=replacement)
+        return UpdateResult({}, acknowledged=False)
+
+    def delete_one(self, filter, *args, **kwargs) -> DeleteResult:
+        self._record("delete_one", filter=filter)
+        return DeleteResult({}, acknowledged=False)
+
+    def delete_many(self, filter, *args, **kwargs) -> DeleteResult:
+        self._record("delete_many", filter=filter, multi=True)
+        return DeleteResult({}, acknowledged=False)
+
+    def _find_one_and(self, operation, filter, update=None, **kwargs):
+        self._record(operation, filter=filter, update=update)
+        return self._collection.find_one(
+            filter, kwargs.get("projection"), sort=kwargs.get("sort")
+        )
+
+    def find_one_and_update(self, filter, update, **kwargs):
+        return self._find_one_and("find_one_and_update", filter, update, **kwargs)
+
+    def find_one_and_replace(self, filter, replacement, **kwargs):
+        return self._find_one_and("find_one_and_replace", filter, replacement, **kwargs)
+
+    def find_one_and_delete(self, filter, **kwargs):
+        return self._find_one_and("find_one_and_delete", filter, **kwargs)
+
+    def bulk_write(self, requests, *args, **kwargs) -> BulkWriteResult:
+        """
+        Record each request of bulk write with its filter, so it is explained
+        like the corresponding single write.
+        """
+        for request in requests:
+            operation = type(request).__name__
+            if operation == "InsertOne":
+                self._record(operation, documents=1)
+            else:
+                self._record(
+                    operation,
+                    filter=getattr(request, "_filter", None),
+                    update=getattr(request, "_doc", None),
+                    multi=operation in ("UpdateMany", "DeleteMany"),
+                )
+        return BulkWriteResult({}, acknowledged=False)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        if pipeline and {"$out", "$merge"} & set(pipeline[-1]):
+            self._record("aggregate", update=pipeline)
+            return iter(())
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+
+    def create_index(self, keys, *args, **kwargs):
+        self._record("create_index", update=keys)
+
+    def create_indexes(self, indexes, *args, **kwargs):
+        self._record("create_indexes", update=indexes)
+        return []
+
+    def drop_index(self, index_or_name, *args, **kwargs):
+        self._record("drop_index", update=index_or_name)
+
+    def drop_indexes(self, *args, **kwargs):
+        self._record("drop_indexes")
+
+    def drop(self, *args, **kwargs):
+        self._record("drop")
+
+    def rename(self, new_name, *args, **kwargs):
+        self._record("rename", update=new_name)
+
+
+class RecordingDatabase:
+    """
+    Database proxy given to migrations in dry run mode.
+
+    Reads are run normally, writes are only recorded in `writes`, so
+    `explain_writes` can report how expensive they would be.
+    Anything not known to be read-only raises NotImplementedError.
+
+    usage:
+
+     recording_db = RecordingDatabase(db)
+     migration.upgrade(recording_db)
+     for write in recording_db.explain_writes():
+         print(write.format())
+    """
+
+    def __init__(
+        self, database: Database, writes: Optional[List[RecordedWrite]] = None
+    ):
+        self._database = database
+        self.writes: List[RecordedWrite] = [] if writes is None else writes
+
+    def __getattr__(self, name: str):
+        if _dunder(name):
+            raise AttributeError(name)
+        if name in DATABASE_READ_ATTRIBUTES:
+            return getattr(self._database, name)
+        attr = getattr(self._database, name)
+        if isinstance(attr, Collection):
+            return RecordingCollection(attr, self.writes)
+        raise _unsupported("Database", name)
+
+    def __getitem__(self, name: str) -> RecordingCollection:
+        return RecordingCollection(self._database[name], self.writes)
+
+    @property
+    def client(self) -> "RecordingClient":
+        return RecordingClient(self._database.client, self.writes)
+
+    def with_options(self, *args, **kwargs) -> "RecordingDatabase":
+        return RecordingDatabase(
+            self._database.with_options(*args, **kwargs), self.writes
+        )
+
+    def get_collection(self, name: str, *args, **kwargs) -> RecordingCollection:
+        return RecordingCollection(
+            self._database.get_collection(name, *args, **kwargs), self.writes
+        )
+
+    def create_collection(self, name: str, *args, **kwargs) -> RecordingCollection:
+        self.writes.append(RecordedWrite(collection=name, operation="create"))
+        return self[name]
+
+    def drop_collection(self, name_or_collection, *args, **kwargs):
+        name = getattr(name_or_collection, "name", name_or_collection)
+        self.writes.append(RecordedWrite(collection=name, operation="drop"))
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        if pipeline and {"$out", "$merge"} & set(pipeline[-1]):
+            self.writes.append(
+                RecordedWrite(collection="", operation="aggregate", update=pipeline)
+            )
+            return iter(())
+        return self._database.aggregate(pipeline, *args, **kwargs)
+
+    def command(self, command, *args, **kwargs):
+        command_name = command if isinstance(command, str) else next(iter(command))
+        if command_name in READ_COMMANDS:
+            return self._database.command(command, *args, **kwargs)
+        collection = args[0] if isinstance(command, str) and args else ""
+        if isinstance(command, Mapping):
+            collection = command[command_name]
+        self.writes.append(
+            RecordedWrite(
+                collection=str(collection), operation=command_name, update=command
+            )
+        )
+        return {"ok": 1.0}
+
+    def explain_writes(self, execute: bool = False) -> List[RecordedWrite]:
+        """
+        Explain filters of recorded writes, setting their `plan`,
+        see `explain_filter`.
+
+        Unless `execute` is set, filters of the same shape are explained once,
+        as migrations writing in batches record many writes differing only
+        in filter values.
+        """
+        plans: Dict[Any, Optional[QueryPlan]] = {}
+        for write in self.writes:
+            if write.filter is None:
+                continue
+            key = (write.collection, _filter_shape(write.filter), write.multi)
+            if not execute and key in plans:
+                write.plan = plans[key]
+                continue
+            try:
+                write.plan = explain_filter(
+                    self._database[write.collection],
+                    write.filter,
+                    write.multi,
+                    execute=execute,
+                )
+            except OperationFailure:
+                write.plan = None
+            plans[key] = write.plan
+        return self.writes
+
+
+class RecordingClient:
+    """Client proxy giving access to other databases in dry run mode"""
+
+    def __init__(self, client: MongoClient, writes: List[RecordedWrite]):
+        self._client = client
+        self._writes = writes
+
+    def __getattr__(self, name: str):
+        if _dunder(name):
+            raise AttributeError(name)
+        if name in CLIENT_READ_ATTRIBUTES:
+            return getattr(self._client, name)
+        attr = getattr(self._client, name)
+        if isinstance(attr, Database):
+            return RecordingDatabase(attr, self._writes)
+        raise _unsupported("MongoClient", name)
+
+    def __getitem__(self, name: str) -> RecordingDatabase:
+        return RecordingDatabase(self._client[name], self._writes)
+
+    def get_database(self, *args, **kwargs) -> RecordingDatabase:
+        return RecordingDatabase(
+            self._client.get_database(*args, **kwargs), self._writes
+        )
+
+    def get_default_database(self, *args, **kwargs) -> RecordingDatabase:
+        return RecordingDatabase(
+            self._client.get_default_database(*args, **kwargs), self._writes
+        )
+
+    def drop_database(self, name_or_database, *args, **kwargs):
+        name = getattr(name_or_database, "name", name_or_database)
+        self._writes.append(RecordedWrite(collection=name, operation="dropDatabase"))
@@ -0,0 +1,135 @@
+"""Migrate many databases, e.g. one per tenant, with a single client"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+
+@dataclass
+class DatabaseResult:
+    """Outcome of migrating single database"""
+
+    database: str
+    migration: Optional[str] = None
+    duration: float = 0.0
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def format(self) -> str:
+        if self.error is not None:
+            return f"{self.database}: FAILED in {self.duration:.3f}s: {self.error!r}"
+        return f"{self.database}: at {self.migration} in {self.duration:.3f}s"
+
+
+@dataclass
+class FanOutMigrate:
+    """
+    Run migrations of many databases concurrently.
+
+    MongoMigrate of each database is a copy of `mongo_migrate`, sharing its
+    client with connection pool, and migrations loaded and verified once.
+    Failure of one database is recorded in its result and does not stop
+    migrations of the others.
+
+    usage:
+
+     fan_out = FanOutMigrate(
+         MongoMigrate(client, "template"), database_pattern=r"^tenant_"
+     )
+     for result in fan_out.migrate():
+         print(result.format())
+    """
+
+    mongo_migrate: MongoMigrate
+    databases: List[str] = field(default_factory=list)
+    database_pattern: Optional[str] = None
+    concurrency: int = 8
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self.mongo_migrate.logger
+
+    def list_databases(self) -> List[str]:
+        """Get given databases followed by the ones matching `database_pattern`"""
+        databases = list(self.databases)
+        if self.database_pattern is not None:
+            pattern = re.compile(self.database_pattern)
+            databases.extend(
+                name
+                for name in sorted(self.mongo_migrate.client.list_database_names())
+                if pattern.search(name) and name not in databases
+            )
+        return databases
+
+    def run(self, action: Callable[[MongoMigrate], Any]) -> List[DatabaseResult]:
+        """
+        Call action with MongoMigrate of each database,
+        at most `concurrency` of them at once.
+
+        :return: results in order of `list_databases`
+        """
+        databases = self.list_databases()
+        self.logger.info(
+            "Migrating %d databases, %d at once", len(databases), self.concurrency
+        )
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="pymongo-migrate"
+        ) as executor:
+            results = list(
+                executor.map(
+                    lambda database: self._run_database(database, action), databases
+                )
+            )
+        failed = sum(not result.ok for result in results)
+        self.logger.info(
+            "Migrated %d databases, %d failed", len(results) - failed, failed
+        )
+        return results
+
+    def _run_database(
+        self, database: str, action: Callable[[MongoMigrate], Any]
+    ) -> DatabaseResult:
+        result = DatabaseResult(database=database)
+        start = time.perf_counter()
+        try:
+            mongo_migrate = self.mongo_migrate.for_database(database)
+            action(mongo_migrate)
+            states = mongo_migrate.load_states()
+            for migration in mongo_migrate.graph:
+                state = states.get(migration.name)
+                if state and state.applied:
+                    result.migration = migration.name
+        except Exception as e:
+            self.logger.exception("Migrating database %r failed", database)
+            result.error = e
+        result.duration = time.perf_counter() - start
+        return result
+
+    def migrate(
+        self, migration_name: Optional[str] = None, fake: bool = False
+    ) -> List[DatabaseResult]:
+        return self.run(
+            lambda mongo_migrate: mongo_migrate.migrate(migration_name, fake)
+        )
+
+    def upgrade(
+        self, migration_name: Optional[str] = None, fake: bool = False
+    ) -> List[DatabaseResult]:
+        return self.run(
+            lambda mongo_migrate: mongo_migrate.upgrade(migration_name, fake)
+        )
+
+    def downgrade(
+        self, migration_name: Optional[str] = None, fake: bool = False
+    ) -> List[DatabaseResult]:
+        return self.run(
+            lambda mongo_migrate: mongo_migrate.downgrade(migration_name, fake)
+        )
@@ -20,6 +20,54 @@ def upgrade(db: "pymongo.database.Database"):
 def downgrade(db: "pymongo.database.Database"):
     pass
 '''
+SQUASHED_MIGRATION_MODULE_TMPL = '''\
+"""
+{description}
+"""
+import pymongo
+
+from pymongo_migrate.loader import run_replaced_migrations
+
+name = {name!r}
+dependencies = {dependencies!r}
+replaces = {replaces!r}
+
+
+def upgrade(db: "pymongo.database.Database", checkpoint=None, session=None):
+    # Runs replaced migrations one by one. Rewrite it to bring a fresh database
+    # to their final state directly, before their modules are removed.
+    run_replaced_migrations(
+        __file__, replaces, "upgrade", db, checkpoint=checkpoint, session=session
+    )
+
+
+def downgrade(db: "pymongo.database.Database", session=None):
+    run_replaced_migrations(__file__, replaces, "downgrade", db, session=session)
+'''
+ASYNC_SQUASHED_MIGRATION_MODULE_TMPL = '''\
+"""
+{description}
+"""
+import pymongo
+
+from pymongo_migrate.loader import run_replaced_migrations_async
+
+name = {name!r}
+dependencies = {dependencies!r}
+replaces = {replaces!r}
+
+
+async def upgrade(db: "pymongo.asynchronous.database.AsyncDatabase", checkpoint=None):
+    # Runs replaced migrations one by one. Rewrite it to bring a fresh database
+    # to their final state directly, before their modules are removed.
+    await run_replaced_migrations_async(
+        __file__, replaces, "upgrade", db, checkpoint=checkpoint
+    )
+
+
+async def downgrade(db: "pymongo.asynchronous.database.AsyncDatabase"):
+    await run_replaced_migrations_async(__file__, replaces, "downgrade", db)
+'''
 MAX_NAME_LEN = 60
 
 
@@ -44,8 +92,34 @@ def generate_migration_module(
     fp.write(content)
 
 
+def generate_squashed_migration_module(
+    fp,
+    name: str,
+    replaces: List[str],
+    description: str = "Squashed migrations",
+    dependencies: Optional[List[str]] = None,
+    asynchronous: bool = False,
+):
+    template = (
+        ASYNC_SQUASHED_MIGRATION_MODULE_TMPL
+        if asynchronous
+        else SQUASHED_MIGRATION_MODULE_TMPL
+    )
+    content = template.format(
+        name=name,
+        description=description,
+        dependencies=dependencies or [],
+        replaces=replaces,
+    )
+    fp.write(content)
+
+
 def generate_migration_module_in_dir(
-    migration_dir: Path, name: str = "", *args, **kwargs
+    migration_dir: Path,
+    name: str = "",
+    *args,
+    generate_module=generate_migration_module,
+    **kwargs,
 ) -> Path:
     now = datetime.datetime.utcnow()
     if not name:
@@ -59,5 +133,5 @@ def generate_migration_module_in_dir(
         raise FileExistsError(f"{file_path} already exists")
 
     with file_path.open("w") as f:
-        generate_migration_module(f, name=name, *args, **kwargs)  # type: ignore
+        generate_module(f, name=name, *args, **kwargs)
     return file_path
@@ -10,7 +10,7 @@ def dump(graph: MigrationsGraph, output_file: TextIO):
     output_file.write("// Migrations\n")
     output_file.write("digraph {\n")
     for migration in graph.migrations.values():
-        for dependency_name in migration.dependencies:
+        for dependency_name in graph.get_dependencies(migration):
             dependency = graph.migrations[dependency_name]
             output_file.write(f"\t{dependency.name!r} -> {migration.name!r}\n")
     output_file.write("}\n")
@@ -0,0 +1,160 @@
+"""Indexes declared by migrations, built and dropped by the runner"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Mapping
+
+from pymongo import IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+LOGGER = logging.getLogger(__name__)
+
+IGNORED_OPTIONS = {"v", "ns", "background"}
+NAMESPACE_NOT_FOUND = 26
+INDEX_NOT_FOUND = 27
+
+
+def _normalize(spec: Mapping[str, Any]) -> Dict[str, Any]:
+    normalized = {k: v for k, v in spec.items() if k not in IGNORED_OPTIONS}
+    normalized["key"] = list(dict(spec["key"]).items())
+    return normalized
+
+
+class Index:
+    """
+    Index declared in `indexes` of migration module.
+
+    Indexes are built after module's upgrade function, if any, is run
+    and dropped before its downgrade function is run.
+    Arguments are the same as of `pymongo.IndexModel`, preceded by
+    collection name.
+
+    usage:
+
+     indexes = [
+         Index("users", [("email", pymongo.ASCENDING)], unique=True),
+         Index("orders", "created"),
+     ]
+    """
+
+    def __init__(self, collection: str, keys, **options):
+        self.collection = collection
+        self.document = IndexModel(keys, **options).document
+
+    @property
+    def name(self) -> str:
+        return self.document["name"]
+
+    def matches(self, spec: Mapping[str, Any]) -> bool:
+        """Check if index described by `list_indexes` is identical to this one"""
+        return _normalize(spec) == _normalize(self.document)
+
+    def __repr__(self):
+        return f"Index({self.collection!r}, {self.name!r})"
+
+
+def _log_progress(
+    db: Database, collections: Iterable[str], logger: logging.Logger
+) -> None:
+    namespaces = [f"{db.name}.{collection}" for collection in collections]
+    try:
+        operations = db.client.admin.command(
+            {
+                "currentOp": 1,
+                "ns": {"$in": namespaces},
+                "$or": [
+                    {"command.createIndexes": {"$exists": True}},
+                    {"msg": {"$regex": "^Index Build"}},
+                ],
+            }
+        ).get("inprog", [])
+    except OperationFailure as e:
+        logger.debug("Could not read progress of index builds: %s", e)
+        return
+    for operation in operations:
+        progress = operation.get("progress") or {}
+        message = operation.get("msg", "in progress")
+        if progress.get("total"):
+            logger.info(
+                "Building indexes on %s: %s (%d/%d)",
+                operation["ns"],
+                message,
+                progress["done"],
+                progress["total"],
+            )
+        else:
+            logger.info("Building indexes on %s: %s", operation["ns"], message)
+
+
+def build_indexes(
+    db: Database,
+    indexes: Iterable[Index],
+    poll_interval: float = 5.0,
+    logger: logging.Logger = LOGGER,
+) -> List[Index]:
+    """
+    Build indexes which do not exist yet.
+
+    Indexes of the same collection are built by single `createIndexes`
+    command, so collection is scanned once, while builds of different
+    collections run concurrently. Their progress is logged from `currentOp`
+    every `poll_interval` seconds.
+
+    Identical existing index counts as built. Build of an identical index
+    which is still in progress, e.g. started by interrupted run, is waited for.
+
+    :return: indexes which were built
+    """
+    existing: Dict[str, List[Mapping[str, Any]]] = {}
+    pending: Dict[str, List[Index]] = {}
+    for index in indexes:
+        if index.collection not in existing:
+            existing[index.collection] = list(db[index.collection].list_indexes())
+        if any(index.matches(spec) for spec in existing[index.collection]):
+            logger.info("Index %r already exists", index)
+            continue
+        pending.setdefault(index.collection, []).append(index)
+    if not pending:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=len(pending), thread_name_prefix="pymongo-migrate-index"
+    ) as executor:
+        futures = []
+        for collection, collection_indexes in pending.items():
+            logger.info(
+                "Building indexes %s on %r",
+                ", ".join(index.name for index in collection_indexes),
+                collection,
+            )
+            futures.append(
+                executor.submit(
+                    db.command,
+                    "createIndexes",
+                    collection,
+                    indexes=[index.document for index in collection_indexes],
+                )
+            )
+        while wait(futures, timeout=poll_interval).not_done:
+            _log_progress(db, pending, logger)
+        for future in futures:
+            future.result()
+    return [
+        index for collection_indexes in pending.values() for index in collection_indexes
+    ]
+
+
+def drop_indexes(
+    db: Database, indexes: Iterable[Index], logger: logging.Logger = LOGGER
+) -> None:
+    """Drop indexes in reverse order, skipping the ones which do not exist"""
+    for index in reversed(list(indexes)):
+        try:
+            db[index.collection].drop_index(index.name)
+        except OperationFailure as e:
+            if e.code not in (NAMESPACE_NOT_FOUND, INDEX_NOT_FOUND):
+                raise
+            logger.info("Index %r does not exist", index)
+        else:
+            logger.info("Dropped index %r", index)
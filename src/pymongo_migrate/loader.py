@@ -1,23 +1,233 @@
+import ast
 import importlib.util
+from functools import partial
 from pathlib import Path
-from typing import Generator, cast
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, cast
 
-from pymongo_migrate.migrations import MigrationModuleType, MigrationModuleWrapper
+from pymongo.client_session import ClientSession
+from pymongo.database import Database
 
+from pymongo_migrate.migrations import (
+    Checkpoint,
+    LazyMigrationModuleWrapper,
+    MigrationModuleType,
+    MigrationModuleWrapper,
+    call_with_accepted,
+)
 
-def load_module_migrations(
-    path: Path, namespace=f"{__name__}._migrations"
-) -> Generator[MigrationModuleWrapper, None, None]:
+DEFAULT_NAMESPACE = f"{__name__}._migrations"
+
+
+def iter_module_files(path: Path) -> Iterator[Path]:
     for module_file in path.glob("*.py"):
         if module_file.name.startswith("__"):
             continue
-        migration_name = module_file.stem
-        spec = importlib.util.spec_from_file_location(
-            f"{namespace}.{migration_name}", str(module_file)
-        )
-        assert spec
-        migration_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(migration_module)  # type: ignore
+        yield module_file
+
+
+def import_module_file(module_file: Path, namespace: str) -> MigrationModuleType:
+    spec = importlib.util.spec_from_file_location(
+        f"{namespace}.{module_file.stem}", str(module_file)
+    )
+    assert spec
+    migration_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration_module)  # type: ignore
+    return cast(MigrationModuleType, migration_module)
+
+
+def read_module_metadata(module_file: Path) -> Dict[str, Any]:
+    """
+    Read migration name, dependencies and description without executing module.
+
+    Only literal top-level assignments are taken into account.
+    Raises ValueError if dependencies cannot be determined statically.
+    """
+    tree = ast.parse(module_file.read_bytes(), filename=str(module_file))
+    metadata: Dict[str, Any] = {
+        "name": module_file.stem,
+        "description": ast.get_docstring(tree, clean=False),
+    }
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in (
+                "name",
+                "dependencies",
+                "replaces",
+            ):
+                try:
+                    metadata[target.id] = ast.literal_eval(value)
+                except ValueError:
+                    raise ValueError(
+                        f"{module_file}: {target.id!r} is not a literal"
+                    ) from None
+    if "dependencies" not in metadata:
+        raise ValueError(f"{module_file}: 'dependencies' not found")
+    return metadata
+
+
+def lazy_module_migration(
+    module_file: Path,
+    dependencies: List[str],
+    description: Optional[str],
+    namespace=DEFAULT_NAMESPACE,
+    replaces: Optional[List[str]] = None,
+) -> LazyMigrationModuleWrapper:
+    return LazyMigrationModuleWrapper(
+        name=module_file.stem,
+        dependencies=dependencies,
+        description=description,
+        load_module=partial(import_module_file, module_file, namespace),
+        replaces=replaces,
+    )
+
+
+def load_module_migrations(
+    path: Path, namespace=DEFAULT_NAMESPACE
+) -> Generator[MigrationModuleWrapper, None, None]:
+    for module_file in iter_module_files(path):
         yield MigrationModuleWrapper(
-            name=migration_name, module=cast(MigrationModuleType, migration_module)
+            name=module_file.stem, module=import_module_file(module_file, namespace)
+        )
+
+
+def load_lazy_module_migrations(
+    path: Path, namespace=DEFAULT_NAMESPACE
+) -> Generator[MigrationModuleWrapper, None, None]:
+    """
+    Load migrations importing their modules only when they are run.
+
+    Modules which metadata cannot be read statically are imported right away.
+    """
+    for module_file in iter_module_files(path):
+        try:
+            metadata = read_module_metadata(module_file)
+        except ValueError:
+            yield MigrationModuleWrapper(
+                name=module_file.stem, module=import_module_file(module_file, namespace)
+            )
+            continue
+        assert metadata["name"] == module_file.stem
+        yield lazy_module_migration(
+            module_file,
+            dependencies=list(metadata["dependencies"]),
+            description=metadata["description"],
+            namespace=namespace,
+            replaces=list(metadata.get("replaces", [])),
+        )
+
+
+def _load_replaced_migrations(
+    module_file: str, replaces: List[str], action: str
+) -> List[MigrationModuleWrapper]:
+    path = Path(module_file).parent
+    names = replaces if action == "upgrade" else list(reversed(replaces))
+    migrations = []
+    for name in names:
+        replaced_file = path / f"{name}.py"
+        if not replaced_file.exists():
+            raise ValueError(
+                f"{module_file}: replaced migration {name!r} not found,"
+                f" rewrite {action} of squashed migration before removing"
+                " modules of migrations it replaces"
+            )
+        migrations.append(
+            MigrationModuleWrapper(
+                name=name, module=import_module_file(replaced_file, DEFAULT_NAMESPACE)
+            )
         )
+    return migrations
+
+
+def _resume_replaced_migrations(
+    migrations: List[MigrationModuleWrapper], checkpoint_data: Optional[Dict[str, Any]]
+) -> List[MigrationModuleWrapper]:
+    """Skip replaced migrations finished before squashed migration was interrupted"""
+    names = [migration.name for migration in migrations]
+    resumed_name = (checkpoint_data or {}).get("replaced")
+    if resumed_name in names:
+        return migrations[names.index(resumed_name) :]
+    return migrations
+
+
+def run_replaced_migrations(
+    module_file: str,
+    replaces: List[str],
+    action: str,
+    db: Database,
+    checkpoint: Optional[Checkpoint] = None,
+    session: Optional[ClientSession] = None,
+):
+    """
+    Run `upgrade` (in order) or `downgrade` (in reverse order) of migrations
+    replaced by squashed migration, from modules next to its module.
+
+    Replaced migrations are run as if they were applied one by one - their
+    indexes are built or dropped and they get `session` of the squashed migration.
+    Each of them checkpoints its progress in the squashed migration's checkpoint,
+    under name of the replaced migration being run.
+    """
+    migrations = _load_replaced_migrations(module_file, replaces, action)
+    if checkpoint is not None:
+        migrations = _resume_replaced_migrations(migrations, checkpoint.data)
+    for i, migration in enumerate(migrations):
+        if migration.is_coroutine(action):
+            raise ValueError(
+                f"{module_file}: replaced migration {migration.name!r}"
+                " is a coroutine, so squashed migration has to be one as well"
+            )
+        if action == "downgrade":
+            migration.downgrade(db, session=session)
+            continue
+        replaced_checkpoint = None
+        if checkpoint is not None:
+            data = checkpoint.data or {}
+            replaced_checkpoint = Checkpoint(
+                data.get("data") if data.get("replaced") == migration.name else None,
+                partial(_save_replaced_checkpoint, checkpoint.save, migration.name),
+            )
+        migration.upgrade(db, checkpoint=replaced_checkpoint, session=session)
+        if checkpoint is not None and i + 1 < len(migrations):
+            checkpoint.save({"replaced": migrations[i + 1].name, "data": None})
+
+
+async def run_replaced_migrations_async(
+    module_file: str, replaces: List[str], action: str, db, checkpoint=None
+):
+    """
+    Asyncio counterpart of `run_replaced_migrations`, for squashed migrations
+    replacing coroutine migrations run by `AsyncMongoMigrate`.
+    """
+    from pymongo_migrate.async_mongo_migrate import AsyncCheckpoint
+
+    migrations = _load_replaced_migrations(module_file, replaces, action)
+    if checkpoint is not None:
+        migrations = _resume_replaced_migrations(migrations, checkpoint.data)
+    for i, migration in enumerate(migrations):
+        if not migration.is_coroutine(action):
+            raise ValueError(
+                f"{module_file}: replaced migration {migration.name!r}"
+                " is not a coroutine, so squashed migration can not be one"
+            )
+        if action == "downgrade":
+            await migration.downgrade(db)
+            continue
+        replaced_checkpoint = None
+        if checkpoint is not None:
+            data = checkpoint.data or {}
+            replaced_checkpoint = AsyncCheckpoint(
+                data.get("data") if data.get("replaced") == migration.name else None,
+                partial(_save_replaced_checkpoint, checkpoint.save, migration.name),
+            )
+        await call_with_accepted(migration.upgrade, db, checkpoint=replaced_checkpoint)
+        if checkpoint is not None and i + 1 < len(migrations):
+            await checkpoint.save({"replaced": migrations[i + 1].name, "data": None})
+
+
+def _save_replaced_checkpoint(save: Callable, name: str, data: Dict[str, Any]):
+    return save({"replaced": name, "data": data})
@@ -0,0 +1,178 @@
+"""Lease based lock preventing concurrent migration runs"""
+
+import datetime
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MigrationLockLostError(Exception):
+    """Lease of held migration lock expired or was taken over by another owner"""
+
+
+class MigrationLock:
+    """
+    Lock stored as a single document with owner id and lease expiration time.
+
+    While the lock is held its lease is renewed by a heartbeat thread every
+    `ttl / 3` seconds, so the lock of a crashed owner expires after `ttl`.
+    If the lease can not be renewed before it expires, the lock is `lost`.
+    Processes waiting for the lock sleep until the current lease expires
+    or with exponential backoff, whichever comes first.
+
+    usage:
+
+     with MigrationLock(db.pymongo_migrate_lock).acquire():
+         # code block ...
+    """
+
+    min_wait = 0.1
+    max_wait = 5.0
+
+    def __init__(
+        self,
+        collection: Collection,
+        name: str = "pymongo_migrate",
+        ttl: float = 60.0,
+        owner: Optional[str] = None,
+        logger: logging.Logger = LOGGER,
+    ):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or _default_owner()
+        self.logger = logger
+        self.lost = False
+        self._lease_deadline = 0.0
+        self._heartbeat: Optional[threading.Thread] = None
+        self._released = threading.Event()
+
+    @property
+    def _lease_end(self) -> datetime.datetime:
+        return _now() + datetime.timedelta(seconds=self.ttl)
+
+    def try_acquire(self) -> bool:
+        now = _now()
+        lease_deadline = time.monotonic() + self.ttl
+        try:
+            self.collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"expires": {"$lt": now}}, {"owner": self.owner}],
+                },
+                {
+                    "$set": {
+                        "owner": self.owner,
+                        "acquired": now,
+                        "expires": self._lease_end,
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        self._lease_deadline = lease_deadline
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> "MigrationLock":
+        """
+        Wait for the lock and start renewing its lease.
+
+        :param timeout: seconds after which TimeoutError is raised
+            None to wait indefinitely
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        backoff = self.min_wait
+        while not self.try_acquire():
+            lock = self.collection.find_one({"_id": self.name}) or {}
+            wait = backoff * random.uniform(0.5, 1.0)  # nosec
+            expires = lock.get("expires")
+            if expires is not None:
+                if expires.tzinfo is None:
+                    expires = expires.replace(tzinfo=datetime.timezone.utc)
+                wait = min(wait, max((expires - _now()).total_seconds(), 0))
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    raise TimeoutError(
+                        f"Migration lock {self.name!r} held by {lock.get('owner')!r}"
+                    )
+            self.logger.info("Waiting for migration lock held by %r", lock.get("owner"))
+            time.sleep(wait)
+            backoff = min(backoff * 2, self.max_wait)
+        self.logger.debug("Migration lock acquired by %r", self.owner)
+        self.lost = False
+        self._released.clear()
+        self._heartbeat = threading.Thread(
+            target=self._renew, name="pymongo_migrate_lock", daemon=True
+        )
+        self._heartbeat.start()
+        return self
+
+    def _renew(self):
+        while not self._released.wait(self.ttl / 3):
+            lease_deadline = time.monotonic() + self.ttl
+            try:
+                result = self.collection.update_one(
+                    {"_id": self.name, "owner": self.owner},
+                    {"$set": {"expires": self._lease_end}},
+                )
+            except PyMongoError as e:
+                if time.monotonic() < self._lease_deadline:
+                    self.logger.warning("Could not renew migration lock: %s", e)
+                    continue
+                self.lost = True
+                self.logger.error(
+                    "Migration lock %r lost by %r, its lease expired: %s",
+                    self.name,
+                    self.owner,
+                    e,
+                )
+                return
+            if not result.matched_count:
+                self.lost = True
+                self.logger.error("Migration lock %r lost by %r", self.name, self.owner)
+                return
+            self._lease_deadline = lease_deadline
+
+    def check(self):
+        """Raise MigrationLockLostError if the lock is no longer held"""
+        if self.lost:
+            raise MigrationLockLostError(
+                f"Migration lock {self.name!r} lost by {self.owner!r}"
+            )
+
+    def release(self):
+        self._released.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+        self.logger.debug("Migration lock released by %r", self.owner)
+
+    def __enter__(self):
+        if self._heartbeat is None:
+            self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
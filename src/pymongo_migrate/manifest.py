@@ -0,0 +1,163 @@
+"""Cache of migrations metadata, stored alongside migration modules"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pymongo_migrate.loader import (
+    DEFAULT_NAMESPACE,
+    import_module_file,
+    iter_module_files,
+    lazy_module_migration,
+    read_module_metadata,
+)
+from pymongo_migrate.migrations import MigrationModuleType, MigrationModuleWrapper
+
+MANIFEST_FILENAME = ".pymongo_migrate_manifest.json"
+MANIFEST_VERSION = 2
+
+
+def _file_hash(file_path: Path) -> str:
+    return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    name: str
+    dependencies: List[str]
+    description: Optional[str]
+    mtime_ns: int
+    size: int
+    sha256: str
+    replaces: List[str] = field(default_factory=list)
+
+
+class MigrationsManifest:
+    """
+    Metadata of migration modules and verified order of migrations graph.
+
+    Entries are invalidated per file, by modification time and size,
+    or by content hash if the former changed.
+    Any change of migrations invalidates the stored order.
+    """
+
+    def __init__(self, migrations_path: Path):
+        self.file_path = migrations_path / MANIFEST_FILENAME
+        self.migrations_path = migrations_path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self.order: Optional[List[str]] = None
+        self.changed = False
+
+    @classmethod
+    def load(cls, migrations_path: Path) -> "MigrationsManifest":
+        """Load manifest, returning an empty one if it is missing or unusable"""
+        manifest = cls(migrations_path)
+        try:
+            with manifest.file_path.open() as f:
+                data = json.load(f)
+            if data["version"] != MANIFEST_VERSION:
+                raise ValueError("Unsupported manifest version")
+            manifest.entries = {
+                file_name: ManifestEntry(**entry)
+                for file_name, entry in data["entries"].items()
+            }
+            manifest.order = data["order"]
+        except (OSError, ValueError, KeyError, TypeError):
+            manifest.entries = {}
+            manifest.order = None
+            manifest.changed = True
+        return manifest
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "entries": {
+                file_name: asdict(entry) for file_name, entry in self.entries.items()
+            },
+            "order": self.order,
+        }
+        f = tempfile.NamedTemporaryFile(
+            "w",
+            dir=self.migrations_path,
+            prefix=f"{MANIFEST_FILENAME}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        try:
+            with f:
+                json.dump(data, f)
+            os.replace(f.name, self.file_path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+        self.changed = False
+
+    def _get_entry(
+        self, module_file: Path, namespace: str
+    ) -> Tuple[ManifestEntry, Optional[MigrationModuleType]]:
+        """
+        Get entry of module, reading its metadata if the module changed.
+
+        :return: entry and module, if it had to be imported to read metadata
+        """
+        stat = module_file.stat()
+        entry = self.entries.get(module_file.name)
+        if entry and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            return entry, None
+        sha256 = _file_hash(module_file)
+        if entry and entry.sha256 == sha256:
+            entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+            self.changed = True
+            return entry, None
+        module = None
+        try:
+            metadata = read_module_metadata(module_file)
+        except ValueError:
+            module = import_module_file(module_file, namespace)
+            metadata = {
+                "name": getattr(module, "name", module_file.stem),
+                "dependencies": module.dependencies,
+                "description": module.__doc__,
+                "replaces": getattr(module, "replaces", []),
+            }
+        assert metadata["name"] == module_file.stem
+        entry = ManifestEntry(
+            name=module_file.stem,
+            dependencies=list(metadata["dependencies"]),
+            description=metadata["description"],
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha256=sha256,
+            replaces=list(metadata.get("replaces", [])),
+        )
+        self.entries[module_file.name] = entry
+        self.order = None
+        self.changed = True
+        return entry, module
+
+    def load_migrations(
+        self, namespace=DEFAULT_NAMESPACE
+    ) -> Iterator[MigrationModuleWrapper]:
+        """Load migrations lazily, reading metadata of changed modules only"""
+        seen = set()
+        for module_file in iter_module_files(self.migrations_path):
+            seen.add(module_file.name)
+            entry, module = self._get_entry(module_file, namespace)
+            if module is not None:
+                yield MigrationModuleWrapper(name=module_file.stem, module=module)
+                continue
+            yield lazy_module_migration(
+                module_file,
+                dependencies=entry.dependencies,
+                description=entry.description,
+                namespace=namespace,
+                replaces=entry.replaces,
+            )
+        for file_name in set(self.entries) - seen:
+            del self.entries[file_name]
+            self.order = None
+            self.changed = True
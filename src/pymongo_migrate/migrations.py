@@ -1,21 +1,70 @@
+import copy
 import datetime
+import heapq
+import inspect
+import threading
 from collections import defaultdict
 from dataclasses import dataclass, field
 from types import ModuleType
-from typing import Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set
 
+from pymongo.client_session import ClientSession
 from pymongo.database import Database
 
+from pymongo_migrate.indexes import Index, build_indexes, drop_indexes
+
+
+def call_with_accepted(func: Callable, *args, **kwargs):
+    """Call function passing only keyword arguments it declares by name"""
+    parameters = inspect.signature(func).parameters
+    return func(*args, **{k: v for k, v in kwargs.items() if k in parameters})
+
+
+class Checkpoint:
+    """
+    Progress of a running migration, persisted in its state.
+
+    Migration module receives it when its upgrade function accepts
+    `checkpoint` argument, so interrupted migration can be resumed:
+
+     def upgrade(db, checkpoint):
+         last_id = (checkpoint.data or {}).get("last_id")
+         ...
+         checkpoint.save({"last_id": last_id, "processed": processed})
+    """
+
+    def __init__(
+        self,
+        data: Optional[Dict[str, Any]],
+        save: Callable[[Dict[str, Any]], None],
+    ):
+        self.data = data
+        self._save = save
+
+    def save(self, data: Dict[str, Any]):
+        self._save(data)
+        self.data = data
+
 
 @dataclass
 class Migration:
     name: str
     dependencies: List[str] = field(default_factory=list)
+    replaces: List[str] = field(default_factory=list)
 
     @property
     def initial(self):
         return not self.dependencies
 
+    @property
+    def transactional(self) -> bool:
+        """Check if migration can be run in a transaction with others"""
+        return False
+
+    def is_coroutine(self, action: str) -> bool:
+        """Check if `upgrade` or `downgrade` action is a coroutine function"""
+        return inspect.iscoroutinefunction(getattr(self, action))
+
     def upgrade(self, db: Database):
         raise NotImplementedError()
 
@@ -28,6 +77,9 @@ class MigrationModuleType(ModuleType):
 
     name: str
     dependencies: List[str]
+    replaces: List[str]
+    indexes: List[Index]
+    transactional: bool
 
     def upgrade(self, db: Database):
         raise NotImplementedError()
@@ -43,59 +95,324 @@ class MigrationModuleWrapper(Migration):
         self.name = name
         self.module = module
         assert self.name == getattr(self.module, "name", name)
-        super().__init__(name=name, dependencies=self.module.dependencies)
+        super().__init__(
+            name=name,
+            dependencies=self.module.dependencies,
+            replaces=list(getattr(self.module, "replaces", [])),
+        )
 
     @property
     def description(self):
         return self.module.__doc__
 
-    def upgrade(self, db: Database):
-        self.module.upgrade(db)
+    @property
+    def indexes(self) -> List[Index]:
+        return list(getattr(self.module, "indexes", []))
 
-    def downgrade(self, db: Database):
-        self.module.downgrade(db)
+    @property
+    def transactional(self) -> bool:
+        return bool(getattr(self.module, "transactional", False))
+
+    def is_coroutine(self, action: str) -> bool:
+        return inspect.iscoroutinefunction(getattr(self.module, action, None))
+
+    def _check_session(self, action: str, session: Optional[ClientSession]):
+        if session is None:
+            return
+        if self.indexes:
+            raise ValueError(
+                f"Migration {self.name!r} declares indexes,"
+                " so it can not be run in a transaction"
+            )
+        if "session" not in inspect.signature(getattr(self.module, action)).parameters:
+            raise ValueError(
+                f"Migration {self.name!r} is run in a transaction,"
+                f" so its {action} has to accept session argument"
+            )
+
+    def _check_indexes(self, action: str) -> List[Index]:
+        indexes = self.indexes
+        if indexes and self.is_coroutine(action):
+            raise ValueError(
+                f"Migration {self.name!r} declares indexes,"
+                f" so its {action} can not be a coroutine function"
+            )
+        return indexes
+
+    def upgrade(
+        self,
+        db: Database,
+        checkpoint: Optional[Checkpoint] = None,
+        session: Optional[ClientSession] = None,
+    ):
+        """Run upgrade function of module, then build indexes it declares"""
+        indexes = self._check_indexes("upgrade")
+        self._check_session("upgrade", session)
+        result = None
+        if hasattr(self.module, "upgrade") or not indexes:
+            result = call_with_accepted(
+                self.module.upgrade, db, checkpoint=checkpoint, session=session
+            )
+        build_indexes(db, indexes)
+        return result
+
+    def downgrade(self, db: Database, session: Optional[ClientSession] = None):
+        """Drop indexes module declares, then run its downgrade function"""
+        indexes = self._check_indexes("downgrade")
+        self._check_session("downgrade", session)
+        drop_indexes(db, indexes)
+        if hasattr(self.module, "downgrade") or not indexes:
+            return call_with_accepted(self.module.downgrade, db, session=session)
+        return None
+
+
+class LazyMigrationModuleWrapper(MigrationModuleWrapper):
+    """
+    Use python module as a migration, importing it on first use.
+
+    Import is guarded by a lock, so migration shared by threads running
+    migrations of different databases is imported once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dependencies: List[str],
+        description: Optional[str],
+        load_module: Callable[[], MigrationModuleType],
+        replaces: Optional[List[str]] = None,
+    ):
+        self._description = description
+        self._load_module = load_module
+        self._module: Optional[MigrationModuleType] = None
+        self._module_lock = threading.Lock()
+        Migration.__init__(
+            self, name=name, dependencies=dependencies, replaces=replaces or []
+        )
+
+    @property
+    def module(self) -> MigrationModuleType:  # type: ignore[override]
+        if self._module is None:
+            with self._module_lock:
+                if self._module is None:
+                    module = self._load_module()
+                    assert self.name == getattr(module, "name", self.name)
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    @property
+    def description(self):
+        return self._description
 
 
 class MigrationsGraph:
     def __init__(self):
         self.migrations: Dict[str, Migration] = {}
         self.required_by: Dict[str, Set[str]] = defaultdict(set)
+        self.replaced_by: Dict[str, str] = {}
+        self.replacements: Dict[str, List[str]] = {}
+        self._order: Optional[List[Migration]] = None
 
     def add_migration(self, migration: Migration):
         self.migrations[migration.name] = migration
         for required_migration_name in migration.dependencies:
             self.required_by[required_migration_name].add(migration.name)
+        for replaced_migration_name in migration.replaces:
+            self.replaced_by[replaced_migration_name] = migration.name
+        self._order = None
+
+    def _is_replacing(self, migration: Migration) -> bool:
+        """Check if migrations replaced by migration are in graph as well"""
+        return any(name in self.migrations for name in migration.replaces)
+
+    def get_dependencies(self, migration: Migration) -> List[str]:
+        """
+        Get names of migrations which migration depends on.
+
+        Dependencies on replaced migrations, which modules were removed,
+        point to migration which replaced them.
+        """
+        dependencies = []
+        for name in migration.dependencies:
+            if name not in self.migrations:
+                name = self.replaced_by.get(name, name)
+            if name not in dependencies:
+                dependencies.append(name)
+        return dependencies
+
+    def _get_required_by(self, migration: Migration) -> Set[str]:
+        required_by = set(self.required_by.get(migration.name, ()))
+        for name in migration.replaces:
+            if name not in self.migrations:
+                required_by.update(self.required_by.get(name, ()))
+        return required_by
 
     def get_initial(self):
-        initial_migrations = [m for m in self.migrations.values() if m.initial]
+        initial_migrations = [
+            m
+            for m in self.migrations.values()
+            if m.initial and not self._is_replacing(m)
+        ]
         if len(initial_migrations) != 1:
             raise ValueError("There must be single initial migration")
         return initial_migrations[0]
 
+    def get_heads(self) -> List[Migration]:
+        """
+        Get migrations which no other migration depends on.
+
+        More than one head means there are branches which were never merged.
+        """
+        return [
+            migration
+            for name, migration in sorted(self.migrations.items())
+            if not self._get_required_by(migration)
+            and not self._is_replacing(migration)
+        ]
+
     def verify(self):
-        ordered_migration_names = [migration.name for migration in self]
-        all_migrations = set(self.migrations.keys())
-        unused_migrations = all_migrations - set(ordered_migration_names)
-        if unused_migrations:
-            raise ValueError("Migration graph is disconnected")
+        """
+        Check that migrations can be ordered and branches are merged.
 
-    def __iter__(self):
+        Raises ValueError if there is no single initial migration, a cycle,
+        dependency on unknown migration or more than one head.
         """
-        Iterate over migrations starting with initial one
+        self.get_order()
+        heads = self.get_heads()
+        if len(heads) > 1:
+            raise ValueError(
+                "Migration graph has multiple heads: "
+                f"{', '.join(migration.name for migration in heads)},"
+                " add migration depending on all of them to merge branches"
+            )
+
+    def get_order(self) -> List[Migration]:
+        """
+        Get migrations in order in which they should be applied.
+
+        Order is computed once and cached until graph changes.
+        """
+        if self._order is None:
+            self._order = self._sort()
+        return self._order
+
+    def restore_order(self, migration_names: List[str]):
+        """Use previously computed order instead of computing it again"""
+        if set(migration_names) != set(self.migrations):
+            raise ValueError("Order does not match migrations in graph")
+        self._order = [self.migrations[name] for name in migration_names]
+
+    def _sort(self) -> List[Migration]:
+        """
+        Topological sort using Kahn's algorithm.
+
+        Out of migrations ready to be applied the one with lowest name goes
+        first, so independent branches are ordered by (timestamp) names.
         """
         if not self.migrations:
-            return
+            return []
         initial_migration = self.get_initial()
-        yield from self._get_next(initial_migration)
+        pending_dependencies = {}
+        for migration in self.migrations.values():
+            dependencies = self.get_dependencies(migration)
+            for dependency_name in dependencies:
+                if dependency_name not in self.migrations:
+                    raise ValueError(
+                        f"Migration {migration.name!r} depends on"
+                        f" unknown migration {dependency_name!r}"
+                    )
+            pending_dependencies[migration.name] = len(dependencies)
+
+        order = []
+        ready = [initial_migration.name] + [
+            migration.name
+            for migration in self.migrations.values()
+            if self._is_replacing(migration)
+            and not pending_dependencies[migration.name]
+        ]
+        heapq.heapify(ready)
+        while ready:
+            migration_name = heapq.heappop(ready)
+            migration = self.migrations[migration_name]
+            order.append(migration)
+            for next_migration_name in self._get_required_by(migration):
+                pending_dependencies[next_migration_name] -= 1
+                if not pending_dependencies[next_migration_name]:
+                    heapq.heappush(ready, next_migration_name)
+
+        if len(order) != len(self.migrations):
+            cyclic = sorted(name for name, n in pending_dependencies.items() if n)
+            raise ValueError(f"Migration graph has a cycle: {', '.join(cyclic)}")
+        return order
+
+    def resolve_replacements(self, applied: Set[str]) -> "MigrationsGraph":
+        """
+        Get graph with either replacing (squashed) migrations or migrations
+        they replace, depending on which migrations are applied.
+
+        Replacing migration is used, unless only some of migrations it replaces
+        are applied - then these are used to apply the rest one by one.
+        Names of migrations left out are mapped in `replacements` of returned
+        graph to migrations which take their place.
+        """
+        if not self.replaced_by:
+            return self
+        replacements: Dict[str, List[str]] = {}
+        for migration in self.migrations.values():
+            if not migration.replaces:
+                continue
+            present = [name for name in migration.replaces if name in self.migrations]
+            applied_count = sum(name in applied for name in migration.replaces)
+            if migration.name in applied or applied_count in (
+                0,
+                len(migration.replaces),
+            ):
+                for name in present:
+                    replacements[name] = [migration.name]
+            elif len(present) == len(migration.replaces):
+                replacements[migration.name] = [
+                    name
+                    for name in present
+                    if not self.required_by.get(name, set()) & set(present)
+                ]
+            else:
+                raise ValueError(
+                    f"Only some of migrations replaced by {migration.name!r}"
+                    " are applied and modules of the others are missing"
+                )
+
+        graph = MigrationsGraph()
+        graph.replacements = replacements
+        for migration in self.migrations.values():
+            if migration.name in replacements:
+                continue
+            dependencies: List[str] = []
+            for dependency_name in self.get_dependencies(migration):
+                for name in replacements.get(dependency_name, [dependency_name]):
+                    if name not in dependencies:
+                        dependencies.append(name)
+            if dependencies != migration.dependencies:
+                migration = copy.copy(migration)
+                migration.dependencies = dependencies
+            graph.add_migration(migration)
+        return graph
 
-    def _get_next(self, migration):
-        yield migration
-        for next_migration_name in sorted(self.required_by.get(migration.name, [])):
-            next_migration = self.migrations[next_migration_name]
-            yield from self._get_next(next_migration)
+    def __iter__(self):
+        """
+        Iterate over migrations starting with initial one
+        """
+        yield from self.get_order()
 
 
 @dataclass
 class MigrationState:
     name: str
     applied: Optional[datetime.datetime] = None
+    checkpoint: Optional[Dict[str, Any]] = field(
+        default=None, metadata={"omit_none": True}
+    )
+    stats: Optional[Dict[str, Any]] = field(default=None, metadata={"omit_none": True})
@@ -1,16 +1,41 @@
+import cProfile
 import datetime
+import gzip
+import heapq
+import io
 import logging
+import pstats
 import time
-from dataclasses import asdict, dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, fields, replace
+from functools import partial, wraps
 from pathlib import Path
-from typing import Iterator, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pymongo
 from bson import CodecOptions
+from pymongo import ReplaceOne
+from pymongo.client_session import ClientSession
+from pymongo.errors import OperationFailure
 
-from pymongo_migrate.generate import generate_migration_module_in_dir
-from pymongo_migrate.loader import load_module_migrations
-from pymongo_migrate.migrations import Migration, MigrationsGraph, MigrationState
+from pymongo_migrate.dry_run import RecordedWrite, RecordingDatabase
+from pymongo_migrate.generate import (
+    generate_migration_module_in_dir,
+    generate_squashed_migration_module,
+)
+from pymongo_migrate.loader import load_lazy_module_migrations
+from pymongo_migrate.lock import MigrationLock
+from pymongo_migrate.manifest import MigrationsManifest
+from pymongo_migrate.migrations import (
+    Checkpoint,
+    Migration,
+    MigrationsGraph,
+    MigrationState,
+    call_with_accepted,
+)
+from pymongo_migrate.snapshot import dump_snapshot, restore_snapshot
+from pymongo_migrate.stats import CommandStatsListener, MigrationStats
 
 LOGGER = logging.getLogger(__name__)
 
@@ -24,7 +49,11 @@ def dt(*args) -> datetime.datetime:
 
 
 def _serialize(obj):
-    return asdict(obj)
+    data = asdict(obj)
+    for field_ in fields(obj):
+        if field_.metadata.get("omit_none") and data[field_.name] is None:
+            del data[field_.name]
+    return data
 
 
 def _deserialize(data, cls):
@@ -33,6 +62,237 @@ def _deserialize(data, cls):
     return cls(**data)
 
 
+def _replacing_states(
+    graph: MigrationsGraph, states: Dict[str, MigrationState]
+) -> Iterator[MigrationState]:
+    """
+    States of replacing migrations, which were not run themselves,
+    but all the migrations they replace were applied.
+    """
+    for migration in graph.migrations.values():
+        state = states.get(migration.name)
+        if not migration.replaces or (state and state.applied):
+            continue
+        replaced_states = [states.get(name) for name in migration.replaces]
+        if all(state and state.applied for state in replaced_states):
+            yield MigrationState(
+                name=migration.name,
+                applied=max(state.applied for state in replaced_states),  # type: ignore
+            )
+
+
+def _replaced_states(
+    migration: Migration, migration_state: MigrationState
+) -> List[MigrationState]:
+    """States of migrations replaced by migration, following its state"""
+    return [
+        MigrationState(name=name, applied=migration_state.applied)
+        for name in migration.replaces
+    ]
+
+
+def _resolve_target(
+    graph: MigrationsGraph,
+    states: Dict[str, MigrationState],
+    migration_name: Optional[str],
+    upgrade: bool,
+) -> Optional[str]:
+    """
+    Map target migration left out of graph resolved for loaded states
+    to migration taking its place.
+    """
+    if migration_name is None or migration_name in graph.migrations:
+        return migration_name
+    replacing_name = graph.replaced_by.get(migration_name)
+    if replacing_name in graph.migrations:
+        replacing = graph.migrations[replacing_name]  # type: ignore
+        state = states.get(replacing.name)
+        if (
+            migration_name != replacing.replaces[-1]
+            and bool(state and state.applied) != upgrade
+        ):
+            raise ValueError(
+                f"Migration {migration_name!r} is replaced by {replacing.name!r},"
+                " which can only be applied or reverted as a whole"
+            )
+        return replacing.name
+    names = set(graph.replacements[migration_name])
+    return [m.name for m in graph.get_order() if m.name in names][-1]
+
+
+def _loaded_state(
+    states: Dict[str, MigrationState], migration: Migration
+) -> MigrationState:
+    """Copy of loaded migration state, new state if migration has none"""
+    state = states.get(migration.name)
+    if state:
+        return replace(state)
+    return MigrationState(name=migration.name)
+
+
+def _load_states(
+    graph: MigrationsGraph, documents: Iterable[Dict[str, Any]], verify: bool = True
+) -> Tuple[MigrationsGraph, Dict[str, MigrationState]]:
+    """
+    Deserialize state documents and resolve replacements of graph for them.
+
+    With `verify` unset graph is only ordered, so unmerged branches are allowed.
+
+    :return: graph resolved for applied migrations and states by migration name
+    """
+    if verify:
+        graph.verify()
+    else:
+        graph.get_order()
+    states = {}
+    for data in documents:
+        state = _deserialize(data, MigrationState)
+        states[state.name] = state
+    for state in _replacing_states(graph, states):
+        states[state.name] = state
+    resolved_graph = graph.resolve_replacements(
+        {name for name, state in states.items() if state.applied}
+    )
+    return resolved_graph, states
+
+
+def _cache_states(
+    cache: Optional[Dict[str, MigrationState]], states: Iterable[MigrationState]
+):
+    if cache is not None:
+        for status in states:
+            cache[status.name] = replace(status)
+
+
+def _cache_checkpoint(
+    cache: Optional[Dict[str, MigrationState]],
+    migration_name: str,
+    data: Dict[str, Any],
+):
+    if cache is not None:
+        state = cache.setdefault(migration_name, MigrationState(name=migration_name))
+        state.checkpoint = data
+
+
+def _state_write_batches(
+    states: List[MigrationState], batch_size: int
+) -> Iterator[List[ReplaceOne]]:
+    """Upserts of migration states, in batches of `batch_size`"""
+    for i in range(0, len(states), batch_size):
+        yield [
+            ReplaceOne({"name": status.name}, _serialize(status), upsert=True)
+            for status in states[i : i + batch_size]
+        ]
+
+
+def _pending_upgrades(
+    graph: MigrationsGraph,
+    states: Dict[str, MigrationState],
+    migration_name: Optional[str],
+    logger: logging.Logger,
+) -> Iterator[Tuple[Migration, MigrationState]]:
+    """Migrations not applied yet, up to `migration_name` (including)"""
+    for migration in graph:
+        migration_state = _loaded_state(states, migration)
+        if migration_state.applied:
+            logger.debug("Migration %r already applied, skipping", migration.name)
+        else:
+            yield migration, migration_state
+        if migration.name == migration_name:
+            break
+
+
+def _pending_downgrades(
+    graph: MigrationsGraph,
+    states: Dict[str, MigrationState],
+    migration_name: Optional[str],
+    logger: logging.Logger,
+) -> Iterator[Tuple[Migration, MigrationState]]:
+    """Applied migrations in reverse order, down to `migration_name` (excluding)"""
+    for migration in reversed(graph.get_order()):
+        if migration.name == migration_name:
+            break
+        migration_state = _loaded_state(states, migration)
+        if not migration_state.applied:
+            logger.debug("Migration %r not yet applied, skipping", migration.name)
+            continue
+        yield migration, migration_state
+
+
+def _marked_states(
+    pending: List[Tuple[Migration, MigrationState]],
+    applied: Optional[datetime.datetime],
+) -> List[MigrationState]:
+    """
+    States of pending migrations marked as applied, or not applied for None,
+    followed by states of migrations they replace.
+
+    Checkpoints are dropped, so next upgrade does not resume from progress
+    made before the migration was marked.
+    """
+    marked_states: List[MigrationState] = []
+    replaced_states: List[MigrationState] = []
+    for migration, migration_state in pending:
+        migration_state.applied = applied
+        migration_state.checkpoint = None
+        if applied is None:
+            migration_state.stats = None
+        marked_states.append(migration_state)
+        replaced_states.extend(_replaced_states(migration, migration_state))
+    return marked_states + replaced_states
+
+
+class _DependencyScheduler:
+    """
+    Order in which pending migrations can run concurrently.
+
+    Migration is ready once pending migrations it depends on are done,
+    ready migrations are taken in order of their names.
+    """
+
+    def __init__(self, graph: MigrationsGraph, names: Iterable[str]):
+        self.graph = graph
+        names = set(names)
+        self._waiting_for = {
+            name: {
+                dependency_name
+                for dependency_name in graph.get_dependencies(graph.migrations[name])
+                if dependency_name in names
+            }
+            for name in names
+        }
+        self._ready = [
+            name for name, dependencies in self._waiting_for.items() if not dependencies
+        ]
+        heapq.heapify(self._ready)
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._ready)
+
+    def pop(self) -> str:
+        return heapq.heappop(self._ready)
+
+    def done(self, name: str):
+        for next_name in self.graph.required_by.get(name, ()):
+            if next_name not in self._waiting_for:
+                continue
+            self._waiting_for[next_name].discard(name)
+            if not self._waiting_for[next_name]:
+                heapq.heappush(self._ready, next_name)
+
+
+def _locked(method):
+    """Run method holding migration lock"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.run_lock():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class _MeasureTime:
     """
     Class to measure the time of execution of code block.
@@ -49,7 +309,7 @@ class _MeasureTime:
 
     @staticmethod
     def time() -> float:
-        return time.time()
+        return time.monotonic()
 
     @property
     def elapsed(self) -> Optional[float]:
@@ -72,12 +332,59 @@ class MongoMigrate:
     migrations_dir: str = "./pymongo_migrations"
     migrations_collection: str = "pymongo_migrate"
     logger: logging.Logger = LOGGER
+    manifest_cache: bool = False
+    state_index: bool = True
+    state_batch_size: int = 1000
+    lock: bool = False
+    lock_ttl: float = 60.0
+    lock_timeout: Optional[float] = None
+    command_stats: Optional[CommandStatsListener] = None
+    profile_dir: Optional[str] = None
+    profile_top: int = 20
+    migrations_graph: Optional[MigrationsGraph] = None
+    transaction_batch_size: int = 0
 
     def __post_init__(self):
         self.graph = MigrationsGraph()
-        for migration in load_module_migrations(self.migrations_path):
+        if self.migrations_graph is not None:
+            self.graph = self.migrations_graph
+        elif self.manifest_cache:
+            self._load_graph_from_manifest()
+        else:
+            for migration in load_lazy_module_migrations(self.migrations_path):
+                self.graph.add_migration(migration)
+            # unmerged branches are allowed until migrations are run,
+            # so `generate` can merge them
+            self.graph.get_order()
+        self._full_graph = self.graph
+        self._states: Optional[Dict[str, MigrationState]] = None
+        self._state_index_ensured = False
+        self._lock: Optional[MigrationLock] = None
+
+    def _load_graph_from_manifest(self):
+        manifest = MigrationsManifest.load(self.migrations_path)
+        for migration in manifest.load_migrations():
             self.graph.add_migration(migration)
-        self.graph.verify()
+        if manifest.order is not None:
+            try:
+                self.graph.restore_order(manifest.order)
+            except ValueError:
+                manifest.order = None
+        if manifest.order is None:
+            manifest.order = [migration.name for migration in self.graph]
+            manifest.changed = True
+        if manifest.changed:
+            try:
+                manifest.save()
+            except OSError as e:
+                self.logger.debug("Could not save migrations manifest: %s", e)
+
+    def for_database(self, database: str) -> "MongoMigrate":
+        """
+        Get MongoMigrate of another database, sharing client and graph
+        of migrations, so their modules are not loaded again.
+        """
+        return replace(self, database=database, migrations_graph=self._full_graph)
 
     @property
     def migrations_path(self):
@@ -95,31 +402,142 @@ class MongoMigrate:
             codec_options=CodecOptions(tz_aware=True, tzinfo=datetime.timezone.utc)
         )
 
+    @property
+    def lock_collection(self):
+        return self.db[f"{self.migrations_collection}_lock"]
+
+    @contextmanager
+    def run_lock(self):
+        """
+        Hold migration lock, if enabled, so only one process runs migrations.
+
+        Migration states should be loaded once the lock is held.
+        Once the lock is lost, migrations and state writes raise
+        MigrationLockLostError.
+        """
+        if not self.lock or self._lock is not None:
+            yield
+            return
+        lock = MigrationLock(
+            self.lock_collection,
+            name=self.migrations_collection,
+            ttl=self.lock_ttl,
+            logger=self.logger,
+        )
+        lock.acquire(timeout=self.lock_timeout)
+        self._lock = lock
+        try:
+            yield
+        finally:
+            self._lock = None
+            lock.release()
+
+    def _check_lock(self):
+        if self._lock is not None:
+            self._lock.check()
+
     def get_migrations(self) -> Iterator[Migration]:
         yield from self.graph
 
+    def has_state_index(self) -> bool:
+        """Check if migration states collection has unique index on name"""
+        return any(
+            dict(index["key"]) == {"name": 1} and index.get("unique")
+            for index in self.db_collection.list_indexes()
+        )
+
+    def ensure_state_index(self):
+        """
+        Create unique index on migration name, if it does not exist yet.
+
+        Called before migration state is first written.
+        Failure to create the index, e.g. due to duplicated states,
+        is logged but does not stop migrations.
+        """
+        if not self.state_index or self._state_index_ensured:
+            return
+        try:
+            self.db_collection.create_index("name", unique=True)
+        except OperationFailure as e:
+            self.logger.warning(
+                "Could not create unique index on %r: %s",
+                self.migrations_collection,
+                e,
+            )
+        self._state_index_ensured = True
+
+    def load_states(self, verify: bool = True) -> Dict[str, MigrationState]:
+        """
+        Fetch states of all migrations with a single query.
+
+        The snapshot is kept in memory and updated by `set_state`,
+        so following `get_state` calls do not query the database.
+        Raises ValueError if branches of migration graph are not merged,
+        unless `verify` is unset, e.g. to only show migrations.
+        """
+        self.graph, states = _load_states(
+            self._full_graph, self.db_collection.find(), verify
+        )
+        self._states = states
+        return states
+
     def get_state(self, migration: Migration) -> MigrationState:
+        if self._states is not None:
+            return _loaded_state(self._states, migration)
         data = self.db_collection.find_one({"name": migration.name})
         if data:
             return _deserialize(data, MigrationState)
         return MigrationState(name=migration.name)
 
     def set_state(self, status: MigrationState):
+        self._check_lock()
+        self.ensure_state_index()
         self.db_collection.replace_one(
             {"name": status.name}, _serialize(status), upsert=True
         )
+        _cache_states(self._states, [status])
+
+    def save_checkpoint(self, migration_name: str, data: Dict[str, Any]):
+        """Persist progress of a running migration"""
+        self._check_lock()
+        self.ensure_state_index()
+        self.db_collection.update_one(
+            {"name": migration_name}, {"$set": {"checkpoint": data}}, upsert=True
+        )
+        _cache_checkpoint(self._states, migration_name, data)
+
+    def set_states(self, states: List[MigrationState]):
+        """Write migration states with ordered bulk writes of `state_batch_size`"""
+        self.ensure_state_index()
+        self._write_states(states)
+        _cache_states(self._states, states)
+
+    def _write_states(
+        self,
+        states: List[MigrationState],
+        session: Optional[ClientSession] = None,
+    ):
+        self._check_lock()
+        for requests in _state_write_batches(states, self.state_batch_size):
+            self.db_collection.bulk_write(requests, ordered=True, session=session)
 
     def _check_for_migration(
         self, migration_name: Optional[str]
     ) -> Optional[Migration]:
         if migration_name is None:
             return None
-        migration = self.graph.migrations.get(migration_name)
+        migration = self._full_graph.migrations.get(migration_name)
         if migration is None:
             raise ValueError(f"No such migration: {migration_name}")
         return migration
 
-    def migrate(self, migration_name: Optional[str] = None, fake: bool = False):
+    @_locked
+    def migrate(
+        self,
+        migration_name: Optional[str] = None,
+        fake: bool = False,
+        workers: int = 1,
+    ):
         """
         Automatically detects if upgrades or downgrades should be applied to
         reach target migration state.
@@ -130,22 +548,47 @@ class MongoMigrate:
         :param fake:
             If True, only migration state in database will be modified and
             no actual migration will be run.
+        :param workers:
+            number of upgrade migrations which can be run concurrently
         """
         if migration_name is None:
             self.logger.debug("Migration target not specified, assuming upgrade")
-            self.upgrade(fake=fake)
+            self.upgrade(fake=fake, workers=workers)
             return
         migration = self._check_for_migration(migration_name)
         assert migration, "No matching migration, something went wrong"
+        self.load_states()
         migration_state = self.get_state(migration)
         if migration_state.applied:
             self.logger.debug("Migration target already applied, assuming downgrade")
             self.downgrade(migration_name, fake)
         else:
             self.logger.debug("Migration target not applied, assuming upgrade")
-            self.upgrade(migration_name, fake)
+            self.upgrade(migration_name, fake, workers=workers)
+
+    def _pending_upgrades(
+        self, migration_name: Optional[str]
+    ) -> Iterator[Tuple[Migration, MigrationState]]:
+        assert self._states is not None, "States must be loaded first"
+        return _pending_upgrades(self.graph, self._states, migration_name, self.logger)
 
-    def upgrade(self, migration_name: Optional[str] = None, fake: bool = False):
+    def _pending_downgrades(
+        self, migration_name: Optional[str]
+    ) -> Iterator[Tuple[Migration, MigrationState]]:
+        assert self._states is not None, "States must be loaded first"
+        return _pending_downgrades(
+            self.graph, self._states, migration_name, self.logger
+        )
+
+    @_locked
+    def upgrade(
+        self,
+        migration_name: Optional[str] = None,
+        fake: bool = False,
+        workers: int = 1,
+        dry_run: bool = False,
+        explain_execution: bool = False,
+    ) -> Optional[Dict[str, List[RecordedWrite]]]:
         """
         Apply upgrade migrations.
 
@@ -155,29 +598,256 @@ class MongoMigrate:
         :param fake:
             If True, only migration state in database will be modified and
             no actual migration will be run.
+        :param workers:
+            number of migrations which can be run concurrently,
+            if their dependencies are applied
+        :param dry_run:
+            If True, migrations are run with database proxy which only
+            records their writes; filters of recorded writes are explained
+            and returned by migration name. Migration states are not modified.
+        :param explain_execution:
+            If True, filters of dry run writes are executed by explain,
+            to report numbers of examined documents and keys.
         """
+        if fake and dry_run:
+            raise ValueError("Fake run can not be a dry run")
+        if fake:
+            self.mark_applied(migration_name)
+            return None
+        if workers > 1 and self.profile_dir is not None:
+            raise ValueError("Migrations can not be profiled when run concurrently")
+        if workers > 1 and self.transaction_batch_size > 0:
+            raise ValueError(
+                "Migrations can not be batched into transactions when run concurrently"
+            )
         self._check_for_migration(migration_name)
-        for migration in self.graph:
-            migration_state = self.get_state(migration)
-            if migration_state.applied:
-                self.logger.debug(
-                    "Migration %r already applied, skipping", migration.name
-                )
-                continue
-            if fake:
-                self.logger.info("Fake running upgrade migration %r", migration.name)
+        states = self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=True
+        )
+        pending = list(self._pending_upgrades(migration_name))
+        if dry_run:
+            return self._upgrade_dry_run(pending, explain_execution)
+        if workers > 1:
+            self._upgrade_parallel(pending, workers)
+            return None
+        for in_transaction, batch in self._transaction_batches(pending):
+            if in_transaction:
+                self._upgrade_transaction(batch)
             else:
+                self._upgrade_migration(*batch[0])
+        return None
+
+    def _transaction_batches(
+        self, pending: List[Tuple[Migration, MigrationState]]
+    ) -> Iterator[Tuple[bool, List[Tuple[Migration, MigrationState]]]]:
+        """
+        Group consecutive transactional migrations into batches of at most
+        `transaction_batch_size`, other migrations are yielded one by one.
+
+        Each batch is yielded with flag telling whether it should be run
+        in transaction, which is never the case with `transaction_batch_size`
+        of 0.
+        """
+        batch: List[Tuple[Migration, MigrationState]] = []
+        for migration, migration_state in pending:
+            if self.transaction_batch_size > 0 and migration.transactional:
+                batch.append((migration, migration_state))
+                if len(batch) >= self.transaction_batch_size:
+                    yield True, batch
+                    batch = []
+                continue
+            if batch:
+                yield True, batch
+                batch = []
+            yield False, [(migration, migration_state)]
+        if batch:
+            yield True, batch
+
+    def _upgrade_transaction(self, batch: List[Tuple[Migration, MigrationState]]):
+        """
+        Run migrations and write their states in a single transaction,
+        so either all of them are applied or none is.
+
+        Migrations receive the transaction's session as `session` argument.
+        States kept in memory are updated once the transaction commits.
+        """
+        self.logger.info("Running %d upgrade migrations in one transaction", len(batch))
+        self.ensure_state_index()
+        states: List[MigrationState] = []
+
+        def run(session: ClientSession):
+            states.clear()
+            for migration, migration_state in batch:
+                self._check_lock()
                 self.logger.info("Running upgrade migration %r", migration.name)
-                with _MeasureTime() as mt:
-                    migration.upgrade(self.db)
-                    self.logger.info(
-                        "Execution time of %r: %s seconds", migration.name, mt.elapsed
+                with self._collect_stats(migration) as stats, self._profile(
+                    migration, "upgrade", stats
+                ):
+                    call_with_accepted(migration.upgrade, self.db, session=session)
+                migration_state = replace(
+                    migration_state,
+                    applied=dt(),
+                    checkpoint=None,
+                    stats=stats.to_dict(),
+                )
+                states.append(migration_state)
+                states.extend(_replaced_states(migration, migration_state))
+            self._write_states(states, session=session)
+
+        with self.client.start_session() as session:
+            session.with_transaction(run)
+        _cache_states(self._states, states)
+
+    def _upgrade_dry_run(
+        self,
+        pending: List[Tuple[Migration, MigrationState]],
+        explain_execution: bool = False,
+    ) -> Dict[str, List[RecordedWrite]]:
+        """
+        Run migrations recording their writes instead of executing them.
+
+        Each migration sees database as left by applied migrations,
+        as writes of preceding dry run migrations are not executed.
+        """
+        writes = {}
+        for migration, migration_state in pending:
+            self.logger.info("Dry running upgrade migration %r", migration.name)
+            recording_db = RecordingDatabase(self.db)
+            checkpoint = Checkpoint(migration_state.checkpoint, lambda data: None)
+            call_with_accepted(migration.upgrade, recording_db, checkpoint=checkpoint)
+            writes[migration.name] = recording_db.explain_writes(
+                execute=explain_execution
+            )
+            for write in writes[migration.name]:
+                if write.plan is not None and write.plan.collection_scan:
+                    self.logger.warning("Collection scan by %s", write.format())
+                else:
+                    self.logger.info("Would run %s", write.format())
+        return writes
+
+    def _upgrade_migration(self, migration: Migration, migration_state: MigrationState):
+        self._check_lock()
+        if migration_state.checkpoint is None:
+            self.logger.info("Running upgrade migration %r", migration.name)
+        else:
+            self.logger.info(
+                "Resuming upgrade migration %r from checkpoint %r",
+                migration.name,
+                migration_state.checkpoint,
+            )
+        checkpoint = Checkpoint(
+            migration_state.checkpoint, partial(self.save_checkpoint, migration.name)
+        )
+        with self._collect_stats(migration) as stats, self._profile(
+            migration, "upgrade", stats
+        ):
+            call_with_accepted(migration.upgrade, self.db, checkpoint=checkpoint)
+        migration_state.applied = dt()
+        migration_state.checkpoint = None
+        migration_state.stats = stats.to_dict()
+        self.set_state(migration_state)
+        if migration.replaces:
+            self.set_states(_replaced_states(migration, migration_state))
+
+    @contextmanager
+    def _collect_stats(self, migration: Migration) -> Iterator[MigrationStats]:
+        """
+        Measure execution time of migration and collect statistics
+        of its commands, if `command_stats` listener is set.
+        """
+        with ExitStack() as stack:
+            if self.command_stats is not None:
+                stats = stack.enter_context(self.command_stats.collect())
+            else:
+                stats = MigrationStats()
+            with _MeasureTime() as mt:
+                yield stats
+            stats.duration = mt.elapsed or 0.0
+            self.logger.info(
+                "Execution time of %r: %s seconds", migration.name, stats.duration
+            )
+            if stats.summary.latency:
+                self.logger.debug(
+                    "Commands of %r:\n  %s",
+                    migration.name,
+                    "\n  ".join(stats.summary.format()),
+                )
+
+    @contextmanager
+    def _profile(
+        self, migration: Migration, action: str, stats: MigrationStats
+    ) -> Iterator[None]:
+        """
+        Profile migration with cProfile, if `profile_dir` is set.
+
+        Profile is saved to `{profile_dir}/{migration name}.{action}.pstats`
+        and its top functions are logged along with time spent waiting
+        for mongo commands.
+        """
+        if self.profile_dir is None:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile_path = Path(self.profile_dir)
+            profile_path.mkdir(parents=True, exist_ok=True)
+            profile_file = profile_path / f"{migration.name}.{action}.pstats"
+            profile.dump_stats(profile_file)
+            report = io.StringIO()
+            pstats.Stats(profile, stream=report).sort_stats(
+                pstats.SortKey.CUMULATIVE
+            ).print_stats(self.profile_top)
+            self.logger.info(
+                "Profile of %r saved to %s, time waiting for mongo commands:"
+                " %.3f seconds\n%s",
+                migration.name,
+                profile_file,
+                stats.command_time,
+                report.getvalue().strip("\n"),
+            )
+
+    def _upgrade_parallel(
+        self, pending: List[Tuple[Migration, MigrationState]], workers: int
+    ):
+        """
+        Run pending migrations on a thread pool as soon as their dependencies
+        are applied.
+
+        No new migrations are started after the first failure, which is raised
+        once already running migrations finish.
+        """
+        states = {migration.name: state for migration, state in pending}
+        scheduler = _DependencyScheduler(self.graph, states)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="pymongo_migrate"
+        ) as executor:
+            while running or (scheduler.ready and error is None):
+                while scheduler.ready and error is None and len(running) < workers:
+                    name = scheduler.pop()
+                    future = executor.submit(
+                        self._upgrade_migration,
+                        self.graph.migrations[name],
+                        states[name],
                     )
-            migration_state.applied = dt()
-            self.set_state(migration_state)
-            if migration.name == migration_name:
-                break
+                    running[future] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    scheduler.done(name)
+        if error is not None:
+            raise error
 
+    @_locked
     def downgrade(self, migration_name: Optional[str] = None, fake: bool = False):
         """
         Reverse migrations.
@@ -189,34 +859,205 @@ class MongoMigrate:
             If True, only migration state in database will be modified and
             no actual migration will be run.
         """
+        if fake:
+            self.mark_unapplied(migration_name)
+            return
         self._check_for_migration(migration_name)
-        for migration in reversed(list(self.get_migrations())):
-            if migration.name == migration_name:
-                break
-            migration_state = self.get_state(migration)
-            if not migration_state.applied:
-                self.logger.debug(
-                    "Migration %r not yet applied, skipping", migration.name
-                )
-                continue
-            if fake:
-                self.logger.info("Fake running downgrade migration %r", migration.name)
-            else:
-                self.logger.info("Running downgrade migration %r", migration.name)
-                with _MeasureTime() as mt:
-                    migration.downgrade(self.db)
-                    self.logger.info(
-                        "Execution time of %r: %s seconds", migration.name, mt.elapsed
-                    )
+        states = self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=False
+        )
+        for migration, migration_state in self._pending_downgrades(migration_name):
+            self._check_lock()
+            self.logger.info("Running downgrade migration %r", migration.name)
+            with self._collect_stats(migration) as stats, self._profile(
+                migration, "downgrade", stats
+            ):
+                migration.downgrade(self.db)
             migration_state.applied = None
+            migration_state.checkpoint = None
+            migration_state.stats = None
             self.set_state(migration_state)
+            if migration.replaces:
+                self.set_states(_replaced_states(migration, migration_state))
+
+    @_locked
+    def mark_applied(self, migration_name: Optional[str] = None) -> int:
+        """
+        Mark migrations as applied without running them.
+
+        All state changes are written with bulk writes.
+
+        :param migration_name:
+            name of migration up to which (including) migrations should be marked
+            None if all migrations should be marked
+        :return: number of migrations marked as applied
+        """
+        self._check_for_migration(migration_name)
+        states = self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=True
+        )
+        pending = list(self._pending_upgrades(migration_name))
+        for migration, _ in pending:
+            self.logger.info("Fake running upgrade migration %r", migration.name)
+        self.set_states(_marked_states(pending, applied=dt()))
+        self.logger.info("Marked %d migrations as applied", len(pending))
+        return len(pending)
+
+    @_locked
+    def mark_unapplied(self, migration_name: Optional[str] = None) -> int:
+        """
+        Mark migrations as not applied without running their downgrades.
+
+        All state changes are written with bulk writes.
+
+        :param migration_name:
+            name of migration down to which (excluding) migrations should be marked
+            None if all migrations should be marked
+        :return: number of migrations marked as not applied
+        """
+        self._check_for_migration(migration_name)
+        states = self.load_states()
+        migration_name = _resolve_target(
+            self.graph, states, migration_name, upgrade=False
+        )
+        pending = list(self._pending_downgrades(migration_name))
+        for migration, _ in pending:
+            self.logger.info("Fake running downgrade migration %r", migration.name)
+        self.set_states(_marked_states(pending, applied=None))
+        self.logger.info("Marked %d migrations as not applied", len(pending))
+        return len(pending)
+
+    @_locked
+    def snapshot(
+        self, file_path: str, migration_name: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Dump database into gzip compressed snapshot archive, see `dump_snapshot`.
+
+        :param migration_name:
+            migration the database has to be migrated to exactly,
+            None to take snapshot of database as it is
+        :return: number of documents dumped by collection name
+        """
+        self._check_for_migration(migration_name)
+        states = self.load_states()
+        applied = [
+            migration.name
+            for migration in self.graph
+            if migration.name in states and states[migration.name].applied
+        ]
+        if migration_name is None:
+            migration_name = applied[-1] if applied else None
+        else:
+            migration_name = _resolve_target(
+                self.graph, states, migration_name, upgrade=True
+            )
+            expected = []
+            for migration in self.graph:
+                expected.append(migration.name)
+                if migration.name == migration_name:
+                    break
+            if applied != expected:
+                raise ValueError(
+                    f"Database has to be migrated exactly to {migration_name!r}"
+                    " to take its snapshot"
+                )
+        with gzip.open(file_path, "wb") as fp:
+            counts = dump_snapshot(
+                self.db, fp, migration_name, exclude={self.lock_collection.name}
+            )
+        self.logger.info(
+            "Dumped %d documents of %d collections at migration %r",
+            sum(counts.values()),
+            len(counts),
+            migration_name,
+        )
+        return counts
+
+    @_locked
+    def restore_snapshot(
+        self, file_path: str, migration_name: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Load snapshot archive into empty database and apply migrations
+        following the one snapshot was taken at.
+
+        :param migration_name:
+            name of migration up to which (including) upgrades should be executed
+            None if all migrations should be run
+        :return: name of migration snapshot was taken at
+        """
+        self._check_for_migration(migration_name)
+        with gzip.open(file_path, "rb") as fp:
+            header = restore_snapshot(self.db, fp, exclude={self.lock_collection.name})
+        self.logger.info("Restored snapshot at migration %r", header["migration"])
+        self.upgrade(migration_name)
+        return header["migration"]
+
+    def squash(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        name: str = "",
+        **kwargs,
+    ) -> Path:
+        """
+        Generate migration replacing range of migrations, from `start` to `end`
+        (including) in order they are applied.
+
+        Fresh databases run only the squashed migration, databases on which
+        some of the replaced migrations are applied run the rest one by one.
+        Squashed migration is a coroutine if the replaced migrations are.
+
+        :return: path to generated migration module
+        """
+        order = self._full_graph.get_order()
+        names = [migration.name for migration in order]
+        for migration_name in (start, end):
+            self._check_for_migration(migration_name)
+        start_index = names.index(start) if start else 0
+        end_index = names.index(end) + 1 if end else len(names)
+        replaced = order[start_index:end_index]
+        if len(replaced) < 2:
+            raise ValueError("At least two migrations are needed to squash them")
+        for migration in replaced:
+            if migration.replaces:
+                raise ValueError(
+                    f"Migration {migration.name!r} already replaces other migrations"
+                )
+        coroutines = {
+            migration.is_coroutine("upgrade") or migration.is_coroutine("downgrade")
+            for migration in replaced
+        }
+        if len(coroutines) > 1:
+            raise ValueError(
+                "Coroutine migrations can not be squashed together with regular ones"
+            )
+        replaced_names = [migration.name for migration in replaced]
+        dependencies = []
+        for migration in replaced:
+            for dependency_name in self._full_graph.get_dependencies(migration):
+                if (
+                    dependency_name not in replaced_names
+                    and dependency_name not in dependencies
+                ):
+                    dependencies.append(dependency_name)
+        return generate_migration_module_in_dir(
+            self.migrations_path,
+            name=name,
+            generate_module=generate_squashed_migration_module,
+            dependencies=dependencies,
+            replaces=replaced_names,
+            asynchronous=coroutines.pop(),
+            description=kwargs.get("description")
+            or f"Squashed migrations {replaced_names[0]} to {replaced_names[-1]}",
+        )
 
     def generate(self, name: str = "", **kwargs) -> Path:
-        last_migration_name = None
-        for migration in self.get_migrations():
-            last_migration_name = migration.name
+        dependencies = [migration.name for migration in self.graph.get_heads()]
         self.migrations_path.mkdir(exist_ok=True)
-        dependencies = [last_migration_name] if last_migration_name else []
         return generate_migration_module_in_dir(
             self.migrations_path,
             name=name,
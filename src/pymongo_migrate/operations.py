@@ -0,0 +1,203 @@
+"""Declarative field operations run on server as pipeline updates"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.database import Database
+from pymongo.results import UpdateResult
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+
+
+def _is_subpath(path: str, other: str) -> bool:
+    return path == other or other.startswith(f"{path}.") or path.startswith(f"{other}.")
+
+
+@dataclass
+class FieldOperation:
+    """
+    Operation on field of all documents in collection, compiled to single
+    `update_many` with aggregation pipeline, so documents never leave server.
+
+    Fields are given as dotted paths; paths through arrays are not supported.
+    """
+
+    collection: str
+
+    def filter(self) -> Dict[str, Any]:
+        """Filter matching documents which operation changes"""
+        raise NotImplementedError()
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    def inverse(self) -> "FieldOperation":
+        """Get operation reverting this one"""
+        raise NotImplementedError()
+
+    def apply(self, db: Database) -> UpdateResult:
+        return db[self.collection].update_many(self.filter(), self.pipeline())
+
+
+@dataclass
+class RenameField(FieldOperation):
+    """
+    Rename field, or move it to another path, e.g. into embedded document.
+
+    Embedded documents left empty by moving field out of them are kept.
+    """
+
+    field: str
+    new_field: str
+
+    def __post_init__(self):
+        if _is_subpath(self.field, self.new_field):
+            raise ValueError(
+                f"Can not move {self.field!r} to {self.new_field!r}, paths overlap"
+            )
+
+    def filter(self) -> Dict[str, Any]:
+        return {self.field: {"$exists": True}}
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        return [{"$set": {self.new_field: f"${self.field}"}}, {"$unset": self.field}]
+
+    def inverse(self) -> "RenameField":
+        return RenameField(self.collection, self.new_field, self.field)
+
+
+@dataclass
+class SetDefault(FieldOperation):
+    """
+    Set field to value in documents without it.
+
+    Inverse removes field from documents where it equals value,
+    including those which had it before.
+    """
+
+    field: str
+    value: Any
+
+    def filter(self) -> Dict[str, Any]:
+        return {self.field: {"$exists": False}}
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        return [{"$set": {self.field: {"$literal": self.value}}}]
+
+    def inverse(self) -> "UnsetField":
+        return UnsetField(self.collection, self.field, self.value)
+
+
+@dataclass
+class UnsetField(FieldOperation):
+    """
+    Remove field, or only where it equals value, if given.
+
+    Only the latter can be reverted, setting field back to value.
+    """
+
+    field: str
+    value: Any = MISSING
+
+    def filter(self) -> Dict[str, Any]:
+        if self.value is MISSING:
+            return {self.field: {"$exists": True}}
+        return {self.field: {"$eq": self.value}}
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        return [{"$unset": self.field}]
+
+    def inverse(self) -> SetDefault:
+        if self.value is MISSING:
+            raise ValueError(
+                f"Removal of {self.field!r} with any value is not reversible"
+            )
+        return SetDefault(self.collection, self.field, self.value)
+
+
+@dataclass
+class ConvertField(FieldOperation):
+    """
+    Convert field to type, given by `$convert` name, e.g. "int" or "date".
+
+    Documents where field already has the type are left alone.
+    Inverse converts field back to `from_type`, which has to be given.
+    `on_error` is the value of fields which can not be converted;
+    without it the update fails.
+    """
+
+    field: str
+    to: str
+    from_type: Optional[str] = None
+    on_error: Any = MISSING
+
+    def filter(self) -> Dict[str, Any]:
+        return {self.field: {"$exists": True, "$not": {"$type": self.to}}}
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        convert: Dict[str, Any] = {"input": f"${self.field}", "to": self.to}
+        if self.on_error is not MISSING:
+            convert["onError"] = {"$literal": self.on_error}
+        return [{"$set": {self.field: {"$convert": convert}}}]
+
+    def inverse(self) -> "ConvertField":
+        if self.from_type is None:
+            raise ValueError(
+                f"Conversion of {self.field!r} is not reversible without from_type"
+            )
+        return ConvertField(self.collection, self.field, self.from_type, self.to)
+
+
+def apply(
+    db: Database,
+    operations: Iterable[FieldOperation],
+    logger: logging.Logger = LOGGER,
+) -> List[UpdateResult]:
+    """
+    Apply operations one by one.
+
+    usage:
+
+     operations = [
+         RenameField("users", "mail", "contact.email"),
+         SetDefault("users", "active", True),
+         ConvertField("orders", "total", "decimal", from_type="string"),
+     ]
+
+     def upgrade(db):
+         apply(db, operations)
+
+     def downgrade(db):
+         revert(db, operations)
+    """
+    results = []
+    for operation in operations:
+        result = operation.apply(db)
+        if result.acknowledged:
+            logger.info("%r modified %d documents", operation, result.modified_count)
+        results.append(result)
+    return results
+
+
+def revert(
+    db: Database,
+    operations: Iterable[FieldOperation],
+    logger: logging.Logger = LOGGER,
+) -> List[UpdateResult]:
+    """
+    Apply inverses of operations in reverse order.
+
+    All operations are inverted before any is applied, so irreversible
+    operation fails the revert without modifying documents.
+    """
+    inverses = [operation.inverse() for operation in reversed(list(operations))]
+    return apply(db, inverses, logger)
@@ -0,0 +1,228 @@
+"""Parallel processing of collections partitioned into _id ranges"""
+
+import contextvars
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+
+from bson import Decimal128
+from pymongo.collection import Collection
+
+from pymongo_migrate.batch import (
+    DEFAULT_BATCH_SIZE,
+    BatchResult,
+    Transform,
+    update_in_batches,
+)
+from pymongo_migrate.throttle import Throttle
+
+LOGGER = logging.getLogger(__name__)
+
+SAMPLES_PER_PARTITION = 20
+
+
+@dataclass
+class IdRange:
+    """
+    Range of document ids, lower bound inclusive, upper bound exclusive.
+
+    MongoDB compares ids only with bounds of the same BSON type, so range
+    without lower bound matches ids of all other types too. Ranges splitting
+    a collection are thus complete as long as their bounds share a type.
+    """
+
+    min: Any = None
+    max: Any = None
+
+    def filter(self) -> Dict[str, Any]:
+        if self.min is None and self.max is not None:
+            return {"_id": {"$not": {"$gte": self.max}}}
+        condition = {}
+        if self.min is not None:
+            condition["$gte"] = self.min
+        if self.max is not None:
+            condition["$lt"] = self.max
+        return {"_id": condition} if condition else {}
+
+
+def _type_bracket(value: Any) -> str:
+    """Name of values group MongoDB compares with each other in range queries"""
+    if isinstance(value, (int, float, Decimal128)) and not isinstance(value, bool):
+        return "number"
+    return type(value).__name__
+
+
+def _ranges_from_bounds(bounds: List[Any]) -> List[IdRange]:
+    if bounds:
+        bracket = Counter(map(_type_bracket, bounds)).most_common(1)[0][0]
+        bounds = [bound for bound in bounds if _type_bracket(bound) == bracket]
+    edges = [None, *bounds, None]
+    return [IdRange(min=low, max=high) for low, high in zip(edges, edges[1:])]
+
+
+def split_id_ranges(
+    collection: Collection,
+    partitions: int,
+    filter: Optional[Mapping[str, Any]] = None,
+    samples_per_partition: int = SAMPLES_PER_PARTITION,
+) -> List[IdRange]:
+    """
+    Split documents into at most `partitions` ranges of similar size,
+    with bounds chosen from a random sample of document ids.
+
+    Bounds are of the type most ids in the sample have; documents
+    with ids of other types are left to the first range.
+    """
+    if partitions <= 1:
+        return [IdRange()]
+    pipeline: List[Dict[str, Any]] = []
+    if filter:
+        pipeline.append({"$match": filter})
+    pipeline += [
+        {"$sample": {"size": partitions * samples_per_partition}},
+        {"$project": {"_id": 1}},
+        {"$sort": {"_id": 1}},
+    ]
+    ids = [doc["_id"] for doc in collection.aggregate(pipeline)]
+    bounds: List[Any] = []
+    for i in range(1, partitions):
+        if not ids:
+            break
+        bound = ids[i * len(ids) // partitions]
+        if not bounds or bound != bounds[-1]:
+            bounds.append(bound)
+    return _ranges_from_bounds(bounds)
+
+
+def split_vector_id_ranges(collection: Collection, partitions: int) -> List[IdRange]:
+    """
+    Split collection into ranges using `splitVector` command.
+
+    Unlike sampling it reads the _id index, but it requires privileges
+    to run the command and is not supported through mongos.
+    """
+    if partitions <= 1:
+        return [IdRange()]
+    db = collection.database
+    size = db.command("collStats", collection.name)["size"]
+    result = db.command(
+        "splitVector",
+        collection.full_name,
+        keyPattern={"_id": 1},
+        maxChunkSizeBytes=max(size // partitions, 1),
+    )
+    return _ranges_from_bounds([key["_id"] for key in result["splitKeys"]])
+
+
+@dataclass
+class RangeResult:
+    id_range: IdRange
+    result: BatchResult = field(default_factory=BatchResult)
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class PartitionedResult:
+    ranges: List[RangeResult]
+
+    @property
+    def total(self) -> BatchResult:
+        total = BatchResult()
+        for range_result in self.ranges:
+            total.add(range_result.result)
+        return total
+
+    @property
+    def errors(self) -> List[BaseException]:
+        return [r.error for r in self.ranges if r.error is not None]
+
+
+class PartitionedScanError(Exception):
+    """Processing of some of the ranges failed"""
+
+    def __init__(self, result: PartitionedResult):
+        self.result = result
+        super().__init__(
+            f"{len(result.errors)} of {len(result.ranges)} ranges failed:"
+            f" {result.errors[0]!r}"
+        )
+
+
+def update_in_partitions(
+    collection: Collection,
+    transform: Transform,
+    partitions: int = 4,
+    workers: Optional[int] = None,
+    filter: Optional[Mapping[str, Any]] = None,
+    projection: Optional[Union[Mapping[str, Any], List[str]]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    ranges: Optional[List[IdRange]] = None,
+    on_progress: Optional[Callable[[int, RangeResult], None]] = None,
+    throttle: Optional[Throttle] = None,
+    logger: logging.Logger = LOGGER,
+) -> PartitionedResult:
+    """
+    Apply `transform` to documents of each _id range on a thread pool.
+
+    Every range is processed by `update_in_batches` in a copy of the caller's
+    context. A failing range does not stop the others; once all are done
+    PartitionedScanError is raised if any of them failed.
+
+    :param partitions: number of ranges collection is split into
+    :param workers: number of ranges processed at once, `partitions` by default
+    :param ranges: ranges to process instead of splitting collection
+    :param on_progress: called with range index and its totals after each batch
+    :param throttle: shared by all ranges, waited on after each batch
+    """
+    if ranges is None:
+        ranges = split_id_ranges(collection, partitions, filter)
+    results = [RangeResult(id_range=id_range) for id_range in ranges]
+    if not results:
+        return PartitionedResult(ranges=results)
+
+    def process(index: int):
+        range_result = results[index]
+        range_filter = range_result.id_range.filter()
+        if filter and range_filter:
+            range_filter = {"$and": [dict(filter), range_filter]}
+        elif filter:
+            range_filter = dict(filter)
+
+        def report(result: BatchResult):
+            range_result.result = result
+            logger.debug(
+                "Range %d/%d: %d documents read", index + 1, len(results), result.read
+            )
+            if on_progress is not None:
+                on_progress(index, range_result)
+
+        try:
+            range_result.result = update_in_batches(
+                collection,
+                transform,
+                filter=range_filter,
+                projection=projection,
+                batch_size=batch_size,
+                on_batch=report,
+                throttle=throttle,
+            )
+        except Exception as e:
+            logger.error("Range %d/%d failed: %r", index + 1, len(results), e)
+            range_result.error = e
+
+    with ThreadPoolExecutor(
+        max_workers=workers or len(results), thread_name_prefix="pymongo_migrate"
+    ) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, process, index)
+            for index in range(len(results))
+        ]
+        for future in futures:
+            future.result()
+
+    partitioned_result = PartitionedResult(ranges=results)
+    if partitioned_result.errors:
+        raise PartitionedScanError(partitioned_result)
+    return partitioned_result
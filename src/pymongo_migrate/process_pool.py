@@ -0,0 +1,139 @@
+"""Streaming CPU bound document transforms through a process pool"""
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple, Union
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.collection import Collection
+
+from pymongo_migrate.batch import (
+    DEFAULT_BATCH_SIZE,
+    BatchResult,
+    Transform,
+    WriteOperation,
+    iter_batches,
+)
+from pymongo_migrate.loader import import_module_file
+from pymongo_migrate.throttle import Throttle
+
+
+class _ModuleFileFunction:
+    """
+    Picklable reference to a function of a migration module.
+
+    Migration modules are not importable by name, so worker process
+    imports the module from its file instead.
+    """
+
+    _modules: Dict[str, Any] = {}
+
+    def __init__(self, func: Callable):
+        self.module_file = func.__globals__["__file__"]
+        self.module_name = func.__module__
+        self.qualname = func.__qualname__
+
+    def __call__(self, *args, **kwargs):
+        module = self._modules.get(self.module_name)
+        if module is None:
+            namespace = self.module_name.rpartition(".")[0]
+            module = import_module_file(Path(self.module_file), namespace)
+            self._modules[self.module_name] = module
+        func = module
+        for name in self.qualname.split("."):
+            func = getattr(func, name)
+        return func(*args, **kwargs)
+
+
+def _picklable(transform: Transform) -> Callable:
+    if getattr(transform, "__module__", None) in sys.modules:
+        return transform
+    return _ModuleFileFunction(transform)
+
+
+def _transform_batch(
+    transform: Callable, data: bytes, codec_options: CodecOptions
+) -> List[WriteOperation]:
+    operations: List[WriteOperation] = []
+    for document in bson.decode_all(data, codec_options):
+        operation = transform(document)
+        if operation is None:
+            continue
+        if isinstance(operation, (list, tuple)):
+            operations.extend(operation)
+        else:
+            operations.append(operation)
+    return operations
+
+
+def update_in_process_pool(
+    collection: Collection,
+    transform: Transform,
+    filter: Optional[Mapping[str, Any]] = None,
+    projection: Optional[Union[Mapping[str, Any], List[str]]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    processes: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    start_after: Any = None,
+    on_batch: Optional[Callable[[BatchResult], None]] = None,
+    throttle: Optional[Throttle] = None,
+) -> BatchResult:
+    """
+    Apply CPU bound `transform` to documents in a process pool.
+
+    Batches are read as raw BSON and sent to worker processes as bytes,
+    so documents are decoded only once, by the worker. Write operations
+    returned by workers are written with an unordered bulk write per batch,
+    in order batches were read.
+
+    At most `max_pending` batches (twice the number of processes by default)
+    are being transformed at once; reading waits for the oldest batch
+    to be written, keeping memory use bounded.
+
+    `transform` must be picklable, i.e. a module level function.
+    Functions defined in migration modules are supported.
+    """
+    raw_collection = collection.with_options(
+        codec_options=collection.codec_options.with_options(
+            document_class=RawBSONDocument
+        )
+    )
+    codec_options = collection.codec_options
+    picklable_transform = _picklable(transform)
+    result = BatchResult()
+    pending: Deque[Tuple[Future, int, Any]] = deque()
+
+    def write_oldest():
+        future, read, last_id = pending.popleft()
+        operations = future.result()
+        if operations:
+            result.add_write_result(collection.bulk_write(operations, ordered=False))
+        result.read += read
+        result.batches += 1
+        result.last_id = last_id
+        if on_batch is not None:
+            on_batch(result)
+        if throttle is not None:
+            throttle.wait()
+
+    processes = processes or os.cpu_count() or 1
+    max_pending = max_pending or 2 * processes
+    with ProcessPoolExecutor(processes) as executor:
+        for batch in iter_batches(
+            raw_collection, filter, projection, batch_size, start_after
+        ):
+            data = b"".join(document.raw for document in batch)  # type: ignore
+            future = executor.submit(
+                _transform_batch, picklable_transform, data, codec_options
+            )
+            pending.append((future, len(batch), batch[-1]["_id"]))
+            if len(pending) >= max_pending:
+                write_oldest()
+        while pending:
+            write_oldest()
+    return result
@@ -0,0 +1,166 @@
+"""Dump and restore databases as streamed BSON archives"""
+
+from io import BufferedIOBase
+from typing import (
+    Any,
+    BinaryIO,
+    Container,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    cast,
+)
+
+import bson
+from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.database import Database
+
+SNAPSHOT_FORMAT = 1
+BATCH_SIZE = 1000
+BATCH_BYTES = 8 * 1024 * 1024
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def _user_collections(
+    db: Database, exclude: Container[str] = ()
+) -> Iterator[Mapping[str, Any]]:
+    for info in db.list_collections():
+        if info["name"].startswith("system.") or info["name"] in exclude:
+            continue
+        yield info
+
+
+def _index_spec(index: Mapping[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in index.items() if key not in ("v", "ns")}
+
+
+def _document_batches(
+    documents: Iterator[RawBSONDocument], batch_size: int
+) -> Iterator[List[RawBSONDocument]]:
+    batch: List[RawBSONDocument] = []
+    batch_bytes = 0
+    for document in documents:
+        batch.append(document)
+        batch_bytes += len(document.raw)
+        if len(batch) >= batch_size or batch_bytes >= BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def dump_snapshot(
+    db: Database,
+    fp: BufferedIOBase,
+    migration_name: Optional[str],
+    exclude: Container[str] = (),
+    batch_size: int = BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Write collections of database, with their options, indexes and documents,
+    as stream of BSON records.
+
+    The archive starts with a header record naming the migration it was
+    taken at, followed by a record of each collection and records with
+    batches of its documents. Documents are copied as raw BSON,
+    without being decoded.
+
+    :return: number of documents dumped by collection name
+    """
+    fp.write(
+        bson.encode(
+            {
+                "snapshot": SNAPSHOT_FORMAT,
+                "database": db.name,
+                "migration": migration_name,
+            }
+        )
+    )
+    counts = {}
+    for info in _user_collections(db, exclude):
+        name = info["name"]
+        is_view = info.get("type") == "view"
+        collection = db.get_collection(name, codec_options=RAW_CODEC_OPTIONS)
+        fp.write(
+            bson.encode(
+                {
+                    "collection": name,
+                    "options": info.get("options", {}),
+                    "indexes": (
+                        []
+                        if is_view
+                        else [
+                            _index_spec(index)
+                            for index in db[name].list_indexes()
+                            if index["name"] != "_id_"
+                        ]
+                    ),
+                }
+            )
+        )
+        counts[name] = 0
+        if is_view:
+            continue
+        documents = collection.find(sort=[("_id", 1)], batch_size=batch_size)
+        for batch in _document_batches(documents, batch_size):
+            fp.write(bson.encode({"documents": batch}))
+            counts[name] += len(batch)
+    return counts
+
+
+def read_snapshot_header(fp: BufferedIOBase) -> Dict[str, Any]:
+    for record in bson.decode_file_iter(cast(BinaryIO, fp)):
+        if record.get("snapshot") != SNAPSHOT_FORMAT:
+            raise ValueError("Not a snapshot archive, or unsupported format version")
+        return record
+    raise ValueError("Snapshot archive is empty")
+
+
+def restore_snapshot(
+    db: Database, fp: BufferedIOBase, exclude: Container[str] = ()
+) -> Dict[str, Any]:
+    """
+    Load snapshot archive into empty database.
+
+    Documents are bulk inserted, bypassing document validation, before
+    indexes of their collection are built.
+
+    :param exclude: names of collections which may exist in database
+    :return: snapshot header
+    """
+    existing = [info["name"] for info in _user_collections(db, exclude)]
+    if existing:
+        raise ValueError(
+            f"Snapshot can only be restored into empty database,"
+            f" {db.name!r} has collections: {', '.join(sorted(existing))}"
+        )
+    header = read_snapshot_header(fp)
+    collection_name: Optional[str] = None
+    indexes: List[Dict[str, Any]] = []
+
+    def build_indexes():
+        if collection_name is not None and indexes:
+            db.command("createIndexes", collection_name, indexes=indexes)
+
+    for record in bson.decode_file_iter(
+        cast(BinaryIO, fp), codec_options=RAW_CODEC_OPTIONS
+    ):
+        if "documents" in record:
+            if collection_name is None:
+                raise ValueError("Snapshot documents precede their collection")
+            db[collection_name].insert_many(
+                record["documents"], bypass_document_validation=True
+            )
+            continue
+        build_indexes()
+        collection_info = bson.decode(record.raw)
+        collection_name = collection_info["collection"]
+        indexes = collection_info["indexes"]
+        db.command("create", collection_name, **collection_info["options"])
+    build_indexes()
+    return header
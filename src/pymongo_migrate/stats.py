@@ -0,0 +1,176 @@
+"""Statistics of commands run by migrations"""
+
+import math
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import bson
+import pymongo.monitoring
+
+
+class LatencyHistogram:
+    """
+    Histogram of command durations in logarithmic buckets.
+
+    Adding a duration is cheap and memory does not grow with number of
+    commands; percentiles are accurate to about 5%.
+    """
+
+    BASE = 1.05
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.max = 0
+
+    def add(self, duration_micros: int):
+        bucket = int(math.log(duration_micros, self.BASE)) if duration_micros > 1 else 0
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.max = max(self.max, duration_micros)
+
+    def percentile(self, percent: float) -> int:
+        """Upper bound of duration (in microseconds) of given percent of commands"""
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(math.ceil(self.BASE ** (bucket + 1)), self.max)
+        return self.max
+
+
+def _format_micros(micros: int) -> str:
+    if micros >= 1_000_000:
+        return f"{micros / 1_000_000:.2f}s"
+    if micros >= 1_000:
+        return f"{micros / 1_000:.1f}ms"
+    return f"{micros}us"
+
+
+class CommandSummary:
+    """Counts, failures and latency histogram of commands, by command name"""
+
+    def __init__(self):
+        self.latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    def add(self, command_name: str, duration_micros: int, failed: bool = False):
+        self.latency[command_name].add(duration_micros)
+        if failed:
+            self.failures[command_name] += 1
+
+    def format(self) -> List[str]:
+        return [
+            f"{name}: {histogram.count} commands, {self.failures.get(name, 0)} failed,"
+            f" p50 {_format_micros(histogram.percentile(50))},"
+            f" p95 {_format_micros(histogram.percentile(95))},"
+            f" p99 {_format_micros(histogram.percentile(99))},"
+            f" max {_format_micros(histogram.max)}"
+            for name, histogram in sorted(self.latency.items())
+        ]
+
+
+@dataclass
+class MigrationStats:
+    duration: float = 0.0
+    commands: Dict[str, int] = field(default_factory=dict)
+    command_time: float = 0.0
+    documents_read: int = 0
+    documents_written: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    summary: CommandSummary = field(default_factory=CommandSummary, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        del data["summary"]
+        return data
+
+
+def _documents_read(command_name: str, reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if command_name == "findAndModify":
+        return int(reply.get("value") is not None)
+    return 0
+
+
+def _documents_written(command_name: str, reply: Dict[str, Any]) -> int:
+    if command_name == "update":
+        return reply.get("nModified", 0) + len(reply.get("upserted", ()))
+    if command_name in ("insert", "delete"):
+        return reply.get("n", 0)
+    if command_name == "findAndModify":
+        return reply.get("lastErrorObject", {}).get("n", 0)
+    return 0
+
+
+class CommandStatsListener(pymongo.monitoring.CommandListener):
+    """
+    Collects statistics of commands run within `collect` block.
+
+    Commands are attributed to the block by context variable, so commands run
+    by threads other than the one which entered the block are counted only
+    if started with a copy of its context (see `contextvars.copy_context`).
+
+    usage:
+
+     listener = CommandStatsListener()
+     client = pymongo.MongoClient(event_listeners=[listener])
+     with listener.collect() as stats:
+         # code block ...
+     print(stats.commands)
+    """
+
+    def __init__(self, measure_bytes: bool = True):
+        self.measure_bytes = measure_bytes
+        self._current: ContextVar[Optional[MigrationStats]] = ContextVar(
+            f"command_stats_{id(self)}", default=None
+        )
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def collect(self) -> Iterator[MigrationStats]:
+        stats = MigrationStats(commands=defaultdict(int))
+        token = self._current.set(stats)
+        try:
+            yield stats
+        finally:
+            self._current.reset(token)
+            stats.commands = dict(stats.commands)
+
+    def started(self, event):
+        stats = self._current.get()
+        if stats is None:
+            return
+        sent = len(bson.encode(event.command)) if self.measure_bytes else 0
+        with self._lock:
+            stats.commands[event.command_name] += 1
+            stats.bytes_sent += sent
+
+    def succeeded(self, event):
+        stats = self._current.get()
+        if stats is None:
+            return
+        reply = event.reply
+        received = len(bson.encode(reply)) if self.measure_bytes else 0
+        with self._lock:
+            stats.command_time += event.duration_micros / 1_000_000
+            stats.summary.add(event.command_name, event.duration_micros)
+            stats.documents_read += _documents_read(event.command_name, reply)
+            stats.documents_written += _documents_written(event.command_name, reply)
+            stats.bytes_received += received
+
+    def failed(self, event):
+        stats = self._current.get()
+        if stats is None:
+            return
+        with self._lock:
+            stats.command_time += event.duration_micros / 1_000_000
+            stats.summary.add(event.command_name, event.duration_micros, failed=True)
@@ -0,0 +1,157 @@
+"""Throttling of long running migrations based on replication lag and server load"""
+
+import datetime
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pymongo
+from pymongo.errors import OperationFailure
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Throttle:
+    """
+    Slow down or pause writes when secondaries lag behind the primary
+    or server write latency grows.
+
+    Call `wait` between batches; server is checked at most every
+    `check_interval` seconds. Above `max_lag` (or `max_latency_ms`) delay
+    between batches is doubled, up to `max_delay`, and halved again once
+    below. Above `pause_lag` writes are paused until lag drops below `max_lag`.
+
+    usage:
+
+     throttle = Throttle(db.client, max_lag=5)
+     update_in_batches(db.users, transform, throttle=throttle)
+    """
+
+    def __init__(
+        self,
+        client: pymongo.MongoClient,
+        max_lag: float = 10.0,
+        pause_lag: float = 60.0,
+        max_latency_ms: Optional[float] = None,
+        check_interval: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        logger: logging.Logger = LOGGER,
+    ):
+        self.client = client
+        self.max_lag = max_lag
+        self.pause_lag = pause_lag
+        self.max_latency_ms = max_latency_ms
+        self.check_interval = check_interval
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.logger = logger
+        self.delay = 0.0
+        self.sleep = time.sleep
+        self._lag_supported = True
+        self._latency_supported = True
+        self._last_check: Optional[float] = None
+        self._last_latency: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def replication_lag(self) -> Optional[float]:
+        """Seconds the slowest secondary lags behind primary, None if unknown"""
+        if not self._lag_supported:
+            return None
+        try:
+            status = self.client.admin.command("replSetGetStatus")
+        except OperationFailure as e:
+            self.logger.info("Replication lag not available, not throttling: %s", e)
+            self._lag_supported = False
+            return None
+        optimes: Dict[str, List[datetime.datetime]] = {"PRIMARY": [], "SECONDARY": []}
+        for member in status["members"]:
+            if member["stateStr"] in optimes:
+                optimes[member["stateStr"]].append(member["optimeDate"])
+        if not optimes["PRIMARY"] or not optimes["SECONDARY"]:
+            return 0.0
+        lag = max(optimes["PRIMARY"]) - min(optimes["SECONDARY"])
+        return max(lag.total_seconds(), 0.0)
+
+    def write_latency_ms(self) -> Optional[float]:
+        """Average write latency since previous call, None if not yet known"""
+        if not self._latency_supported:
+            return None
+        try:
+            status = self.client.admin.command("serverStatus")
+        except OperationFailure as e:
+            self.logger.info("Write latency not available, not throttling: %s", e)
+            self._latency_supported = False
+            return None
+        writes = status["opLatencies"]["writes"]
+        current = (writes["latency"], writes["ops"])
+        previous, self._last_latency = self._last_latency, current
+        if previous is None or current[1] <= previous[1]:
+            return None
+        return (current[0] - previous[0]) / (current[1] - previous[1]) / 1000
+
+    def _overloaded(self, lag: Optional[float]) -> bool:
+        if lag is not None and lag > self.max_lag:
+            self.logger.info("Replication lag %.1fs above %.1fs", lag, self.max_lag)
+            return True
+        if self.max_latency_ms is not None:
+            latency = self.write_latency_ms()
+            if latency is not None and latency > self.max_latency_ms:
+                self.logger.info(
+                    "Write latency %.1fms above %.1fms", latency, self.max_latency_ms
+                )
+                return True
+        return False
+
+    def wait(self):
+        """
+        Sleep between batches as long as the server needs.
+
+        Threads calling it while writes are paused wait until they are resumed.
+        """
+        lag: Optional[float] = None
+        pause = False
+        with self._lock:
+            now = time.monotonic()
+            if not self._resumed.is_set() or (
+                self._last_check is not None
+                and now - self._last_check < self.check_interval
+            ):
+                delay = self.delay
+            else:
+                self._last_check = now
+                lag = self.replication_lag()
+                pause = lag is not None and lag >= self.pause_lag
+                if pause:
+                    self._resumed.clear()
+                    self.delay = self.max_delay
+                delay = self.delay if pause else self._check(lag)
+        if pause:
+            self._pause(lag)
+        self._resumed.wait()
+        if delay:
+            self.sleep(delay)
+
+    def _pause(self, lag: Optional[float]):
+        self.logger.warning(
+            "Replication lag %.1fs above %.1fs, pausing", lag, self.pause_lag
+        )
+        try:
+            while lag is not None and lag > self.max_lag:
+                self.sleep(self.check_interval)
+                lag = self.replication_lag()
+        finally:
+            self._resumed.set()
+        self.logger.info("Replication lag %.1fs, resuming", lag or 0.0)
+
+    def _check(self, lag: Optional[float]) -> float:
+        if self._overloaded(lag):
+            self.delay = min(max(self.delay * 2, self.min_delay), self.max_delay)
+            self.logger.info("Throttling, delay between batches %.2fs", self.delay)
+        elif self.delay:
+            self.delay = self.delay / 2 if self.delay / 2 >= self.min_delay else 0.0
+            self.logger.debug("Delay between batches reduced to %.2fs", self.delay)
+        return self.delay
@@ -1,5 +1,6 @@
 import random
 import shutil
+import textwrap
 from datetime import timezone
 from pathlib import Path
 from typing import Dict
@@ -77,6 +78,52 @@ def mongo_migrate(db_uri, db_name, db, migrations_dir):
 @pytest.fixture()
 def get_db_migrations(db_collection):
     def getter():
-        return list(db_collection.find(projection={"_id": False}, sort=[("name", 1)]))
+        return list(
+            db_collection.find(
+                projection={"_id": False, "stats": False}, sort=[("name", 1)]
+            )
+        )
 
     return getter
+
+
+@pytest.fixture
+def write_migration():
+    def writer(
+        path,
+        name,
+        dependencies,
+        upgrade="pass",
+        downgrade="pass",
+        arguments="db",
+        asynchronous=False,
+        **attributes,
+    ):
+        def_ = "async def" if asynchronous else "def"
+        source = "import asyncio\n" if asynchronous else ""
+        source += f"name = {name!r}\ndependencies = {dependencies!r}\n"
+        for key, value in attributes.items():
+            source += f"{key} = {value!r}\n"
+        source += (
+            f"\n{def_} upgrade({arguments}):\n{textwrap.indent(upgrade, '    ')}\n"
+            f"\n{def_} downgrade({arguments}):\n{textwrap.indent(downgrade, '    ')}\n"
+        )
+        (path / f"{name}.py").write_text(source)
+
+    return writer
+
+
+@pytest.fixture
+def get_mongo_migrate(db_uri, db_name, db):
+    clients = []
+
+    def factory(migrations_dir, **kwargs):
+        client = pymongo.MongoClient(db_uri)
+        clients.append(client)
+        return MongoMigrate(
+            client, db_name, migrations_dir=str(migrations_dir), **kwargs
+        )
+
+    yield factory
+    for client in clients:
+        client.close()
@@ -0,0 +1,155 @@
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pymongo
+import pytest
+from pymongo_migrate.async_mongo_migrate import AsyncMongoMigrate
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+AsyncMongoClient = getattr(pymongo, "AsyncMongoClient", None)
+pytestmark = pytest.mark.skipif(
+    AsyncMongoClient is None, reason="pymongo without asyncio support"
+)
+
+
+@pytest.fixture
+def async_migrations_dir(tmp_path, write_migration):
+    write_migration(
+        tmp_path,
+        "0001",
+        [],
+        "await db.events.insert_one({'name': '0001'})",
+        "await db.events.drop()",
+        asynchronous=True,
+    )
+    for name in ("0002_a", "0002_b"):
+        write_migration(
+            tmp_path,
+            name,
+            ["0001"],
+            f"await db.events.insert_one({{'name': '{name}', 'event': 'start'}})\n"
+            "await asyncio.sleep(0.05)\n"
+            f"await db.events.insert_one({{'name': '{name}', 'event': 'end'}})",
+            f"await db.events.delete_many({{'name': '{name}'}})",
+            asynchronous=True,
+        )
+    write_migration(tmp_path, "0003", ["0002_a", "0002_b"], asynchronous=True)
+    return str(tmp_path)
+
+
+def run_migrate(db_uri, db_name, migrations_dir, coroutine_factory, **kwargs):
+    async def run():
+        client = AsyncMongoClient(db_uri)
+        try:
+            mongo_migrate = AsyncMongoMigrate(
+                client, db_name, migrations_dir=migrations_dir, **kwargs
+            )
+            return await coroutine_factory(mongo_migrate)
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_upgrade_n_downgrade(db_uri, db_name, db, db_collection, async_migrations_dir):
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.upgrade())
+
+    assert db.events.count_documents({}) == 5
+    assert {
+        state["name"] for state in db_collection.find({"applied": {"$ne": None}})
+    } == {
+        "0001",
+        "0002_a",
+        "0002_b",
+        "0003",
+    }
+
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.downgrade("0001"))
+
+    assert db.events.count_documents({}) == 1
+    assert db_collection.count_documents({"applied": {"$ne": None}}) == 1
+
+
+def test_upgrade_concurrently(db_uri, db_name, db, async_migrations_dir):
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.upgrade(workers=2))
+
+    events = [(e["name"], e.get("event")) for e in db.events.find().sort("_id")]
+    assert events[1:3] == [("0002_a", "start"), ("0002_b", "start")]
+
+
+def test_get_state(db_uri, db_name, db, async_migrations_dir):
+    async def upgrade_and_get_state(mongo_migrate):
+        await mongo_migrate.upgrade("0001")
+        return await mongo_migrate.get_state(mongo_migrate.graph.migrations["0001"])
+
+    state = run_migrate(db_uri, db_name, async_migrations_dir, upgrade_and_get_state)
+    assert state.applied is not None
+
+
+def test_migrate_fake(db_uri, db_name, db, db_collection, async_migrations_dir):
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.migrate(fake=True))
+
+    assert db_collection.count_documents({"applied": {"$ne": None}}) == 4
+    assert db.events.count_documents({}) == 0
+
+
+def test_downgrade_fake(db_uri, db_name, db, db_collection, async_migrations_dir):
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.upgrade())
+
+    async def downgrade_fake(mongo_migrate):
+        with patch.object(mongo_migrate, "set_state") as set_state:
+            await mongo_migrate.downgrade("0001", fake=True)
+        set_state.assert_not_called()
+
+    run_migrate(db_uri, db_name, async_migrations_dir, downgrade_fake)
+    assert db.events.count_documents({}) == 5
+    assert [
+        state["name"] for state in db_collection.find({"applied": {"$ne": None}})
+    ] == ["0001"]
+
+
+def test_sync_migrations(db_uri, db_name, db, migrations_dir):
+    sync_client = pymongo.MongoClient(db_uri)
+    run_migrate(
+        db_uri,
+        db_name,
+        migrations_dir,
+        lambda mm: mm.migrate(),
+        sync_client=sync_client,
+    )
+    sync_client.close()
+
+    assert db.numbers_collection.count_documents({}) == 499
+
+
+def test_sync_migrations_without_sync_client(db_uri, db_name, db, migrations_dir):
+    with pytest.raises(ValueError):
+        run_migrate(db_uri, db_name, migrations_dir, lambda mm: mm.upgrade())
+
+
+def test_squash(db_uri, db_name, db, db_collection, async_migrations_dir):
+    client = pymongo.MongoClient(db_uri)
+    MongoMigrate(client, db_name, migrations_dir=async_migrations_dir).squash(
+        "0001", "0002_b", name="0002_squashed"
+    )
+    client.close()
+
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.upgrade())
+    assert db.events.count_documents({}) == 5
+    assert db_collection.count_documents({"applied": {"$ne": None}}) == 5
+
+    run_migrate(db_uri, db_name, async_migrations_dir, lambda mm: mm.downgrade())
+    assert db.events.count_documents({}) == 0
+
+
+def test_squash_with_sync_migration(db_uri, db_name, async_migrations_dir):
+    (Path(async_migrations_dir) / "0004.py").write_text(
+        "name = '0004'\ndependencies = ['0003']\ndef upgrade(db):\n    pass\n"
+    )
+    client = pymongo.MongoClient(db_uri)
+    mongo_migrate = MongoMigrate(client, db_name, migrations_dir=async_migrations_dir)
+
+    with pytest.raises(ValueError, match="Coroutine"):
+        mongo_migrate.squash("0003", "0004")
+    client.close()
@@ -0,0 +1,71 @@
+from unittest.mock import Mock
+
+import pytest
+from pymongo import DeleteOne, UpdateOne
+from pymongo_migrate.batch import insert_in_batches, iter_batches, update_in_batches
+
+
+@pytest.fixture
+def numbers(db):
+    db.numbers.insert_many([{"_id": i, "i": i, "even": not i % 2} for i in range(25)])
+    return db.numbers
+
+
+def test_iter_batches(numbers):
+    batches = list(iter_batches(numbers, {"even": True}, ["i"], batch_size=5))
+    assert [len(batch) for batch in batches] == [5, 5, 3]
+    assert [doc["i"] for batch in batches for doc in batch] == list(range(0, 25, 2))
+    assert batches[0][0] == {"_id": 0, "i": 0}
+
+
+def test_iter_batches_start_after(numbers):
+    batches = list(iter_batches(numbers, batch_size=10, start_after=19))
+    assert [doc["_id"] for batch in batches for doc in batch] == list(range(20, 25))
+
+
+def test_update_in_batches(numbers):
+    def transform(doc):
+        if doc["i"] < 5:
+            return DeleteOne({"_id": doc["_id"]})
+        if doc["even"]:
+            return UpdateOne({"_id": doc["_id"]}, {"$set": {"half": doc["i"] // 2}})
+        return None
+
+    on_batch = Mock()
+    result = update_in_batches(numbers, transform, batch_size=10, on_batch=on_batch)
+
+    assert (result.read, result.deleted, result.modified, result.batches) == (
+        25,
+        5,
+        10,
+        3,
+    )
+    assert result.last_id == 24
+    assert on_batch.call_count == 3
+    assert numbers.count_documents({}) == 20
+    assert numbers.count_documents({"half": {"$exists": True}}) == 10
+
+
+def test_update_in_batches_multiple_operations(numbers):
+    result = update_in_batches(
+        numbers,
+        lambda doc: [
+            UpdateOne({"_id": doc["_id"]}, {"$inc": {"i": 1}}),
+            UpdateOne({"_id": doc["_id"]}, {"$inc": {"i": 1}}),
+        ],
+        filter={"i": {"$lt": 3}},
+    )
+    assert result.modified == 6
+    assert [doc["i"] for doc in numbers.find({"_id": {"$lt": 3}})] == [2, 3, 4]
+
+
+def test_insert_in_batches(db):
+    result = insert_in_batches(db.numbers, ({"i": i} for i in range(25)), 10)
+    assert (result.inserted, result.batches) == (25, 3)
+    assert db.numbers.count_documents({}) == 25
+
+
+def test_update_in_batches_throttle(numbers):
+    throttle = Mock()
+    update_in_batches(numbers, lambda doc: None, batch_size=10, throttle=throttle)
+    assert throttle.wait.call_count == 3
@@ -1,3 +1,5 @@
+import shutil
+
 import freezegun
 import pytest
 from click.testing import CliRunner
@@ -89,3 +91,143 @@ def test_migrate_verbose(invoker, db, db_uri, migrations_dir):
     )
 
     assert "Command update#" in result.stdout
+
+
+def test_migrate_verbose_summary(invoker, db, db_uri, migrations_dir):
+    result = invoker(
+        ["migrate", "-u", db_uri, "-m", migrations_dir, "-v"], catch_exceptions=False
+    )
+
+    assert "Command update#" not in result.stdout
+    assert "Commands summary:" in result.stdout
+    assert "  update: 1 commands, 0 failed, p50 " in result.stdout
+
+
+def test_migrate_verbose_dump_size(invoker, db, db_uri, migrations_dir):
+    result = invoker(
+        ["migrate", "-u", db_uri, "-m", migrations_dir, "-vvv", "--dump-size", "20"],
+        catch_exceptions=False,
+    )
+
+    assert "Command insert#" in result.stdout
+    assert "more characters)" in result.stdout
+
+
+def test_upgrade_profile(invoker, db, db_uri, migrations_dir, tmp_path):
+    result = invoker(
+        [
+            "upgrade",
+            "-u",
+            db_uri,
+            "-m",
+            migrations_dir,
+            "--profile",
+            str(tmp_path),
+            "--profile-top",
+            "3",
+        ],
+        catch_exceptions=False,
+    )
+
+    assert (tmp_path / "20150612230153.upgrade.pstats").exists()
+    assert "Profile of '20150612230153' saved to" in result.stdout
+
+
+def test_upgrade_dry_run(invoker, db, db_uri, migrations_dir):
+    result = invoker(
+        ["upgrade", "-u", db_uri, "-m", migrations_dir, "--dry-run"],
+        catch_exceptions=False,
+    )
+
+    assert "Would run numbers_collection.insert_many 1000 documents" in result.stdout
+    assert "numbers_collection" not in db.list_collection_names()
+
+
+def test_show_missing_state_index(invoker, db, db_uri, db_collection, migrations_dir):
+    db_collection.insert_one({"name": "20150612230153", "applied": None})
+    result = invoker(
+        ["show", "-u", db_uri, "-m", migrations_dir], catch_exceptions=False
+    )
+
+    assert "unique index on pymongo_migrate.name is missing" in result.output
+    assert "it will be created" in result.output
+
+    result = invoker(
+        ["show", "-u", db_uri, "-m", migrations_dir, "--no-state-index"],
+        catch_exceptions=False,
+    )
+
+    assert "unique index on pymongo_migrate.name is missing" in result.output
+    assert "it will be created" not in result.output
+
+
+def test_show_unmerged_branches(invoker, db, db_uri, tmp_path, write_migration):
+    write_migration(tmp_path, "0001", [])
+    write_migration(tmp_path, "0002_a", ["0001"])
+    write_migration(tmp_path, "0002_b", ["0001"])
+    result = invoker(
+        ["show", "-u", db_uri, "-m", str(tmp_path)], catch_exceptions=False
+    )
+
+    assert result.stdout.splitlines()[1:] == [
+        "0001  \tNot applied",
+        "0002_a\tNot applied",
+        "0002_b\tNot applied",
+    ]
+    result = invoker(["upgrade", "-u", db_uri, "-m", str(tmp_path)])
+    assert "multiple heads" in str(result.exception)
+
+
+def test_show_in_progress(invoker, db, db_uri, db_collection, migrations_dir):
+    db_collection.insert_one({"name": "20150612230153", "checkpoint": {"next": 5}})
+    result = invoker(
+        ["show", "-u", db_uri, "-m", migrations_dir], catch_exceptions=False
+    )
+
+    assert "20150612230153       \tIn progress: {'next': 5}" in result.stdout
+
+
+def test_show_stats(invoker, db, db_uri, db_collection, migrations_dir):
+    invoker(["upgrade", "-u", db_uri, "-m", migrations_dir], catch_exceptions=False)
+    result = invoker(
+        ["show", "-u", db_uri, "-m", migrations_dir, "--stats"],
+        catch_exceptions=False,
+    )
+
+    lines = result.stdout.splitlines()
+    assert lines[0].endswith("Duration\tCommands\tRead\tWritten\tBytes")
+    assert lines[1].split("\t")[-3:-1] == ["0", "1000"]
+
+
+def test_squash(invoker, db, db_uri, migrations_dir, tmp_path):
+    squash_dir = tmp_path / "migrations"
+    shutil.copytree(migrations_dir, squash_dir)
+    result = invoker(
+        ["squash", "-u", db_uri, "-m", str(squash_dir), "--name", "0001_squashed"],
+        catch_exceptions=False,
+    )
+
+    assert "0001_squashed" in result.stdout
+    assert (squash_dir / "0001_squashed.py").exists()
+
+
+def test_snapshot(invoker, db, db_uri, migrations_dir, tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.bson.gz")
+    invoker(["upgrade", "-u", db_uri, "-m", migrations_dir], catch_exceptions=False)
+    result = invoker(
+        ["snapshot", "-u", db_uri, "-m", migrations_dir, snapshot_path],
+        catch_exceptions=False,
+    )
+
+    assert "Dumped 500 documents of 2 collections" in result.stdout
+
+
+def test_migrate_databases(invoker, db, db_uri, db_name, migrations_dir):
+    result = invoker(
+        ["migrate-databases", "-u", db_uri, "-m", migrations_dir, db_name],
+        catch_exceptions=False,
+    )
+
+    assert f"{db_name}: at 20181123000000_gt_500" in result.stdout
+    assert "Migrated 1 databases, 0 failed" in result.stdout
+    assert db.numbers_collection.count_documents({}) == 499
@@ -0,0 +1,147 @@
+import pytest
+from pymongo import DeleteOne, InsertOne, ReadPreference, UpdateMany, UpdateOne
+from pymongo_migrate.dry_run import RecordingDatabase, explain_filter
+
+
+@pytest.fixture
+def numbers(db):
+    db.numbers.insert_many([{"_id": i, "i": i, "even": not i % 2} for i in range(20)])
+    db.numbers.create_index("i")
+    return db.numbers
+
+
+def test_recording_database(db, numbers):
+    recording_db = RecordingDatabase(db)
+    result = recording_db.numbers.insert_one({"i": 100})
+    recording_db["numbers"].update_many({"even": True}, {"$set": {"odd": False}})
+    recording_db.numbers.bulk_write(
+        [
+            InsertOne({"i": 101}),
+            DeleteOne({"_id": 1}),
+            UpdateMany({}, {"$inc": {"i": 1}}),
+        ]
+    )
+    recording_db.drop_collection("numbers")
+
+    assert result.inserted_id is not None
+    assert recording_db.numbers.count_documents({}) == 20
+    assert numbers.count_documents({"odd": False}) == 0
+    assert [(w.collection, w.operation) for w in recording_db.writes] == [
+        ("numbers", "insert_one"),
+        ("numbers", "update_many"),
+        ("numbers", "InsertOne"),
+        ("numbers", "DeleteOne"),
+        ("numbers", "UpdateMany"),
+        ("numbers", "drop"),
+    ]
+
+
+def test_recording_database_command(db, numbers):
+    recording_db = RecordingDatabase(db)
+    assert recording_db.command("count", "numbers")["n"] == 20
+    recording_db.command({"collMod": "numbers", "validator": {}})
+    assert [(w.collection, w.operation) for w in recording_db.writes] == [
+        ("numbers", "collMod")
+    ]
+
+
+def test_recording_aggregate_out(db, numbers):
+    recording_db = RecordingDatabase(db)
+    assert len(list(recording_db.numbers.aggregate([{"$match": {"even": True}}]))) == 10
+    assert list(recording_db.numbers.aggregate([{"$out": "evens"}])) == []
+    assert "evens" not in db.list_collection_names()
+    assert [w.operation for w in recording_db.writes] == ["aggregate"]
+
+
+def test_recording_with_options(db, numbers):
+    recording_db = RecordingDatabase(db)
+    recording_db.numbers.with_options(
+        read_preference=ReadPreference.PRIMARY
+    ).insert_one({})
+    recording_db.with_options(
+        read_preference=ReadPreference.PRIMARY
+    ).numbers.delete_many({})
+    recording_db.numbers.database.numbers.update_many({}, {"$set": {"i": 0}})
+    recording_db.client[db.name].get_collection("numbers").drop()
+
+    assert numbers.count_documents({}) == 20
+    assert numbers.count_documents({"i": 0}) == 1
+    assert [(w.collection, w.operation) for w in recording_db.writes] == [
+        ("numbers", "insert_one"),
+        ("numbers", "delete_many"),
+        ("numbers", "update_many"),
+        ("numbers", "drop"),
+    ]
+
+
+def test_recording_unknown_attribute(db):
+    recording_db = RecordingDatabase(db)
+
+    with pytest.raises(NotImplementedError, match="dry run"):
+        recording_db.client.close()
+    with pytest.raises(NotImplementedError, match="dry run"):
+        recording_db.numbers.aggregate_raw_batches([{"$out": "evens"}])
+
+
+def test_explain_filter(numbers):
+    index_plan = explain_filter(numbers, {"i": {"$lt": 5}})
+    assert not index_plan.collection_scan
+    assert "IXSCAN" in index_plan.stages
+    assert index_plan.index_names == ["i_1"]
+    assert index_plan.docs_examined is None
+    assert "examined" not in index_plan.format()
+
+    scan_plan = explain_filter(numbers, {"even": True}, execute=True)
+    assert scan_plan.collection_scan
+    assert scan_plan.docs_examined == 20
+
+
+def test_explain_writes(db, numbers):
+    recording_db = RecordingDatabase(db)
+    recording_db.numbers.delete_many({"even": False})
+    recording_db.numbers.update_one({"i": 3}, {"$set": {"three": True}})
+    recording_db.numbers.insert_many([{"i": 1}, {"i": 2}])
+
+    delete, update, insert = recording_db.explain_writes()
+    assert delete.plan.collection_scan
+    assert "COLLSCAN" in delete.format()
+    assert not update.plan.collection_scan
+    assert insert.plan is None
+    assert insert.format() == "numbers.insert_many 2 documents"
+
+
+def test_explain_bulk_writes(db, numbers):
+    recording_db = RecordingDatabase(db)
+    recording_db.numbers.bulk_write(
+        [
+            UpdateOne({"i": 1}, {"$set": {"one": True}}),
+            UpdateOne({"i": 2}, {"$set": {"two": True}}),
+            DeleteOne({"even": True}),
+        ]
+    )
+
+    first, second, delete = recording_db.explain_writes()
+    assert first.filter == {"i": 1}
+    assert first.update == {"$set": {"one": True}}
+    assert not first.multi
+    assert "IXSCAN" in first.plan.stages
+    assert second.plan is first.plan
+    assert delete.plan.collection_scan
+
+
+def test_upgrade_dry_run(mongo_migrate, db, db_collection):
+    writes = mongo_migrate.upgrade(dry_run=True)
+
+    assert [w.format() for w in writes["20150612230153"]] == [
+        "numbers_collection.insert_many 1000 documents"
+    ]
+    (delete,) = writes["20181123000000_gt_500"]
+    assert delete.operation == "delete_many"
+    assert delete.filter == {"i": {"$lt": 501}}
+    assert db.numbers_collection.count_documents({}) == 0
+    assert db_collection.count_documents({}) == 0
+
+
+def test_upgrade_dry_run_fake(mongo_migrate):
+    with pytest.raises(ValueError):
+        mongo_migrate.upgrade(fake=True, dry_run=True)
@@ -0,0 +1,58 @@
+import pymongo
+import pytest
+from pymongo_migrate.fan_out import FanOutMigrate
+
+
+@pytest.fixture
+def tenant_names(mongo_url, db_name):
+    names = [f"{db_name}_tenant_{i}" for i in range(3)]
+    yield names
+    client = pymongo.MongoClient(mongo_url)
+    for name in names:
+        client.drop_database(name)
+    client.close()
+
+
+def test_migrate(mongo_migrate, tenant_names):
+    fan_out = FanOutMigrate(mongo_migrate, databases=tenant_names, concurrency=2)
+
+    results = fan_out.migrate()
+
+    assert [(r.database, r.migration, r.ok) for r in results] == [
+        (name, "20181123000000_gt_500", True) for name in tenant_names
+    ]
+    for name in tenant_names:
+        assert mongo_migrate.client[name].numbers_collection.count_documents({}) == 499
+
+
+def test_for_database_shares_graph(mongo_migrate):
+    tenant_migrate = mongo_migrate.for_database("other")
+
+    assert tenant_migrate.database == "other"
+    assert tenant_migrate.client is mongo_migrate.client
+    assert tenant_migrate.graph is mongo_migrate.graph
+
+
+def test_database_pattern(mongo_migrate, tenant_names):
+    for name in tenant_names[1:]:
+        mongo_migrate.client[name].tenant.insert_one({})
+    fan_out = FanOutMigrate(
+        mongo_migrate,
+        databases=tenant_names[:2],
+        database_pattern=f"^{tenant_names[0][:-1]}",
+    )
+
+    assert fan_out.list_databases() == tenant_names
+
+
+def test_failing_database(mongo_migrate, tenant_names):
+    def action(tenant_migrate):
+        if tenant_migrate.database == tenant_names[1]:
+            raise RuntimeError("tenant is broken")
+        tenant_migrate.upgrade("20150612230153")
+
+    results = FanOutMigrate(mongo_migrate, databases=tenant_names).run(action)
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[0].migration == "20150612230153"
+    assert "tenant is broken" in results[1].format()
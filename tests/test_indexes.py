@@ -0,0 +1,60 @@
+import pymongo
+import pytest
+from pymongo_migrate.indexes import Index, build_indexes, drop_indexes
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+
+def test_index_matches():
+    index = Index("users", [("email", pymongo.ASCENDING)], unique=True)
+
+    assert index.name == "email_1"
+    assert index.matches(
+        {"v": 2, "key": {"email": 1}, "name": "email_1", "unique": True}
+    )
+    assert not index.matches({"v": 2, "key": {"email": 1}, "name": "email_1"})
+
+
+def test_build_n_drop_indexes(db):
+    db.users.insert_many([{"email": f"{i}@example.com", "age": i} for i in range(10)])
+    db.users.create_index("age")
+    indexes = [
+        Index("users", [("email", pymongo.ASCENDING)], unique=True),
+        Index("users", "age"),
+        Index("orders", [("created", pymongo.DESCENDING)]),
+    ]
+
+    assert build_indexes(db, indexes) == [indexes[0], indexes[2]]
+    assert db.users.index_information()["email_1"]["unique"]
+    assert "created_-1" in db.orders.index_information()
+    assert build_indexes(db, indexes) == []
+
+    drop_indexes(db, indexes)
+    drop_indexes(db, indexes)
+    assert list(db.users.index_information()) == ["_id_"]
+    assert list(db.orders.index_information()) == ["_id_"]
+
+
+def test_build_conflicting_index(db):
+    db.users.create_index("email", name="email")
+
+    with pytest.raises(pymongo.errors.OperationFailure):
+        build_indexes(db, [Index("users", "email", name="email", unique=True)])
+
+
+def test_migration_indexes(db_uri, db_name, db, tmp_path):
+    (tmp_path / "0001.py").write_text(
+        "import pymongo\n"
+        "from pymongo_migrate.indexes import Index\n"
+        "name = '0001'\n"
+        "dependencies = []\n"
+        "indexes = [Index('users', [('email', pymongo.ASCENDING)], unique=True)]\n"
+    )
+    client = pymongo.MongoClient(db_uri)
+    mongo_migrate = MongoMigrate(client, db_name, migrations_dir=str(tmp_path))
+
+    mongo_migrate.upgrade()
+    assert db.users.index_information()["email_1"]["unique"]
+
+    mongo_migrate.downgrade()
+    assert "email_1" not in db.users.index_information()
+    client.close()
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+from pymongo_migrate.loader import (
+    load_lazy_module_migrations,
+    load_module_migrations,
+    read_module_metadata,
+)
+
+LAZY_MIGRATION = '''\
+"""
+Needs module which is not installed
+"""
+import not_installed_module
+
+name = "20190101000000"
+dependencies = ["20181231000000"]
+
+
+def upgrade(db):
+    not_installed_module.upgrade(db)
+
+
+def downgrade(db):
+    pass
+'''
+
+DYNAMIC_MIGRATION = """\
+name = "20190102000000"
+dependencies = ["20190101000000"][:1]
+
+
+def upgrade(db):
+    pass
+
+
+def downgrade(db):
+    pass
+"""
+
+
+@pytest.fixture
+def lazy_migrations_dir(tmp_path):
+    (tmp_path / "20190101000000.py").write_text(LAZY_MIGRATION)
+    return tmp_path
+
+
+def test_read_module_metadata(lazy_migrations_dir):
+    assert read_module_metadata(lazy_migrations_dir / "20190101000000.py") == {
+        "name": "20190101000000",
+        "dependencies": ["20181231000000"],
+        "description": "\nNeeds module which is not installed\n",
+    }
+
+
+def test_read_module_metadata_not_literal(tmp_path):
+    module_file = tmp_path / "20190102000000.py"
+    module_file.write_text(DYNAMIC_MIGRATION)
+    with pytest.raises(ValueError):
+        read_module_metadata(module_file)
+
+
+def test_lazy_load_does_not_import(lazy_migrations_dir):
+    (migration,) = load_lazy_module_migrations(lazy_migrations_dir)
+    assert migration.name == "20190101000000"
+    assert migration.dependencies == ["20181231000000"]
+    assert migration.description == "\nNeeds module which is not installed\n"
+    assert not migration.loaded
+    with pytest.raises(ModuleNotFoundError):
+        migration.upgrade(None)
+
+
+def test_lazy_load_falls_back_to_import(tmp_path):
+    (tmp_path / "20190102000000.py").write_text(DYNAMIC_MIGRATION)
+    (migration,) = load_lazy_module_migrations(tmp_path)
+    assert migration.dependencies == ["20190101000000"]
+
+
+def test_lazy_load_matches_eager_load(migrations_dir):
+    def describe(migrations):
+        return sorted((m.name, m.dependencies, m.description) for m in migrations)
+
+    assert describe(load_lazy_module_migrations(Path(migrations_dir))) == describe(
+        load_module_migrations(Path(migrations_dir))
+    )
@@ -0,0 +1,85 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from pymongo.errors import PyMongoError
+from pymongo_migrate.lock import MigrationLock, MigrationLockLostError
+
+
+@pytest.fixture
+def lock_collection(db):
+    return db.pymongo_migrate_lock
+
+
+def test_lock(lock_collection):
+    with MigrationLock(lock_collection, owner="first"):
+        assert lock_collection.find_one()["owner"] == "first"
+        assert not MigrationLock(lock_collection, owner="second").try_acquire()
+    assert lock_collection.count_documents({}) == 0
+    assert MigrationLock(lock_collection, owner="second").try_acquire()
+
+
+def test_lock_is_reacquired_by_owner(lock_collection):
+    lock = MigrationLock(lock_collection, owner="first")
+    assert lock.try_acquire()
+    assert lock.try_acquire()
+
+
+def test_expired_lock_is_taken_over(lock_collection):
+    assert MigrationLock(lock_collection, owner="first", ttl=0.01).try_acquire()
+    time.sleep(0.05)
+    assert MigrationLock(lock_collection, owner="second").try_acquire()
+
+
+def test_lock_timeout(lock_collection):
+    with MigrationLock(lock_collection, owner="first"):
+        with pytest.raises(TimeoutError, match="held by 'first'"):
+            MigrationLock(lock_collection, owner="second").acquire(timeout=0.3)
+
+
+def test_lock_lease_renewed(lock_collection):
+    with MigrationLock(lock_collection, owner="first", ttl=0.3) as lock:
+        time.sleep(0.6)
+        assert not MigrationLock(lock_collection, owner="second").try_acquire()
+        assert not lock.lost
+
+
+def test_lock_lost_when_lease_expires(lock_collection):
+    with MigrationLock(lock_collection, owner="first", ttl=0.3) as lock:
+        with patch.object(
+            lock.collection, "update_one", side_effect=PyMongoError("down")
+        ):
+            time.sleep(0.7)
+        assert lock.lost
+        with pytest.raises(MigrationLockLostError, match="'first'"):
+            lock.check()
+
+
+def test_waits_for_expired_lock(lock_collection):
+    MigrationLock(lock_collection, owner="crashed", ttl=0.2).try_acquire()
+    with patch.object(MigrationLock, "max_wait", 0.1):
+        lock = MigrationLock(lock_collection, owner="second").acquire(timeout=5)
+    lock.release()
+
+
+def test_mongo_migrate_with_lock(mongo_migrate, get_db_migrations):
+    mongo_migrate.lock = True
+    with patch.object(
+        MigrationLock, "acquire", autospec=True, side_effect=lambda self, timeout: self
+    ) as acquire_mock:
+        mongo_migrate.migrate(fake=True)
+    acquire_mock.assert_called_once()
+    assert len(get_db_migrations()) == 2
+    assert mongo_migrate.lock_collection.count_documents({}) == 0
+
+
+def test_mongo_migrate_lock_lost(mongo_migrate, get_db_migrations):
+    def acquire(self, timeout):
+        self.lost = True
+        return self
+
+    mongo_migrate.lock = True
+    with patch.object(MigrationLock, "acquire", autospec=True, side_effect=acquire):
+        with pytest.raises(MigrationLockLostError):
+            mongo_migrate.upgrade()
+    assert get_db_migrations() == []
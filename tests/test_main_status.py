@@ -1,4 +1,5 @@
 import pytest
+from pymongo.errors import DuplicateKeyError
 from pymongo_migrate.migrations import Migration, MigrationState
 from pymongo_migrate.mongo_migrate import dt
 
@@ -36,3 +37,49 @@ def test_set_state(mongo_migrate, migration, get_db_migrations):
     mongo_migrate.set_state(MigrationState(name=migration.name, applied=now))
     all_migrations = get_db_migrations()
     assert all_migrations == [{"name": migration.name, "applied": now}]
+
+
+def test_load_states(mongo_migrate, db_collection, migration):
+    now = dt().replace(microsecond=0)  # reduced time resolution
+    db_collection.insert_one({"name": migration.name, "applied": now})
+    assert mongo_migrate.load_states() == {
+        migration.name: MigrationState(name=migration.name, applied=now)
+    }
+
+
+def test_get_state_uses_loaded_states(mongo_migrate, db_collection, migration):
+    mongo_migrate.load_states()
+    db_collection.insert_one({"name": migration.name, "applied": dt()})
+    assert mongo_migrate.get_state(migration) == MigrationState(
+        name=migration.name, applied=None
+    )
+
+
+def test_set_state_updates_loaded_states(mongo_migrate, migration):
+    now = dt().replace(microsecond=0)  # reduced time resolution
+    mongo_migrate.load_states()
+    mongo_migrate.set_state(MigrationState(name=migration.name, applied=now))
+    assert mongo_migrate.get_state(migration) == MigrationState(
+        name=migration.name, applied=now
+    )
+
+
+def test_set_state_creates_state_index(mongo_migrate, migration, db_collection):
+    mongo_migrate.set_state(MigrationState(name=migration.name))
+    assert mongo_migrate.has_state_index()
+    with pytest.raises(DuplicateKeyError):
+        db_collection.insert_one({"name": migration.name, "applied": None})
+
+
+def test_set_state_without_state_index(mongo_migrate, migration):
+    mongo_migrate.state_index = False
+    mongo_migrate.set_state(MigrationState(name=migration.name))
+    assert not mongo_migrate.has_state_index()
+
+
+def test_ensure_state_index_with_duplicates(mongo_migrate, db_collection, migration):
+    db_collection.insert_many(
+        [{"name": migration.name, "applied": None} for _ in range(2)]
+    )
+    mongo_migrate.ensure_state_index()
+    assert not mongo_migrate.has_state_index()
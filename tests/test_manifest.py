@@ -0,0 +1,111 @@
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import pymongo
+import pytest
+from pymongo_migrate.manifest import MANIFEST_FILENAME, MigrationsManifest
+from pymongo_migrate.migrations import LazyMigrationModuleWrapper, MigrationsGraph
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+
+@pytest.fixture
+def cached_migrations_path(migrations_dir, tmp_path):
+    path = tmp_path / "migrations"
+    shutil.copytree(migrations_dir, path)
+    return path
+
+
+def _load(path: Path) -> MigrationsManifest:
+    manifest = MigrationsManifest.load(path)
+    list(manifest.load_migrations())
+    return manifest
+
+
+def _mongo_migrate(path: Path) -> MongoMigrate:
+    return MongoMigrate(
+        pymongo.MongoClient(connect=False),
+        "test",
+        migrations_dir=str(path),
+        manifest_cache=True,
+    )
+
+
+def test_manifest_saved(cached_migrations_path):
+    _mongo_migrate(cached_migrations_path)
+    assert (cached_migrations_path / MANIFEST_FILENAME).exists()
+    assert not list(cached_migrations_path.glob("*.tmp"))
+
+    manifest = _load(cached_migrations_path)
+    assert not manifest.changed
+    assert manifest.order == ["20150612230153", "20181123000000_gt_500"]
+    assert manifest.entries["20181123000000_gt_500.py"].dependencies == [
+        "20150612230153"
+    ]
+
+
+def test_manifest_skips_reading_and_verifying(cached_migrations_path):
+    _mongo_migrate(cached_migrations_path)
+    with patch(
+        "pymongo_migrate.manifest.read_module_metadata", side_effect=AssertionError
+    ), patch.object(MigrationsGraph, "verify", side_effect=AssertionError):
+        mongo_migrate = _mongo_migrate(cached_migrations_path)
+    assert [m.name for m in mongo_migrate.get_migrations()] == [
+        "20150612230153",
+        "20181123000000_gt_500",
+    ]
+
+
+def test_manifest_keeps_touched_file(cached_migrations_path):
+    _mongo_migrate(cached_migrations_path)
+    (cached_migrations_path / "20150612230153.py").touch()
+    with patch("pymongo_migrate.manifest.read_module_metadata") as read_mock:
+        manifest = _load(cached_migrations_path)
+    read_mock.assert_not_called()
+    assert manifest.changed
+    assert manifest.order is not None
+
+
+def test_manifest_invalidated_by_changed_file(cached_migrations_path):
+    _mongo_migrate(cached_migrations_path)
+    module_file = cached_migrations_path / "20181123000000_gt_500.py"
+    module_file.write_text(module_file.read_text() + "\n# changed\n")
+    manifest = _load(cached_migrations_path)
+    assert manifest.changed
+    assert manifest.order is None
+
+
+def test_manifest_invalidated_by_removed_file(cached_migrations_path):
+    _mongo_migrate(cached_migrations_path)
+    (cached_migrations_path / "20181123000000_gt_500.py").unlink()
+    manifest = _load(cached_migrations_path)
+    assert set(manifest.entries) == {"20150612230153.py"}
+    assert manifest.order is None
+
+
+def test_manifest_corrupted(cached_migrations_path):
+    (cached_migrations_path / MANIFEST_FILENAME).write_text("{")
+    manifest = _load(cached_migrations_path)
+    assert manifest.changed
+    assert set(manifest.entries) == {"20150612230153.py", "20181123000000_gt_500.py"}
+
+
+def test_manifest_imports_non_literal_module_once(cached_migrations_path):
+    module_file = cached_migrations_path / "20190101000000.py"
+    module_file.write_text(
+        "with open(__file__ + '.imports', 'a') as f:\n"
+        "    f.write('.')\n"
+        "name = '20190101000000'\n"
+        "dependencies = list(['20181123000000_gt_500'])\n"
+        "def upgrade(db):\n"
+        "    pass\n"
+    )
+    migrations = {
+        m.name: m for m in MigrationsManifest(cached_migrations_path).load_migrations()
+    }
+    migration = migrations["20190101000000"]
+
+    assert not isinstance(migration, LazyMigrationModuleWrapper)
+    assert migration.dependencies == ["20181123000000_gt_500"]
+    assert migration.module.upgrade
+    assert Path(f"{module_file}.imports").read_text() == "."
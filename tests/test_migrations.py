@@ -0,0 +1,136 @@
+import pytest
+from pymongo_migrate.migrations import Migration, MigrationsGraph
+
+
+def _graph(*migrations):
+    graph = MigrationsGraph()
+    for name, dependencies in migrations:
+        graph.add_migration(Migration(name=name, dependencies=dependencies))
+    return graph
+
+
+def _names(migrations):
+    return [migration.name for migration in migrations]
+
+
+def test_empty_graph():
+    graph = MigrationsGraph()
+    graph.verify()
+    assert list(graph) == []
+
+
+def test_long_linear_graph():
+    count = 20_000
+    graph = _graph(*((f"{i:05d}", [f"{i - 1:05d}"] if i else []) for i in range(count)))
+    graph.verify()
+    assert _names(graph) == [f"{i:05d}" for i in range(count)]
+
+
+def test_diamond_graph_yields_each_migration_once():
+    graph = _graph(
+        ("1", []),
+        ("3_b", ["1"]),
+        ("2_a", ["1"]),
+        ("4", ["2_a", "3_b"]),
+    )
+    assert _names(graph) == ["1", "2_a", "3_b", "4"]
+
+
+def test_branches_ordered_by_name():
+    graph = _graph(
+        ("1", []),
+        ("2_a", ["1"]),
+        ("4_a", ["2_a"]),
+        ("3_b", ["1"]),
+    )
+    assert _names(graph) == ["1", "2_a", "3_b", "4_a"]
+    assert _names(graph.get_heads()) == ["3_b", "4_a"]
+
+
+def test_multiple_heads():
+    graph = _graph(("1", []), ("2_a", ["1"]), ("2_b", ["1"]))
+    with pytest.raises(ValueError, match="multiple heads: 2_a, 2_b"):
+        graph.verify()
+    graph.add_migration(Migration(name="3", dependencies=["2_a", "2_b"]))
+    graph.verify()
+
+
+def test_order_cached_until_graph_changes():
+    graph = _graph(("1", []), ("2", ["1"]))
+    assert graph.get_order() is graph.get_order()
+    graph.add_migration(Migration(name="3", dependencies=["2"]))
+    assert _names(graph) == ["1", "2", "3"]
+
+
+def test_multiple_initial_migrations():
+    with pytest.raises(ValueError, match="single initial"):
+        _graph(("1", []), ("2", [])).verify()
+
+
+def test_cycle():
+    graph = _graph(("1", []), ("2", ["1", "3"]), ("3", ["2"]))
+    with pytest.raises(ValueError, match="cycle: 2, 3"):
+        graph.verify()
+
+
+def test_unknown_dependency():
+    graph = _graph(("1", []), ("2", ["0"]))
+    with pytest.raises(ValueError, match="unknown migration '0'"):
+        graph.verify()
+
+
+def test_restore_order():
+    graph = _graph(("1", []), ("2", ["1"]))
+    graph.restore_order(["1", "2"])
+    assert _names(graph) == ["1", "2"]
+    with pytest.raises(ValueError):
+        graph.restore_order(["1"])
+
+
+def _squashed_graph(*extra):
+    graph = _graph(
+        ("1", []),
+        ("2", ["1"]),
+        ("3", ["2"]),
+        ("4", ["3"]),
+        *extra,
+    )
+    graph.add_migration(
+        Migration(name="3_squashed", dependencies=[], replaces=["1", "2", "3"])
+    )
+    return graph
+
+
+def test_graph_with_squashed_migration():
+    graph = _squashed_graph()
+    assert _names(graph) == ["1", "2", "3", "3_squashed", "4"]
+    assert _names(graph.get_heads()) == ["4"]
+
+
+def test_resolve_replacements_fresh():
+    graph = _squashed_graph().resolve_replacements(set())
+    assert _names(graph) == ["3_squashed", "4"]
+    assert graph.migrations["4"].dependencies == ["3_squashed"]
+    assert graph.replacements == {n: ["3_squashed"] for n in ("1", "2", "3")}
+
+
+def test_resolve_replacements_all_applied():
+    graph = _squashed_graph().resolve_replacements({"1", "2", "3"})
+    assert _names(graph) == ["3_squashed", "4"]
+
+
+def test_resolve_replacements_partially_applied():
+    graph = _squashed_graph(("5", ["4", "3_squashed"])).resolve_replacements({"1"})
+    assert _names(graph) == ["1", "2", "3", "4", "5"]
+    assert graph.migrations["5"].dependencies == ["4", "3"]
+    assert graph.replacements == {"3_squashed": ["3"]}
+
+
+def test_replaced_migrations_removed():
+    graph = _graph(("4", ["3"]))
+    graph.add_migration(Migration(name="3_squashed", replaces=["1", "2", "3"]))
+    assert _names(graph) == ["3_squashed", "4"]
+    assert graph.get_dependencies(graph.migrations["4"]) == ["3_squashed"]
+    assert _names(graph.resolve_replacements({"1", "2", "3"})) == ["3_squashed", "4"]
+    with pytest.raises(ValueError):
+        graph.resolve_replacements({"1"})
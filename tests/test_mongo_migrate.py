@@ -1,7 +1,8 @@
 from collections import defaultdict
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, PropertyMock, patch
 
 import freezegun
+import pytest
 from pymongo_migrate.mongo_migrate import dt
 
 
@@ -97,3 +98,74 @@ def test_migrate(mongo_migrate):
     with patch.object(mongo_migrate, "upgrade") as upgrade_mock:
         mongo_migrate.migrate()
     upgrade_mock.assert_called()
+
+
+def test_upgrade_reads_states_once(mongo_migrate, db_collection):
+    with patch.object(
+        type(mongo_migrate), "db_collection", new_callable=PropertyMock
+    ) as db_collection_mock:
+        db_collection_mock.return_value = Mock(wraps=db_collection)
+        mongo_migrate.upgrade(fake=True)
+        collection = db_collection_mock.return_value
+    collection.find.assert_called_once()
+    collection.find_one.assert_not_called()
+
+
+@freezegun.freeze_time("2019-02-03 04:05:06")
+def test_mark_applied(mongo_migrate, db, get_db_migrations):
+    assert mongo_migrate.mark_applied("20150612230153") == 1
+    assert mongo_migrate.mark_applied() == 1
+    assert mongo_migrate.mark_applied() == 0
+
+    assert get_db_migrations() == [
+        {"applied": dt(2019, 2, 3, 4, 5, 6), "name": "20150612230153"},
+        {"applied": dt(2019, 2, 3, 4, 5, 6), "name": "20181123000000_gt_500"},
+    ]
+    assert db.numbers_collection.count_documents({}) == 0
+
+
+def test_mark_applied_bulk_writes(mongo_migrate, db_collection):
+    mongo_migrate.state_batch_size = 1
+    with patch.object(
+        type(mongo_migrate), "db_collection", new_callable=PropertyMock
+    ) as db_collection_mock:
+        db_collection_mock.return_value = Mock(wraps=db_collection)
+        mongo_migrate.mark_applied()
+        collection = db_collection_mock.return_value
+    assert collection.bulk_write.call_count == 2
+    collection.replace_one.assert_not_called()
+
+
+def test_mark_unapplied(mongo_migrate, get_db_migrations):
+    mongo_migrate.mark_applied()
+    assert mongo_migrate.mark_unapplied("20150612230153") == 1
+    assert get_db_migrations()[1] == {"applied": None, "name": "20181123000000_gt_500"}
+
+
+def test_upgrade_stops_at_applied_target(mongo_migrate, db, db_collection):
+    db_collection.insert_one({"applied": dt(), "name": "20150612230153"})
+    mongo_migrate.upgrade("20150612230153")
+    assert db.numbers_collection.count_documents({}) == 0
+
+
+def test_upgrade_n_downgrade_profile(mongo_migrate, tmp_path, caplog):
+    caplog.set_level("INFO")
+    mongo_migrate.profile_dir = str(tmp_path / "profiles")
+    mongo_migrate.profile_top = 5
+    mongo_migrate.upgrade()
+    mongo_migrate.downgrade()
+
+    assert {p.name for p in (tmp_path / "profiles").iterdir()} == {
+        "20150612230153.upgrade.pstats",
+        "20181123000000_gt_500.upgrade.pstats",
+        "20150612230153.downgrade.pstats",
+        "20181123000000_gt_500.downgrade.pstats",
+    }
+    assert "time waiting for mongo commands" in caplog.text
+    assert "function calls" in caplog.text
+
+
+def test_upgrade_profile_concurrently(mongo_migrate, tmp_path):
+    mongo_migrate.profile_dir = str(tmp_path)
+    with pytest.raises(ValueError):
+        mongo_migrate.upgrade(workers=2)
@@ -0,0 +1,69 @@
+import pymongo
+import pytest
+from pymongo_migrate.migrations import MigrationState
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+RESUMABLE_MIGRATION = """\
+name = "20190101000000"
+dependencies = []
+
+
+def upgrade(db, checkpoint):
+    start = (checkpoint.data or {}).get("next", 0)
+    for i in range(start, 10):
+        if i == 5 and db.interrupt.find_one():
+            raise RuntimeError("interrupted")
+        db.numbers.insert_one({"i": i})
+        checkpoint.save({"next": i + 1})
+
+
+def downgrade(db):
+    db.numbers.drop()
+"""
+
+
+@pytest.fixture
+def resumable_mongo_migrate(db_uri, db_name, db, tmp_path):
+    (tmp_path / "20190101000000.py").write_text(RESUMABLE_MIGRATION)
+    mm = MongoMigrate(
+        pymongo.MongoClient(db_uri), db_name, migrations_dir=str(tmp_path)
+    )
+    yield mm
+    mm.client.close()
+
+
+def test_upgrade_resumed_from_checkpoint(resumable_mongo_migrate, db, db_collection):
+    mongo_migrate = resumable_mongo_migrate
+    migration = mongo_migrate.graph.migrations["20190101000000"]
+    db.interrupt.insert_one({})
+    with pytest.raises(RuntimeError, match="interrupted"):
+        mongo_migrate.upgrade()
+
+    assert mongo_migrate.load_states()[migration.name] == MigrationState(
+        name=migration.name, applied=None, checkpoint={"next": 5}
+    )
+    assert db.numbers.count_documents({}) == 5
+
+    db.interrupt.drop()
+    mongo_migrate.upgrade()
+
+    assert sorted(doc["i"] for doc in db.numbers.find()) == list(range(10))
+    state = db_collection.find_one({"name": migration.name}, {"_id": False})
+    assert state["applied"]
+    assert "checkpoint" not in state
+
+
+def test_checkpoint_dropped_when_marked(resumable_mongo_migrate, db, db_collection):
+    mongo_migrate = resumable_mongo_migrate
+    db.interrupt.insert_one({})
+    with pytest.raises(RuntimeError, match="interrupted"):
+        mongo_migrate.upgrade()
+    db.interrupt.drop()
+
+    mongo_migrate.mark_applied()
+    assert "checkpoint" not in db_collection.find_one({"name": "20190101000000"})
+    mongo_migrate.downgrade()
+    assert "checkpoint" not in db_collection.find_one({"name": "20190101000000"})
+    mongo_migrate.upgrade()
+
+    assert sorted(doc["i"] for doc in db.numbers.find()) == list(range(10))
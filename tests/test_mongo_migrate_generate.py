@@ -1,6 +1,7 @@
 import freezegun
 import pymongo
 import pytest
+from pymongo_migrate.generate import generate_migration_module
 from pymongo_migrate.mongo_migrate import MongoMigrate
 
 
@@ -84,3 +85,25 @@ def downgrade(db: "pymongo.database.Database"):
 def test_generate_should_fail_when_name_collides(mongo_migrate):
     with pytest.raises(FileExistsError):
         mongo_migrate.generate("20181123000000_gt_500")
+
+
+def test_generate_merges_heads(db_uri, db_name, tmp_path):
+    migrations_path = tmp_path / "migrations"
+    migrations_path.mkdir()
+    for name, dependencies in [
+        ("20190101000000", []),
+        ("20190102000000_a", ["20190101000000"]),
+        ("20190102000000_b", ["20190101000000"]),
+    ]:
+        with (migrations_path / f"{name}.py").open("w") as f:
+            generate_migration_module(f, name=name, dependencies=dependencies)
+    mm = MongoMigrate(
+        pymongo.MongoClient(db_uri), db_name, migrations_dir=str(migrations_path)
+    )
+    with pytest.raises(ValueError, match="multiple heads"):
+        mm.upgrade()
+    file_path = mm.generate("20190103000000_merge")
+    assert "dependencies = ['20190102000000_a', '20190102000000_b']" in (
+        file_path.read_text()
+    )
+    mm.client.close()
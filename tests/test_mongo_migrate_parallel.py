@@ -0,0 +1,67 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from unittest.mock import Mock, patch
+
+import pymongo
+import pytest
+from pymongo_migrate.generate import generate_migration_module
+from pymongo_migrate.mongo_migrate import MongoMigrate
+
+BRANCHES = [
+    ("1", []),
+    ("2_a", ["1"]),
+    ("2_b", ["1"]),
+    ("3", ["2_a", "2_b"]),
+]
+
+
+@pytest.fixture
+def branched_mongo_migrate(db_uri, db_name, db, tmp_path):
+    for name, dependencies in BRANCHES:
+        with (tmp_path / f"{name}.py").open("w") as f:
+            generate_migration_module(f, name=name, dependencies=dependencies)
+    mm = MongoMigrate(
+        pymongo.MongoClient(db_uri), db_name, migrations_dir=str(tmp_path)
+    )
+    yield mm
+    mm.client.close()
+
+
+@contextmanager
+def patch_upgrades(mongo_migrate, **upgrades):
+    migrations = mongo_migrate.graph.migrations
+    upgrade_mocks = {name: Mock(wraps=upgrades.get(name)) for name in migrations}
+    with ExitStack() as stack:
+        for name, upgrade_mock in upgrade_mocks.items():
+            stack.enter_context(patch.object(migrations[name], "upgrade", upgrade_mock))
+        yield upgrade_mocks
+
+
+def test_upgrade_parallel(branched_mongo_migrate, get_db_migrations):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for_other_branch(db):
+        barrier.wait()
+
+    with patch_upgrades(
+        branched_mongo_migrate,
+        **{"2_a": wait_for_other_branch, "2_b": wait_for_other_branch},
+    ) as upgrade_mocks:
+        branched_mongo_migrate.upgrade(workers=2)
+
+    for upgrade_mock in upgrade_mocks.values():
+        upgrade_mock.assert_called_once()
+    assert all(state["applied"] for state in get_db_migrations())
+
+
+def test_upgrade_parallel_stops_on_failure(branched_mongo_migrate, get_db_migrations):
+    def fail(db):
+        raise RuntimeError("failed")
+
+    with patch_upgrades(branched_mongo_migrate, **{"2_a": fail}) as upgrade_mocks:
+        with pytest.raises(RuntimeError, match="failed"):
+            branched_mongo_migrate.upgrade(workers=2)
+
+    upgrade_mocks["3"].assert_not_called()
+    applied = {state["name"] for state in get_db_migrations() if state["applied"]}
+    assert applied == {"1", "2_b"}
@@ -0,0 +1,194 @@
+import functools
+
+import pymongo
+import pytest
+from pymongo_migrate.loader import read_module_metadata
+from pymongo_migrate.mongo_migrate import MongoMigrate, dt
+
+UPGRADE = "db.log.insert_one({'name': name, 'action': 'upgrade'})"
+DOWNGRADE = "db.log.insert_one({'name': name, 'action': 'downgrade'})"
+
+
+@pytest.fixture
+def squash_migrations_dir(tmp_path, write_migration):
+    write_migration(tmp_path, "0001", [], UPGRADE, DOWNGRADE)
+    write_migration(tmp_path, "0002", ["0001"], UPGRADE, DOWNGRADE)
+    write_migration(tmp_path, "0003", ["0002"], UPGRADE, DOWNGRADE)
+    write_migration(tmp_path, "0004", ["0003"], UPGRADE, DOWNGRADE)
+    write_migration(
+        tmp_path,
+        "0003_squashed",
+        [],
+        UPGRADE,
+        DOWNGRADE,
+        replaces=["0001", "0002", "0003"],
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def get_mongo_migrate(get_mongo_migrate, squash_migrations_dir):
+    return functools.partial(get_mongo_migrate, squash_migrations_dir)
+
+
+def _log(db):
+    return [(entry["name"], entry["action"]) for entry in db.log.find().sort("_id")]
+
+
+def _applied(db_collection):
+    return sorted(
+        state["name"] for state in db_collection.find({"applied": {"$ne": None}})
+    )
+
+
+def test_upgrade_fresh(get_mongo_migrate, db, db_collection):
+    get_mongo_migrate().upgrade()
+
+    assert _log(db) == [("0003_squashed", "upgrade"), ("0004", "upgrade")]
+    assert _applied(db_collection) == ["0001", "0002", "0003", "0003_squashed", "0004"]
+
+
+def test_upgrade_partially_applied(get_mongo_migrate, db, db_collection):
+    db_collection.insert_one({"name": "0001", "applied": dt()})
+    mongo_migrate = get_mongo_migrate()
+    mongo_migrate.upgrade()
+
+    assert _log(db) == [("0002", "upgrade"), ("0003", "upgrade"), ("0004", "upgrade")]
+    assert _applied(db_collection) == ["0001", "0002", "0003", "0004"]
+
+    mongo_migrate = get_mongo_migrate()
+    mongo_migrate.load_states()
+    assert [m.name for m in mongo_migrate.get_migrations()] == ["0003_squashed", "0004"]
+    assert mongo_migrate.get_state(
+        mongo_migrate.graph.migrations["0003_squashed"]
+    ).applied
+
+
+def test_downgrade_squashed(get_mongo_migrate, db, db_collection):
+    get_mongo_migrate().mark_applied("0003")
+    get_mongo_migrate().downgrade()
+
+    assert _log(db) == [("0003_squashed", "downgrade")]
+    assert _applied(db_collection) == []
+
+
+def test_upgrade_to_replaced_migration(get_mongo_migrate, db):
+    with pytest.raises(ValueError, match="replaced by '0003_squashed'"):
+        get_mongo_migrate().upgrade("0002")
+
+    get_mongo_migrate().upgrade("0003")
+    assert _log(db) == [("0003_squashed", "upgrade")]
+
+
+def test_upgrade_after_replaced_removed(
+    get_mongo_migrate, db, db_collection, squash_migrations_dir
+):
+    get_mongo_migrate().mark_applied("0003")
+    for name in ("0001", "0002", "0003"):
+        (squash_migrations_dir / f"{name}.py").unlink()
+    get_mongo_migrate().upgrade()
+
+    assert _log(db) == [("0004", "upgrade")]
+
+
+def test_squash(mongo_migrate, tmp_path, db, get_db_migrations):
+    mongo_migrate.migrations_dir = str(tmp_path)
+    mongo_migrate.__post_init__()
+    (tmp_path / "0001.py").write_text(
+        "name = '0001'\ndependencies = []\n"
+        "def upgrade(db):\n    db.numbers.insert_one({'i': 1})\n"
+        "def downgrade(db):\n    db.numbers.delete_many({})\n"
+    )
+    (tmp_path / "0002.py").write_text(
+        "name = '0002'\ndependencies = ['0001']\n"
+        "def upgrade(db):\n    db.numbers.update_many({}, {'$inc': {'i': 1}})\n"
+        "def downgrade(db):\n    db.numbers.update_many({}, {'$inc': {'i': -1}})\n"
+    )
+    mongo_migrate.__post_init__()
+
+    file_path = mongo_migrate.squash(name="0002_squashed")
+
+    assert read_module_metadata(file_path) == {
+        "name": "0002_squashed",
+        "description": "\nSquashed migrations 0001 to 0002\n",
+        "dependencies": [],
+        "replaces": ["0001", "0002"],
+    }
+    mongo_migrate.__post_init__()
+    mongo_migrate.upgrade()
+    assert db.numbers.find_one()["i"] == 2
+    assert {m["name"] for m in get_db_migrations()} == {"0001", "0002", "0002_squashed"}
+    mongo_migrate.downgrade()
+    assert db.numbers.count_documents({}) == 0
+
+
+def test_squash_single_migration(mongo_migrate):
+    with pytest.raises(ValueError):
+        mongo_migrate.squash("20150612230153", "20150612230153")
+
+
+@pytest.fixture
+def squash_kinds_dir(tmp_path):
+    (tmp_path / "0001.py").write_text(
+        "name = '0001'\n"
+        "dependencies = []\n"
+        "\n"
+        "def upgrade(db, checkpoint):\n"
+        "    start = (checkpoint.data or {}).get('i', 0)\n"
+        "    for i in range(start, 3):\n"
+        "        db.users.insert_one({'email': f'{i}@example.com'})\n"
+        "        checkpoint.save({'i': i + 1})\n"
+        "\n"
+        "def downgrade(db):\n"
+        "    db.users.drop()\n"
+    )
+    (tmp_path / "0002.py").write_text(
+        "import pymongo\n"
+        "from pymongo_migrate.indexes import Index\n"
+        "name = '0002'\n"
+        "dependencies = ['0001']\n"
+        "indexes = [Index('users', [('email', pymongo.ASCENDING)], unique=True)]\n"
+    )
+    return tmp_path
+
+
+def test_squash_checkpoint_n_indexes(db_uri, db_name, db, squash_kinds_dir):
+    client = pymongo.MongoClient(db_uri)
+    mongo_migrate = MongoMigrate(client, db_name, migrations_dir=str(squash_kinds_dir))
+    mongo_migrate.squash(name="0002_squashed")
+    mongo_migrate.__post_init__()
+
+    mongo_migrate.upgrade()
+    assert db.users.count_documents({}) == 3
+    assert db.users.index_information()["email_1"]["unique"]
+
+    mongo_migrate.downgrade()
+    assert "users" not in db.list_collection_names()
+    client.close()
+
+
+def test_squash_resume_from_checkpoint(db_uri, db_name, db, squash_kinds_dir):
+    client = pymongo.MongoClient(db_uri)
+    mongo_migrate = MongoMigrate(client, db_name, migrations_dir=str(squash_kinds_dir))
+    mongo_migrate.squash(name="0002_squashed")
+    mongo_migrate.__post_init__()
+    mongo_migrate.save_checkpoint(
+        "0002_squashed", {"replaced": "0001", "data": {"i": 2}}
+    )
+
+    mongo_migrate.upgrade()
+    assert [user["email"] for user in db.users.find()] == ["2@example.com"]
+    assert "email_1" in db.users.index_information()
+    client.close()
+
+
+def test_squash_replaced_removed(db_uri, db_name, db, squash_kinds_dir):
+    client = pymongo.MongoClient(db_uri)
+    mongo_migrate = MongoMigrate(client, db_name, migrations_dir=str(squash_kinds_dir))
+    mongo_migrate.squash(name="0002_squashed")
+    (squash_kinds_dir / "0002.py").unlink()
+    mongo_migrate.__post_init__()
+
+    with pytest.raises(ValueError, match="'0002' not found"):
+        mongo_migrate.upgrade()
+    client.close()
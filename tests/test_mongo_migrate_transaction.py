@@ -0,0 +1,134 @@
+import functools
+
+import pytest
+from pymongo_migrate.loader import load_module_migrations
+
+UPGRADE = "db.config.insert_one({'name': name}, session=session)"
+DOWNGRADE = "db.config.delete_one({'name': name}, session=session)"
+
+
+@pytest.fixture
+def transaction_migrations_dir(tmp_path, write_migration):
+    for name, dependencies, transactional in [
+        ("0001", [], True),
+        ("0002", ["0001"], True),
+        ("0003", ["0002"], False),
+        ("0004", ["0003"], True),
+        ("0005", ["0004"], True),
+        ("0006", ["0005"], True),
+    ]:
+        write_migration(
+            tmp_path,
+            name,
+            dependencies,
+            UPGRADE,
+            DOWNGRADE,
+            arguments="db, session=None",
+            transactional=transactional,
+        )
+    return tmp_path
+
+
+@pytest.fixture
+def get_mongo_migrate(get_mongo_migrate, transaction_migrations_dir):
+    return functools.partial(get_mongo_migrate, transaction_migrations_dir)
+
+
+@pytest.fixture
+def replica_set(db):
+    if not db.client.admin.command("hello").get("setName"):
+        pytest.skip("transactions need replica set")
+
+
+def test_transaction_batches(get_mongo_migrate):
+    mongo_migrate = get_mongo_migrate(transaction_batch_size=2)
+    mongo_migrate.load_states()
+    pending = list(mongo_migrate._pending_upgrades(None))
+
+    assert [
+        (in_transaction, [migration.name for migration, _ in batch])
+        for in_transaction, batch in mongo_migrate._transaction_batches(pending)
+    ] == [
+        (True, ["0001", "0002"]),
+        (False, ["0003"]),
+        (True, ["0004", "0005"]),
+        (True, ["0006"]),
+    ]
+
+
+def test_transaction_batches_disabled(get_mongo_migrate):
+    mongo_migrate = get_mongo_migrate()
+    mongo_migrate.load_states()
+    pending = list(mongo_migrate._pending_upgrades(None))
+
+    assert all(
+        not in_transaction and len(batch) == 1
+        for in_transaction, batch in mongo_migrate._transaction_batches(pending)
+    )
+
+
+def test_upgrade_without_transactions(get_mongo_migrate, db, monkeypatch):
+    mongo_migrate = get_mongo_migrate()
+    sessions = []
+    monkeypatch.setattr(
+        mongo_migrate.client, "start_session", lambda **kwargs: sessions.append(kwargs)
+    )
+
+    mongo_migrate.upgrade()
+
+    assert sessions == []
+    assert db.config.count_documents({}) == 6
+
+
+def test_session_not_accepted(tmp_path, db):
+    (tmp_path / "0001.py").write_text(
+        "name = '0001'\n"
+        "dependencies = []\n"
+        "transactional = True\n"
+        "def upgrade(db):\n"
+        "    pass\n"
+    )
+    (migration,) = load_module_migrations(tmp_path)
+
+    assert migration.transactional
+    with pytest.raises(ValueError, match="session"):
+        migration.upgrade(db, session=object())
+
+
+def test_concurrent_transactions(get_mongo_migrate):
+    with pytest.raises(ValueError):
+        get_mongo_migrate(transaction_batch_size=2).upgrade(workers=2)
+
+
+def test_upgrade_in_transactions(replica_set, get_mongo_migrate, db, db_collection):
+    get_mongo_migrate(transaction_batch_size=10).upgrade()
+
+    assert db.config.count_documents({}) == 6
+    assert db_collection.count_documents({"applied": {"$ne": None}}) == 6
+
+
+def test_failed_transaction_rolls_back(
+    replica_set,
+    get_mongo_migrate,
+    db,
+    db_collection,
+    transaction_migrations_dir,
+    write_migration,
+):
+    write_migration(
+        transaction_migrations_dir,
+        "0002",
+        ["0001"],
+        f"{UPGRADE}\nraise RuntimeError('failed')",
+        DOWNGRADE,
+        arguments="db, session=None",
+        transactional=True,
+    )
+    mongo_migrate = get_mongo_migrate(transaction_batch_size=10)
+
+    with pytest.raises(RuntimeError):
+        mongo_migrate.upgrade()
+
+    assert db.config.count_documents({}) == 0
+    assert db_collection.count_documents({"applied": {"$ne": None}}) == 0
+    assert not mongo_migrate.get_state(mongo_migrate.graph.migrations["0001"]).applied
@@ -0,0 +1,91 @@
+import pytest
+from pymongo_migrate.operations import (
+    ConvertField,
+    RenameField,
+    SetDefault,
+    UnsetField,
+    apply,
+    revert,
+)
+
+
+def test_rename_field_pipeline():
+    operation = RenameField("users", "mail", "contact.email")
+
+    assert operation.filter() == {"mail": {"$exists": True}}
+    assert operation.pipeline() == [
+        {"$set": {"contact.email": "$mail"}},
+        {"$unset": "mail"},
+    ]
+    assert operation.inverse() == RenameField("users", "contact.email", "mail")
+
+
+def test_rename_field_overlapping_paths():
+    with pytest.raises(ValueError):
+        RenameField("users", "contact", "contact.email")
+
+
+def test_convert_field_pipeline():
+    operation = ConvertField("orders", "total", "decimal", "string", on_error=None)
+
+    assert operation.filter() == {
+        "total": {"$exists": True, "$not": {"$type": "decimal"}}
+    }
+    assert operation.pipeline() == [
+        {
+            "$set": {
+                "total": {
+                    "$convert": {
+                        "input": "$total",
+                        "to": "decimal",
+                        "onError": {"$literal": None},
+                    }
+                }
+            }
+        }
+    ]
+    assert operation.inverse() == ConvertField("orders", "total", "string", "decimal")
+
+
+def test_irreversible_operations(db):
+    db.users.insert_one({"name": "a", "age": "1"})
+    operations = [UnsetField("users", "name"), ConvertField("users", "age", "int")]
+
+    with pytest.raises(ValueError):
+        revert(db, operations)
+    assert db.users.find_one({}, {"_id": False}) == {"name": "a", "age": "1"}
+
+
+def test_apply_n_revert(db):
+    db.users.insert_many(
+        [
+            {"_id": 1, "mail": "a@example.com", "age": "31"},
+            {"_id": 2, "mail": "b@example.com", "age": "42", "active": False},
+        ]
+    )
+    operations = [
+        RenameField("users", "mail", "contact.email"),
+        SetDefault("users", "active", True),
+        ConvertField("users", "age", "int", from_type="string"),
+    ]
+
+    results = apply(db, operations)
+
+    assert [result.modified_count for result in results] == [2, 1, 2]
+    assert list(db.users.find().sort("_id")) == [
+        {"_id": 1, "contact": {"email": "a@example.com"}, "age": 31, "active": True},
+        {"_id": 2, "contact": {"email": "b@example.com"}, "age": 42, "active": False},
+    ]
+
+    revert(db, operations)
+
+    assert list(db.users.find().sort("_id")) == [
+        {"_id": 1, "mail": "a@example.com", "age": "31", "contact": {}},
+        {
+            "_id": 2,
+            "mail": "b@example.com",
+            "age": "42",
+            "active": False,
+            "contact": {},
+        },
+    ]
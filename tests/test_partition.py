@@ -0,0 +1,82 @@
+import pytest
+from pymongo import UpdateOne
+from pymongo_migrate.partition import (
+    IdRange,
+    PartitionedScanError,
+    split_id_ranges,
+    update_in_partitions,
+)
+
+
+@pytest.fixture
+def numbers(db):
+    db.numbers.insert_many([{"_id": i, "i": i} for i in range(100)])
+    return db.numbers
+
+
+def test_split_id_ranges(numbers):
+    ranges = split_id_ranges(numbers, 4)
+    assert len(ranges) == 4
+    assert ranges[0].min is None
+    assert ranges[-1].max is None
+    for previous, next_ in zip(ranges, ranges[1:]):
+        assert previous.max == next_.min
+    assert sum(numbers.count_documents(r.filter()) for r in ranges) == 100
+
+
+def test_split_id_ranges_single_partition(numbers):
+    assert split_id_ranges(numbers, 1) == [IdRange()]
+
+
+def test_update_in_partitions(numbers):
+    progress = []
+    result = update_in_partitions(
+        numbers,
+        lambda doc: UpdateOne({"_id": doc["_id"]}, {"$set": {"double": doc["i"] * 2}}),
+        filter={"i": {"$gte": 10}},
+        ranges=[IdRange(max=50), IdRange(min=50)],
+        batch_size=7,
+        on_progress=lambda index, range_result: progress.append(index),
+    )
+    assert [r.result.read for r in result.ranges] == [40, 50]
+    assert result.total.modified == 90
+    assert set(progress) == {0, 1}
+    assert numbers.count_documents({"double": {"$exists": True}}) == 90
+
+
+def test_update_in_partitions_errors(numbers):
+    def transform(doc):
+        if doc["i"] == 75:
+            raise ValueError("bad document")
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {"done": True}})
+
+    with pytest.raises(PartitionedScanError) as exc_info:
+        update_in_partitions(
+            numbers, transform, ranges=[IdRange(max=50), IdRange(min=50)]
+        )
+    result = exc_info.value.result
+    assert result.ranges[0].error is None
+    assert result.ranges[0].result.modified == 50
+    assert isinstance(result.ranges[1].error, ValueError)
+
+
+def test_update_in_partitions_no_ranges(numbers):
+    result = update_in_partitions(numbers, lambda doc: None, ranges=[])
+    assert result.ranges == []
+    assert result.total.read == 0
+
+
+def test_split_id_ranges_mixed_id_types(numbers):
+    numbers.insert_many([{"i": 100 + i} for i in range(10)])
+    numbers.insert_many([{"_id": f"doc{i}", "i": 110 + i} for i in range(10)])
+
+    ranges = split_id_ranges(numbers, 4)
+
+    assert {type(r.max) for r in ranges[:-1]} == {int}
+    assert sum(numbers.count_documents(r.filter()) for r in ranges) == 120
+    result = update_in_partitions(
+        numbers,
+        lambda doc: UpdateOne({"_id": doc["_id"]}, {"$set": {"done": True}}),
+        ranges=ranges,
+    )
+    assert result.total.modified == 120
@@ -0,0 +1,56 @@
+from pymongo import UpdateOne
+from pymongo_migrate.loader import load_module_migrations
+from pymongo_migrate.process_pool import update_in_process_pool
+
+PROCESS_POOL_MIGRATION = """\
+from pymongo import UpdateOne
+from pymongo_migrate.process_pool import update_in_process_pool
+
+name = "20190101000000"
+dependencies = []
+
+
+def square(doc):
+    return UpdateOne({"_id": doc["_id"]}, {"$set": {"square": doc["i"] ** 2}})
+
+
+def upgrade(db):
+    update_in_process_pool(db.numbers, square, batch_size=7, processes=2)
+
+
+def downgrade(db):
+    pass
+"""
+
+
+def double(doc):
+    if doc["i"] % 2:
+        return None
+    return UpdateOne({"_id": doc["_id"]}, {"$set": {"double": doc["i"] * 2}})
+
+
+def test_update_in_process_pool(db):
+    db.numbers.insert_many([{"_id": i, "i": i} for i in range(50)])
+    batches = []
+    result = update_in_process_pool(
+        db.numbers,
+        double,
+        batch_size=7,
+        processes=2,
+        max_pending=2,
+        on_batch=lambda result: batches.append(result.last_id),
+    )
+    assert (result.read, result.modified, result.batches) == (50, 25, 8)
+    assert batches == [6, 13, 20, 27, 34, 41, 48, 49]
+    assert [doc.get("double") for doc in db.numbers.find({"i": {"$in": [4, 5]}})] == [
+        8,
+        None,
+    ]
+
+
+def test_update_in_process_pool_from_migration_module(db, tmp_path):
+    db.numbers.insert_many([{"_id": i, "i": i} for i in range(10)])
+    (tmp_path / "20190101000000.py").write_text(PROCESS_POOL_MIGRATION)
+    (migration,) = load_module_migrations(tmp_path)
+    migration.upgrade(db)
+    assert [doc["square"] for doc in db.numbers.find()] == [i**2 for i in range(10)]
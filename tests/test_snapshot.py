@@ -0,0 +1,87 @@
+import io
+
+import pymongo
+import pytest
+from pymongo_migrate.mongo_migrate import MongoMigrate
+from pymongo_migrate.snapshot import (
+    dump_snapshot,
+    read_snapshot_header,
+    restore_snapshot,
+)
+
+
+@pytest.fixture
+def target_db(mongo_url, db_name):
+    client = pymongo.MongoClient(mongo_url)
+    yield client[f"{db_name}_restored"]
+    client.drop_database(f"{db_name}_restored")
+    client.close()
+
+
+def test_dump_n_restore(db, target_db):
+    db.create_collection("capped", capped=True, size=4096)
+    db.numbers.insert_many([{"_id": i, "i": i} for i in range(25)])
+    db.numbers.create_index([("i", pymongo.DESCENDING)], unique=True)
+    db.create_collection("odd", viewOn="numbers", pipeline=[{"$match": {"i": 1}}])
+    db.skipped.insert_one({})
+    fp = io.BytesIO()
+
+    counts = dump_snapshot(db, fp, "0001", exclude={"skipped"}, batch_size=10)
+    assert counts == {"capped": 0, "numbers": 25, "odd": 0}
+
+    fp.seek(0)
+    assert read_snapshot_header(fp)["migration"] == "0001"
+    fp.seek(0)
+    assert restore_snapshot(target_db, fp)["migration"] == "0001"
+
+    assert list(target_db.numbers.find().sort("_id")) == list(
+        db.numbers.find().sort("_id")
+    )
+    assert target_db.numbers.index_information()["i_-1"]["unique"]
+    assert target_db.capped.options()["capped"]
+    assert list(target_db.odd.find()) == [{"_id": 1, "i": 1}]
+    assert "skipped" not in target_db.list_collection_names()
+
+
+def test_restore_into_non_empty_database(db):
+    fp = io.BytesIO()
+    dump_snapshot(db, fp, None)
+    db.numbers.insert_one({})
+    fp.seek(0)
+
+    with pytest.raises(ValueError, match="numbers"):
+        restore_snapshot(db, fp)
+
+
+def test_read_header_of_other_file():
+    with pytest.raises(ValueError):
+        read_snapshot_header(io.BytesIO(b""))
+
+
+def test_snapshot_n_restore(
+    mongo_migrate, target_db, migrations_dir, db_collection, tmp_path
+):
+    snapshot_path = str(tmp_path / "snapshot.bson.gz")
+    mongo_migrate.upgrade("20150612230153")
+    assert mongo_migrate.snapshot(snapshot_path, "20150612230153") == {
+        "numbers_collection": 1000,
+        "pymongo_migrate": 1,
+    }
+
+    target_migrate = MongoMigrate(
+        mongo_migrate.client, target_db.name, migrations_dir=migrations_dir
+    )
+    assert target_migrate.restore_snapshot(snapshot_path) == "20150612230153"
+
+    assert target_db.numbers_collection.count_documents({}) == 499
+    assert target_migrate.has_state_index()
+    assert [
+        state["name"] for state in target_db.pymongo_migrate.find().sort("name")
+    ] == ["20150612230153", "20181123000000_gt_500"]
+
+
+def test_snapshot_not_at_migration(mongo_migrate, tmp_path):
+    mongo_migrate.upgrade()
+
+    with pytest.raises(ValueError, match="migrated exactly"):
+        mongo_migrate.snapshot(str(tmp_path / "snapshot.bson.gz"), "20150612230153")
@@ -0,0 +1,104 @@
+import pymongo
+import pytest
+from pymongo_migrate.mongo_migrate import MongoMigrate
+from pymongo_migrate.stats import (
+    CommandStatsListener,
+    CommandSummary,
+    LatencyHistogram,
+)
+
+
+@pytest.fixture
+def command_stats():
+    return CommandStatsListener()
+
+
+@pytest.fixture
+def stats_client(mongo_url, command_stats):
+    client = pymongo.MongoClient(mongo_url, event_listeners=[command_stats])
+    yield client
+    client.close()
+
+
+def test_collect(stats_client, command_stats, db_name):
+    db = stats_client[db_name]
+    db.numbers.insert_one({"i": -1})
+    with command_stats.collect() as stats:
+        db.numbers.insert_many([{"i": i} for i in range(10)])
+        db.numbers.update_many({"i": {"$lt": 5}}, {"$set": {"small": True}})
+        list(db.numbers.find({"small": True}))
+    assert stats.commands == {"insert": 1, "update": 1, "find": 1}
+    assert stats.documents_written == 10 + 6
+    assert stats.documents_read == 6
+    assert stats.bytes_sent > 0
+    assert stats.bytes_received > 0
+    assert stats.command_time > 0
+
+
+def test_upgrade_stores_stats(
+    stats_client, command_stats, db, db_name, db_collection, migrations_dir
+):
+    mongo_migrate = MongoMigrate(
+        stats_client,
+        db_name,
+        migrations_dir=migrations_dir,
+        command_stats=command_stats,
+    )
+    mongo_migrate.upgrade()
+    state = db_collection.find_one({"name": "20150612230153"})
+    assert state["stats"]["commands"] == {"insert": 1}
+    assert state["stats"]["documents_written"] == 1000
+    assert state["stats"]["duration"] > 0
+
+    mongo_migrate.downgrade()
+    assert "stats" not in db_collection.find_one({"name": "20150612230153"})
+
+
+def test_upgrade_stores_duration_without_listener(mongo_migrate, db_collection):
+    mongo_migrate.upgrade()
+    state = db_collection.find_one({"name": "20150612230153"})
+    assert state["stats"]["duration"] > 0
+    assert state["stats"]["commands"] == {}
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for micros in range(1, 1001):
+        histogram.add(micros)
+    assert histogram.count == 1000
+    assert histogram.max == 1000
+    assert 500 <= histogram.percentile(50) <= 525
+    assert 950 <= histogram.percentile(95) <= 1000
+    assert histogram.percentile(100) == 1000
+
+
+def test_command_summary():
+    summary = CommandSummary()
+    summary.add("insert", 1500)
+    summary.add("insert", 2_500_000, failed=True)
+    summary.add("find", 20)
+    assert summary.format() == [
+        "find: 1 commands, 0 failed, p50 20us, p95 20us, p99 20us, max 20us",
+        "insert: 2 commands, 1 failed, p50 1.5ms, p95 2.50s, p99 2.50s, max 2.50s",
+    ]
+
+
+def test_collect_summary(stats_client, command_stats, db_name):
+    db = stats_client[db_name]
+    with command_stats.collect() as stats:
+        for i in range(3):
+            db.numbers.insert_one({"i": i})
+        db.numbers.find_one({"i": 1})
+        with pytest.raises(pymongo.errors.OperationFailure):
+            db.command("noSuchCommand")
+    assert set(stats.summary.latency) == {"insert", "find", "noSuchCommand"}
+    assert stats.summary.latency["insert"].count == 3
+    assert stats.summary.latency["noSuchCommand"].count == 1
+    assert dict(stats.summary.failures) == {"noSuchCommand": 1}
+    lines = stats.summary.format()
+    assert [line.split(", p50")[0] for line in lines] == [
+        "find: 1 commands, 0 failed",
+        "insert: 3 commands, 0 failed",
+        "noSuchCommand: 1 commands, 1 failed",
+    ]
+    assert "summary" not in stats.to_dict()
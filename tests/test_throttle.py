@@ -0,0 +1,113 @@
+import datetime
+from unittest.mock import Mock
+
+import pymongo
+import pytest
+from pymongo.errors import OperationFailure
+from pymongo_migrate.throttle import Throttle
+
+
+def _status(lag):
+    now = datetime.datetime(2019, 1, 1)
+    return {
+        "members": [
+            {"stateStr": "PRIMARY", "optimeDate": now},
+            {"stateStr": "SECONDARY", "optimeDate": now},
+            {"stateStr": "SECONDARY", "optimeDate": now - datetime.timedelta(0, lag)},
+            {"stateStr": "ARBITER"},
+        ]
+    }
+
+
+@pytest.fixture
+def client():
+    return Mock()
+
+
+@pytest.fixture
+def throttle(client):
+    throttle = Throttle(client, max_lag=10, pause_lag=60, check_interval=0)
+    throttle.sleep = Mock()
+    return throttle
+
+
+def _lags(client, *lags):
+    client.admin.command.side_effect = [_status(lag) for lag in lags]
+
+
+def test_replication_lag(throttle, client):
+    _lags(client, 12)
+    assert throttle.replication_lag() == 12
+
+
+def test_replication_lag_not_available(throttle, client):
+    client.admin.command.side_effect = OperationFailure("not running with --replSet")
+    assert throttle.replication_lag() is None
+    assert throttle.replication_lag() is None
+    client.admin.command.assert_called_once()
+
+
+def test_replication_lag_standalone(mongo_url):
+    client = pymongo.MongoClient(mongo_url)
+    assert Throttle(client).replication_lag() in (None, 0.0)
+    client.close()
+
+
+def test_throttle_slows_down_and_recovers(throttle, client):
+    _lags(client, 1, 20, 20, 20, 1, 1)
+    delays = []
+    for _ in range(6):
+        throttle.wait()
+        delays.append(throttle.delay)
+    assert delays == [0, 0.05, 0.1, 0.2, 0.1, 0.05]
+    assert throttle.sleep.call_count == 5
+
+
+def test_throttle_pauses(throttle, client):
+    _lags(client, 100, 50, 5)
+    throttle.wait()
+    assert [c.args for c in throttle.sleep.call_args_list] == [(0,), (0,), (5.0,)]
+
+
+def test_throttle_write_latency(throttle, client):
+    throttle.max_latency_ms = 10
+    throttle._lag_supported = False
+    client.admin.command.side_effect = [
+        {"opLatencies": {"writes": {"latency": 0, "ops": 0}}},
+        {"opLatencies": {"writes": {"latency": 50_000, "ops": 2}}},
+    ]
+    throttle.wait()
+    assert throttle.delay == 0
+    throttle.wait()
+    assert throttle.delay == 0.05
+
+
+def test_write_latency_not_available(throttle, client):
+    client.admin.command.side_effect = OperationFailure("serverStatus not allowed")
+    assert throttle.write_latency_ms() is None
+    assert throttle.write_latency_ms() is None
+    client.admin.command.assert_called_once()
+
+
+def test_throttle_pause_does_not_block_checks(throttle, client):
+    _lags(client, 100, 5)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            assert throttle._lock.acquire(blocking=False)
+            throttle._lock.release()
+
+    throttle.sleep = sleep
+    throttle.wait()
+    assert sleeps == [0, 5.0]
+
+
+def test_throttle_checks_at_interval(throttle, client):
+    throttle.check_interval = 60
+    _lags(client, 20)
+    throttle.wait()
+    throttle.wait()
+    client.admin.command.assert_called_once()
+    assert throttle.sleep.call_count == 2